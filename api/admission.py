@@ -0,0 +1,266 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") != "0"  # Set to 0 to admit every request immediately
+WINDOW_SIZE = 20  # Completed requests per limit adjustment
+ADJUST_INTERVAL = 1.0  # Seconds after which a partial window is used for an adjustment
+DECREASE_FACTOR = 0.75  # Multiplicative decrease when the window's p90 latency exceeds the target
+PRESSURE_SECONDS = 5.0  # Lower classes are held at their minimum this long after a higher class backs off
+LATENCY_SAMPLES = 200  # Recent latencies kept per endpoint for the metrics
+
+# Priority classes, rank 0 first. Every endpoint gets its own limiter with the settings of its class:
+# initial, minimum and maximum concurrency, waiting requests, longest wait and the latency the limit steers to
+PRIORITY_CLASSES = {
+    'realtime': {'rank': 0, 'limit': 16, 'min_limit': 2, 'max_limit': 256, 'queue': 128, 'max_wait': 1.0,
+                 'target_latency': float(os.getenv("ADMISSION_TARGET_LATENCY", "0.25"))},
+    'analytics': {'rank': 1, 'limit': 4, 'min_limit': 1, 'max_limit': 32, 'queue': 16, 'max_wait': 5.0,
+                  'target_latency': 2.0},
+    'bulk': {'rank': 2, 'limit': 2, 'min_limit': 1, 'max_limit': 8, 'queue': 4, 'max_wait': 10.0,
+             'target_latency': 30.0}
+}
+
+# Endpoints without a class (events stream, stats, policy and review) are never limited
+ENDPOINT_CLASSES = {
+    ('POST', '/api/predict'): 'realtime',
+    ('POST', '/api/predict_batch'): 'bulk',
+    ('POST', '/api/predict_many'): 'bulk',
+    ('GET', '/api/transactions'): 'analytics',
+    ('GET', '/api/transactions/analytics'): 'analytics',
+    ('GET', '/api/archive/transactions'): 'analytics',
+    ('GET', '/api/drift'): 'analytics'
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit of one endpoint with a bounded FIFO wait queue.
+
+    The limit follows the measured latency (AIMD): every window of completed
+    requests it grows by one while the limit is reached and the p90 latency is
+    on target, and shrinks by DECREASE_FACTOR when the latency is above it.
+    While a higher priority class is backing off, the limit drops to its minimum.
+
+    Args:
+        name: Endpoint, used in the metrics
+        priority: Name of the priority class
+        config: Settings of the priority class
+        controller: Controller that tracks the pressure of every class
+    """
+
+    def __init__(self, name, priority, config, controller):
+        self.name = name
+        self.priority = priority
+        self.rank = config['rank']
+        self.limit = float(config['limit'])
+        self.min_limit = config['min_limit']
+        self.max_limit = config['max_limit']
+        self.queue_limit = config['queue']
+        self.max_wait = config['max_wait']
+        self.target_latency = config['target_latency']
+        self.controller = controller
+        self.in_flight = 0
+        self.waiters = deque()
+        self.window = []
+        self.window_started = time.monotonic()
+        self.peak = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {'queue_full': 0, 'timeout': 0}
+        self.increases = 0
+        self.decreases = 0
+
+    def current_limit(self):
+        if self.controller.under_pressure(self.rank):
+            return self.min_limit
+        return max(self.min_limit, int(self.limit))
+
+    def retry_after(self):
+        # Seconds until the requests ahead are likely done, at least one
+        latency = percentile(self.latencies, 0.5) if self.latencies else self.target_latency
+        return max(1, math.ceil(latency * (len(self.waiters) + 1) / self.current_limit()))
+
+    def start(self):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.admitted += 1
+
+    async def acquire(self):
+        if self.in_flight < self.current_limit() and not self.waiters:
+            self.start()
+            return
+        if len(self.waiters) >= self.queue_limit:
+            self.rejected['queue_full'] += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        # Released slots are handed over directly by wake, the waiter only learns that it got one
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            if future.done():
+                # Client went away right after it was admitted, hand the slot on
+                self.release(None)
+            else:
+                future.cancel()
+                self.waiters.remove(future)
+            raise
+        if not future.done():
+            future.cancel()
+            self.waiters.remove(future)
+            self.rejected['timeout'] += 1
+            raise AdmissionRejected("timeout", self.retry_after())
+
+    def wake(self):
+        while self.waiters and self.in_flight < self.current_limit():
+            future = self.waiters.popleft()
+            if not future.done():
+                self.start()
+                future.set_result(True)
+
+    def release(self, latency):
+        self.in_flight -= 1
+        if latency is not None:
+            self.record(latency)
+        self.wake()
+
+    def record(self, latency):
+        self.latencies.append(latency)
+        self.window.append(latency)
+        now = time.monotonic()
+        if len(self.window) >= WINDOW_SIZE or now - self.window_started >= ADJUST_INTERVAL:
+            self.adjust(percentile(self.window, 0.9))
+            self.window = []
+            self.window_started = now
+            self.peak = self.in_flight
+
+    def adjust(self, latency):
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            self.decreases += 1
+            self.controller.signal_pressure(self.rank)
+        elif self.peak >= int(self.limit) and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.increases += 1
+
+    def stats(self):
+        return {
+            'priority': self.priority,
+            'limit': self.current_limit(),
+            'adaptive_limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'waiting': len(self.waiters),
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': dict(self.rejected),
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'target_latency_ms': round(self.target_latency * 1000, 1),
+            'p50_ms': round(percentile(self.latencies, 0.5) * 1000, 2) if self.latencies else None,
+            'p90_ms': round(percentile(self.latencies, 0.9) * 1000, 2) if self.latencies else None
+        }
+
+
+class AdmissionController:
+    """
+    One adaptive limiter per classified endpoint, plus the backoff state of every
+    priority class. A class that backs off holds all lower classes at their minimum
+    limit for PRESSURE_SECONDS, so bulk uploads and analytics yield to real-time scoring.
+
+    Args:
+        classes: Priority class settings by name
+        endpoints: Priority class by (method, path)
+        enabled: Admit everything immediately when False
+    """
+
+    def __init__(self, classes=None, endpoints=None, enabled=ADMISSION_CONTROL):
+        self.classes = classes if classes is not None else PRIORITY_CLASSES
+        self.endpoints = endpoints if endpoints is not None else ENDPOINT_CLASSES
+        self.enabled = enabled
+        self.limiters = {}
+        self.pressure_until = {}
+
+    def limiter_for(self, method, path):
+        if not self.enabled:
+            return None
+        key = (method, path.rstrip('/') or '/')
+        priority = self.endpoints.get(key)
+        if priority is None:
+            return None
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveLimiter(f"{key[0]} {key[1]}", priority, self.classes[priority], self)
+            self.limiters[key] = limiter
+        return limiter
+
+    def signal_pressure(self, rank):
+        self.pressure_until[rank] = time.monotonic() + PRESSURE_SECONDS
+
+    def under_pressure(self, rank):
+        now = time.monotonic()
+        return any(until > now for higher, until in self.pressure_until.items() if higher < rank)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'classes_under_pressure': sorted(name for name, config in self.classes.items()
+                                             if self.pressure_until.get(config['rank'], 0) > time.monotonic()),
+            'endpoints': {limiter.name: limiter.stats() for limiter in self.limiters.values()}
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that admits classified requests through their endpoint's limiter
+    and sheds the rest with 503 and Retry-After. Latency is measured from admission
+    until the response is complete.
+    """
+
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.controller = controller if controller is not None else admission_controller
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.controller.limiter_for(scope['method'], scope['path']) if scope['type'] == 'http' else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {'detail': f"Server overloaded ({e.reason}), retry later"},
+                status_code=503,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,388 @@
+import argparse
+import fcntl
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.database import (SessionLocal, Transaction as DBTransaction, Prediction as DBPrediction, ReviewQueueItem,
+                          IdempotencyKey)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+PARTITION_STEPS = int(os.getenv("ARCHIVE_PARTITION_STEPS", "24"))  # Steps per partition, a day of PaySim hours
+RETENTION_STEPS = int(os.getenv("ARCHIVE_RETENTION_STEPS", "168"))  # Steps behind the newest one kept in the database
+ARCHIVE_INTERVAL = 3600  # Seconds between retention runs of the archiver process
+CACHED_PARTITIONS = 8  # Archive files kept loaded for queries
+DELETE_CHUNK = 5000  # Ids per DELETE statement, stays below the SQLite variable limit
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+def partition_start(step):
+    return step - step % PARTITION_STEPS
+
+
+class Archive:
+    """
+    Compressed columnar archive of transactions from old steps.
+
+    Transactions and their predictions are moved out of the database one step
+    partition at a time into a .npz file per retention run. manifest.json lists
+    the files with per-file totals, so summaries need no file access and range
+    queries only open the partitions they overlap. Rows with an item in the review
+    queue stay in the database until they have been reviewed.
+
+    Args:
+        directory: Directory holding the archive files and the manifest
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.partitions = OrderedDict()  # file -> columns, least recently used first
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def version(self):
+        # Changes whenever a retention run moved rows, other processes compare it to drop cached state
+        try:
+            return os.path.getmtime(self.manifest_path)
+        except FileNotFoundError:
+            return None
+
+    def manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def save_manifest(self, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def lock(self):
+        # One retention run at a time across the archiver and every API process sharing the directory
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load_partition(self, file):
+        columns = self.partitions.pop(file, None)
+        if columns is None:
+            with np.load(os.path.join(self.directory, file), allow_pickle=False) as data:
+                columns = {name: data[name] for name in data.files}
+        self.partitions[file] = columns
+        while len(self.partitions) > CACHED_PARTITIONS:
+            self.partitions.popitem(last=False)
+        return columns
+
+    def archivable_partitions(self, db: Session, retention_steps=RETENTION_STEPS):
+        newest_step = db.query(func.max(DBTransaction.step)).scalar()
+        if newest_step is None:
+            return []
+        # Only partitions that lie entirely before the retained steps
+        boundary = partition_start(newest_step - retention_steps)
+        start = DBTransaction.step - DBTransaction.step % PARTITION_STEPS
+        rows = (
+            db.query(start)
+            .filter(DBTransaction.step < boundary)
+            .group_by(start)
+            .order_by(start)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    def archive_partition(self, db: Session, start):
+        """
+        Move one step partition from the database into a new archive file. The
+        caller holds the archive lock, see run_retention.
+
+        Args:
+            db: Database session, committed by this method
+            start: First step of the partition
+
+        Returns:
+            The manifest entry, None if there was nothing to archive
+        """
+        end = start + PARTITION_STEPS - 1
+        rows = (
+            db.query(
+                DBTransaction.id, DBPrediction.id, DBTransaction.step, DBTransaction.amount, DBTransaction.type,
+                DBTransaction.oldbalanceOrg, DBTransaction.newbalanceOrig,
+                DBTransaction.oldbalanceDest, DBTransaction.newbalanceDest,
+                DBPrediction.prediction, DBPrediction.probability, DBPrediction.manual_review,
+                DBPrediction.reviewed, DBPrediction.reviewed_prediction, DBPrediction.reviewed_at
+            )
+            .join(DBPrediction, DBPrediction.transaction_id == DBTransaction.id)
+            .outerjoin(ReviewQueueItem, ReviewQueueItem.prediction_id == DBPrediction.id)
+            .filter(DBTransaction.step.between(start, end), ReviewQueueItem.prediction_id.is_(None))
+            .order_by(DBTransaction.id)
+            .all()
+        )
+        if not rows:
+            return None
+
+        columns = list(zip(*rows))
+        type_names, type_codes = np.unique(np.array(columns[4], dtype=str), return_inverse=True)
+        data = {
+            'transaction_ids': np.array(columns[0], dtype=np.int64),
+            'prediction_ids': np.array(columns[1], dtype=np.int64),
+            'steps': np.array(columns[2], dtype=np.int32),
+            'amounts': np.array(columns[3], dtype=np.float64),
+            'type_names': type_names,
+            'type_codes': type_codes.astype(np.uint8),
+            'balances': np.array(columns[5:9], dtype=np.float64).T,
+            'predictions': np.array(columns[9], dtype=np.int8),
+            'probabilities': np.array(columns[10], dtype=np.float64),
+            'manual_review': np.array(columns[11], dtype=bool),
+            'reviewed': np.array(columns[12], dtype=bool),
+            'reviewed_predictions': np.array([-1 if value is None else value for value in columns[13]], dtype=np.int8),
+            'reviewed_at': np.array([np.nan if value is None else value.replace(tzinfo=timezone.utc).timestamp()
+                                     for value in columns[14]], dtype=np.float64)
+        }
+
+        entries = self.manifest()
+        sequence = sum(entry['step_start'] == start for entry in entries)
+        file = f"steps_{start:07d}_{end:07d}_{sequence:03d}.npz"
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f"{file}.tmp.npz")
+        np.savez_compressed(tmp_path, **data)
+        os.replace(tmp_path, os.path.join(self.directory, file))
+
+        entry = {
+            'file': file,
+            'step_start': start,
+            'step_end': end,
+            'rows': len(rows),
+            'fraudulent': int(np.count_nonzero(data['predictions'] == 1)),
+            'manual_review': int(np.count_nonzero(data['manual_review'])),
+            'amount_sum': float(data['amounts'].sum()),
+            **self.partition_stats(data),
+            'first_transaction_id': int(data['transaction_ids'][0]),
+            'last_transaction_id': int(data['transaction_ids'][-1]),
+            'archived_at': datetime.now(timezone.utc).isoformat(),
+            'committed': False
+        }
+        # The entry is written before the rows are deleted, an interrupted run is finished by the next one
+        entries.append(entry)
+        self.save_manifest(entries)
+        self.delete_rows(db, data['transaction_ids'], data['prediction_ids'])
+        entry['committed'] = True
+        self.save_manifest(entries)
+        logging.info(f"Archived {entry['rows']} transactions of steps {start}-{end} to {file}")
+        return entry
+
+    def delete_rows(self, db: Session, transaction_ids, prediction_ids):
+        transaction_ids = transaction_ids.tolist()
+        prediction_ids = prediction_ids.tolist()
+        for i in range(0, len(transaction_ids), DELETE_CHUNK):
+            chunk = transaction_ids[i:i + DELETE_CHUNK]
+            db.query(DBPrediction).filter(DBPrediction.id.in_(prediction_ids[i:i + DELETE_CHUNK])) \
+                .delete(synchronize_session=False)
+            db.query(DBTransaction).filter(DBTransaction.id.in_(chunk)).delete(synchronize_session=False)
+            db.query(IdempotencyKey).filter(IdempotencyKey.transaction_id.in_(chunk)).delete(synchronize_session=False)
+        db.commit()
+
+    def recover(self, db: Session):
+        # Finish runs that stopped between writing an archive file and deleting its rows
+        entries = self.manifest()
+        pending = [entry for entry in entries if not entry.get('committed', True)]
+        for entry in pending:
+            columns = self.load_partition(entry['file'])
+            self.delete_rows(db, columns['transaction_ids'], columns['prediction_ids'])
+            entry['committed'] = True
+            logging.info(f"Completed interrupted archival of {entry['file']}")
+        if pending:
+            self.save_manifest(entries)
+
+    def run_retention(self, db: Session, retention_steps=RETENTION_STEPS):
+        """
+        Archive every partition older than the retention window. Blocks while
+        another process runs retention on the same directory.
+
+        Args:
+            db: Database session
+            retention_steps: Steps behind the newest step that stay in the database
+
+        Returns:
+            Manifest entries of the files written
+        """
+        with self.lock():
+            self.recover(db)
+            written = []
+            for start in self.archivable_partitions(db, retention_steps):
+                entry = self.archive_partition(db, start)
+                if entry is not None:
+                    written.append(entry)
+        return written
+
+    @staticmethod
+    def partition_stats(columns):
+        # Extremes and per-step counts of a partition, so dashboard aggregates never open archive files
+        steps, inverse = np.unique(columns['steps'], return_inverse=True)
+        fraudulent = np.bincount(inverse, weights=columns['predictions'] == 1, minlength=len(steps)).astype(int)
+        legitimate = np.bincount(inverse, minlength=len(steps)) - fraudulent
+        return {
+            'amount_min': float(columns['amounts'].min()),
+            'amount_max': float(columns['amounts'].max()),
+            'step_counts': [[int(step), int(legit), int(fraud)]
+                            for step, legit, fraud in zip(steps, legitimate, fraudulent)]
+        }
+
+    def aggregates(self):
+        """
+        Totals over every archived partition for the dashboard, read from the manifest.
+        Partitions archived before the manifest held per-step counts are read from their files.
+        """
+        # Rows of an interrupted run are still in the database, counting them here would count them twice
+        entries = [entry for entry in self.manifest() if entry.get('committed', True)]
+        stats = [entry if 'step_counts' in entry else self.partition_stats(self.load_partition(entry['file']))
+                 for entry in entries]
+        step_counts = {}
+        for entry in stats:
+            for step, legitimate, fraudulent in entry['step_counts']:
+                counts = step_counts.setdefault(step, [0, 0])
+                counts[0] += legitimate
+                counts[1] += fraudulent
+        return {
+            'partitions': len(entries),
+            'rows': sum(entry['rows'] for entry in entries),
+            'fraudulent': sum(entry['fraudulent'] for entry in entries),
+            'amount_sum': sum(entry['amount_sum'] for entry in entries),
+            'amount_min': min((entry['amount_min'] for entry in stats), default=None),
+            'amount_max': max((entry['amount_max'] for entry in stats), default=None),
+            'step_counts': step_counts
+        }
+
+    def summary(self):
+        entries = self.manifest()
+        return {
+            'partitions': entries,
+            'rows': sum(entry['rows'] for entry in entries),
+            'fraudulent': sum(entry['fraudulent'] for entry in entries),
+            'amount_sum': sum(entry['amount_sum'] for entry in entries)
+        }
+
+    def query(self, step_start=None, step_end=None, manual_review=None, offset=0, limit=15):
+        """
+        Page through archived transactions, ordered by step partition and transaction id.
+
+        Args:
+            step_start: First step to include
+            step_end: Last step to include
+            manual_review: Only rows with this manual review flag
+            offset: Rows to skip
+            limit: Maximum rows returned
+
+        Returns:
+            Tuple of the row dicts and the total number of matching rows
+        """
+        entries = [
+            entry for entry in self.manifest()
+            if (step_start is None or entry['step_end'] >= step_start)
+            and (step_end is None or entry['step_start'] <= step_end)
+        ]
+        entries.sort(key=lambda entry: (entry['step_start'], entry['first_transaction_id']))
+
+        total = 0
+        data = []
+        for entry in entries:
+            cut = ((step_start is not None and entry['step_start'] < step_start)
+                   or (step_end is not None and entry['step_end'] > step_end))
+            matches = None
+            if cut:
+                matches = self.matching(self.load_partition(entry['file']), step_start, step_end, manual_review)
+                count = len(matches)
+            elif manual_review is None:
+                # Whole files match, the manifest has the counts
+                count = entry['rows']
+            else:
+                count = entry['manual_review'] if manual_review else entry['rows'] - entry['manual_review']
+
+            skip = max(0, offset - total)
+            take = limit - len(data)
+            if take > 0 and skip < count:
+                columns = self.load_partition(entry['file'])
+                if matches is None:
+                    matches = self.matching(columns, step_start, step_end, manual_review)
+                data.extend(self.rows(columns, matches[skip:skip + take]))
+            total += count
+        return data, total
+
+    @staticmethod
+    def matching(columns, step_start, step_end, manual_review):
+        mask = np.ones(len(columns['steps']), dtype=bool)
+        if step_start is not None:
+            mask &= columns['steps'] >= step_start
+        if step_end is not None:
+            mask &= columns['steps'] <= step_end
+        if manual_review is not None:
+            mask &= columns['manual_review'] == manual_review
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def rows(columns, indices):
+        type_names = columns['type_names']
+        return [
+            {
+                'id': int(columns['transaction_ids'][i]),
+                'prediction_id': int(columns['prediction_ids'][i]),
+                'step': int(columns['steps'][i]),
+                'amount': float(columns['amounts'][i]),
+                'type': str(type_names[columns['type_codes'][i]]),
+                'oldbalanceOrg': float(columns['balances'][i, 0]),
+                'newbalanceOrig': float(columns['balances'][i, 1]),
+                'oldbalanceDest': float(columns['balances'][i, 2]),
+                'newbalanceDest': float(columns['balances'][i, 3]),
+                'prediction': int(columns['predictions'][i]),
+                'probability': float(columns['probabilities'][i]),
+                'manual_review': bool(columns['manual_review'][i]),
+                'reviewed_prediction': (int(columns['reviewed_predictions'][i])
+                                        if columns['reviewed'][i] else None)
+            }
+            for i in indices
+        ]
+
+
+archive = Archive()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Move old step partitions from the database into the archive")
+    parser.add_argument("--retention-steps", type=int, default=RETENTION_STEPS,
+                        help="Steps behind the newest step kept in the database")
+    parser.add_argument("--interval", type=int, default=ARCHIVE_INTERVAL, help="Seconds between retention runs")
+    parser.add_argument("--once", action="store_true", help="Run retention once and exit")
+    args = parser.parse_args()
+
+    while True:
+        session = SessionLocal()
+        try:
+            archived = archive.run_retention(session, args.retention_steps)
+            logging.info(f"Retention run archived {sum(entry['rows'] for entry in archived)} transactions")
+        except Exception:
+            logging.exception("Retention run failed")
+        finally:
+            session.close()
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+from sqlalchemy import case
+
+BINNING_METHODS = ['log', 'quantile', 'linear']
+QUANTILE_SAMPLE_SIZE = 10000  # Values sampled from the table to place quantile bin edges
+
+
+def log_edges(low, high, max_bins):
+    # Geometric bins from 1 (or the minimum) up to the maximum, zeros fall in the first bin
+    start = max(low, 1.0)
+    if high <= start:
+        return np.array([low, high], dtype=np.float64)
+    edges = np.geomspace(start, high, max_bins + 1)
+    edges[0] = low
+    return edges
+
+
+def linear_edges(low, high, max_bins):
+    if high <= low:
+        return np.array([low, high], dtype=np.float64)
+    return np.linspace(low, high, max_bins + 1)
+
+
+def quantile_edges(sample, low, high, max_bins):
+    # Equal-count bins, edges shared by repeated values (e.g. many zero balances) are merged
+    if len(sample) == 0 or high <= low:
+        return np.array([low, high], dtype=np.float64)
+    inner = np.quantile(np.asarray(sample, dtype=np.float64), np.linspace(0, 1, max_bins + 1)[1:-1])
+    return np.unique(np.concatenate([[low], inner, [high]]))
+
+
+def sample_column(db, column, id_column, total, sample_size=QUANTILE_SAMPLE_SIZE):
+    # Every n-th row by primary key, a bounded sample without sorting the table
+    stride = max(1, math.ceil(total / sample_size))
+    return [row[0] for row in db.query(column).filter(id_column % stride == 0).limit(sample_size).all()]
+
+
+def compute_edges(method, db, column, id_column, low, high, total, max_bins):
+    """
+    Bin edges for a column, derived from its range or a sample of its values.
+
+    Args:
+        method: One of BINNING_METHODS
+        db: Database session
+        column: Column to bin
+        id_column: Primary key used to sample the column
+        low: Minimum of the column
+        high: Maximum of the column
+        total: Number of rows
+        max_bins: Upper bound on the number of bins
+    """
+    if method == 'log':
+        return log_edges(low, high, max_bins)
+    if method == 'linear':
+        return linear_edges(low, high, max_bins)
+    return quantile_edges(sample_column(db, column, id_column, total), low, high, max_bins)
+
+
+def bin_expression(column, edges):
+    # Bin index computed in the database, so only one row per non-empty bin is returned
+    inner = edges[1:-1]
+    if len(inner) == 0:
+        return case((column.is_(None), 0), else_=0)
+    return case(*[(column < float(edge), i) for i, edge in enumerate(inner)], else_=len(inner))
+
+
+def step_bucket_size(first_step, last_step, max_steps):
+    return max(1, math.ceil((last_step - first_step + 1) / max_steps))
+
+
+def step_expression(step_column, first_step, bucket_size):
+    if bucket_size == 1:
+        return step_column
+    # Integer division, every bucket is labelled with its first step
+    return first_step + (step_column - first_step) // bucket_size * bucket_size
+
+
+def range_label(low, high):
+    return f"{int(low):,} - {int(high):,}"
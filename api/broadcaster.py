@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+
+from sqlalchemy import func, case
+
+from api.archive import archive
+from api.database import SessionLocal, Transaction as DBTransaction, Prediction as DBPrediction
+
+POLL_INTERVAL = 1.0  # Seconds between checks for newly scored transactions
+SUBSCRIBER_QUEUE_SIZE = 100  # Events buffered per client before it is told to resync
+MAX_PUSHED_TRANSACTIONS = 50  # Newest transactions included in a transactions event
+
+
+class Broadcaster:
+    """
+    Fans out dashboard updates to all connected clients.
+
+    A single background task tails the predictions table by primary key, so it
+    also sees transactions stored by other API processes and the stream worker.
+    Each delta is computed and serialised once and the same message is handed to
+    every subscriber.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.last_prediction_id = None
+        self.task = None
+
+    def subscribe(self):
+        subscriber = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(subscriber)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.tail())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        if not self.subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow client: drop what it has buffered and make it refetch everything
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait("event: resync\ndata: {}\n\n")
+
+    async def tail(self):
+        logging.info("Broadcaster started")
+        # Rows stored while nobody was connected are already in what a new client fetches,
+        # the first poll only sets the baseline
+        self.last_prediction_id = None
+        archive_version = archive.version()
+        try:
+            while self.subscribers:
+                if archive.version() != archive_version:
+                    # Old transactions moved to the archive, counts and lists must be refetched
+                    archive_version = archive.version()
+                    self.publish("resync", {})
+                try:
+                    deltas = await asyncio.to_thread(self.collect_deltas)
+                except Exception:
+                    logging.exception("Failed to collect dashboard updates")
+                    deltas = None
+                if deltas is not None:
+                    self.publish("transactions", deltas["transactions"])
+                    self.publish("buckets", deltas["buckets"])
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            self.last_prediction_id = None
+            logging.info("Broadcaster stopped, no subscribers left")
+
+    def collect_deltas(self):
+        db = SessionLocal()
+        try:
+            newest_id = db.query(func.max(DBPrediction.id)).scalar() or 0
+            if self.last_prediction_id is None or newest_id < self.last_prediction_id:
+                self.last_prediction_id = newest_id
+                return None
+            if newest_id == self.last_prediction_id:
+                return None
+
+            new_range = (DBPrediction.id > self.last_prediction_id, DBPrediction.id <= newest_id)
+            self.last_prediction_id = newest_id
+
+            # Bucket increments for all new rows are computed in the database, the
+            # transaction list is capped so a large upload stays a small message
+            step_counts = (
+                db.query(
+                    DBTransaction.step,
+                    func.sum(case((DBPrediction.prediction == 0, 1), else_=0)),
+                    func.sum(case((DBPrediction.prediction == 1, 1), else_=0)),
+                    func.sum(DBTransaction.amount),
+                    func.min(DBTransaction.amount),
+                    func.max(DBTransaction.amount)
+                )
+                .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+                .filter(*new_range)
+                .group_by(DBTransaction.step)
+                .all()
+            )
+            newest = (
+                db.query(DBTransaction, DBPrediction)
+                .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+                .filter(*new_range)
+                .order_by(DBPrediction.id.desc())
+                .limit(MAX_PUSHED_TRANSACTIONS)
+                .all()
+            )
+        finally:
+            db.close()
+
+        legitimate = sum(int(row[1] or 0) for row in step_counts)
+        fraudulent = sum(int(row[2] or 0) for row in step_counts)
+        return {
+            "transactions": {
+                "count": legitimate + fraudulent,
+                "data": [
+                    {
+                        "id": transaction.id,
+                        "prediction_id": prediction.id,
+                        "step": transaction.step,
+                        "amount": transaction.amount,
+                        "type": transaction.type,
+                        "prediction": prediction.prediction,
+                        "probability": prediction.probability,
+                        "manual_review": prediction.manual_review
+                    }
+                    for transaction, prediction in newest
+                ]
+            },
+            "buckets": {
+                "steps": [[row[0], int(row[1] or 0), int(row[2] or 0)] for row in step_counts],
+                "legitimate": legitimate,
+                "fraudulent": fraudulent,
+                "amountSum": float(sum(row[3] or 0 for row in step_counts)),
+                "minAmount": min((row[4] for row in step_counts if row[4] is not None), default=None),
+                "maxAmount": max((row[5] for row in step_counts if row[5] is not None), default=None)
+            }
+        }
+
+
+broadcaster = Broadcaster()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, Boolean
+from sqlalchemy import create_engine, Column, Integer, Float, String, Boolean, DateTime
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -13,7 +13,7 @@ class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    step = Column(Integer)
+    step = Column(Integer, index=True)
     amount = Column(Float)
     type = Column(String)
     oldbalanceOrg = Column(Float)
@@ -26,12 +26,52 @@ class Prediction(Base):
     __tablename__ = "predictions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    transaction_id = Column(Integer)
+    transaction_id = Column(Integer, index=True)
     prediction = Column(Integer)
     probability = Column(Float)
     manual_review = Column(Boolean, default=False)
     reviewed = Column(Boolean, default=False)
     reviewed_prediction = Column(Integer, nullable=True)
+    reviewed_at = Column(DateTime, nullable=True, index=True)
+
+
+class ReviewQueueItem(Base):
+    __tablename__ = "review_queue"
+
+    prediction_id = Column(Integer, primary_key=True)
+    transaction_id = Column(Integer)
+    probability = Column(Float)
+    amount = Column(Float)
+    priority = Column(Float, index=True)
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(Float, default=0.0)  # Unix time, 0 when unclaimed
+    enqueued_at = Column(Float)
+
+
+class ReviewQueueStats(Base):
+    __tablename__ = "review_queue_stats"
+
+    id = Column(Integer, primary_key=True)
+    depth = Column(Integer, default=0)
+    enqueued_total = Column(Integer, default=0)
+    completed_total = Column(Integer, default=0)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0)  # Bumped whenever stored predictions change in place
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    transaction_id = Column(Integer)
+    prediction_id = Column(Integer)
+    request_hash = Column(String)  # Transaction the key was first used with, replays must match it
+    created_at = Column(DateTime)
 
 
 Base.metadata.create_all(bind=engine)
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import socket
+import time
+
+from models.drift import DriftReference
+
+DRIFT_DIR = os.getenv("DRIFT_DIR", "models/drift")  # Live sketches of every scoring process are shared here
+DRIFT_WINDOW_SECONDS = int(os.getenv("DRIFT_WINDOW_SECONDS", "3600"))  # Live sketches cover the last one to two windows
+DRIFT_FLUSH_INTERVAL = 30  # Seconds between writes of this process's sketch
+MIN_LIVE_ROWS = 500  # Rows needed before drift is reported
+
+
+class DriftMonitor:
+    """
+    Live input and probability sketches of this process, compared against the
+    reference stored in the model artifact.
+
+    Scored rows are added to the current window's sketch. Windows rotate every
+    window_seconds and the last two are kept, so the comparison follows recent
+    traffic with a fixed amount of memory. Every process writes its sketch to
+    the drift directory and reports merge the sketches of all processes that
+    share the same reference.
+
+    Args:
+        directory: Directory the sketches are written to
+        window_seconds: Length of a window
+    """
+
+    def __init__(self, directory=DRIFT_DIR, window_seconds=DRIFT_WINDOW_SECONDS):
+        self.directory = directory
+        self.window_seconds = window_seconds
+        self.path = os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}.json")
+        self.reference_source = None
+        self.reference = None
+        self.current = None
+        self.previous = None
+        self.window_started = 0.0
+        self.last_flush = 0.0
+
+    def use_reference(self, model):
+        # Rebinned whenever a model with a different reference is loaded
+        source = getattr(model, 'drift_reference', None)
+        if source is self.reference_source:
+            return self.reference is not None
+        self.reference_source = source
+        self.reference = DriftReference.from_dict(source) if source is not None else None
+        self.current = self.reference.new_sketch() if self.reference is not None else None
+        self.previous = None
+        self.window_started = time.time()
+        return self.reference is not None
+
+    def observe(self, model, frame, probabilities):
+        if not self.use_reference(model):
+            return
+        self.rotate()
+        self.current.update(frame, probabilities)
+        self.maybe_flush()
+
+    def observe_record(self, model, record, probability):
+        if not self.use_reference(model):
+            return
+        self.rotate()
+        self.current.update_record(record, probability)
+        self.maybe_flush()
+
+    def rotate(self):
+        now = time.time()
+        if now - self.window_started < self.window_seconds:
+            return
+        # Skip windows without traffic entirely instead of keeping a stale previous window
+        self.previous = self.current if now - self.window_started < 2 * self.window_seconds else None
+        self.current = self.reference.new_sketch()
+        self.window_started = now
+
+    def live_sketch(self):
+        sketch = self.reference.new_sketch()
+        sketch.merge(self.current)
+        if self.previous is not None:
+            sketch.merge(self.previous)
+        return sketch
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= DRIFT_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'reference_id': self.reference.reference_id,
+                           'counts': self.live_sketch().counts_dict()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logging.exception("Failed to write the drift sketch")
+
+    def merged_sketch(self):
+        # This process's sketch plus the recent sketches of other processes with the same reference
+        self.rotate()
+        sketch = self.live_sketch()
+        if not os.path.isdir(self.directory):
+            return sketch, 1
+        processes = 1
+        cutoff = time.time() - 2 * self.window_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".json") or path == self.path:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    continue
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data['reference_id'] != self.reference.reference_id:
+                continue
+            sketch.merge(self.reference.new_sketch().load_counts(data['counts']))
+            processes += 1
+        return sketch, processes
+
+    def report(self, model):
+        if not self.use_reference(model):
+            return {'status': 'no_reference',
+                    'detail': 'The model artifact has no drift reference, retrain the model to add one'}
+        sketch, processes = self.merged_sketch()
+        report = {
+            'reference_id': self.reference.reference_id,
+            'reference_rows': self.reference.sketch.rows,
+            'live_rows': sketch.rows,
+            'processes': processes,
+            'window_seconds': self.window_seconds
+        }
+        if sketch.rows < MIN_LIVE_ROWS:
+            report['status'] = 'insufficient_data'
+            return report
+
+        features = self.reference.compare(sketch)
+        drifted = [name for name, result in features.items() if result['status'] == 'significant']
+        report.update({
+            'status': 'drift' if drifted else 'stable',
+            'drifted': drifted,
+            'features': features
+        })
+        return report
+
+
+drift_monitor = DriftMonitor()
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from api.admission import admission_controller
+
+router = APIRouter()
+
+
+@router.get("/admission")
+async def get_admission_stats():
+    return admission_controller.stats()
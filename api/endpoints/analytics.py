@@ -1,110 +1,175 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import func, case
 from sqlalchemy.orm import Session
+from api.archive import archive
+from api.binning import BINNING_METHODS, bin_expression, compute_edges, range_label, step_bucket_size, step_expression
 from api.database import get_db
 from api.database import Transaction as DBTransaction, Prediction as DBPrediction
 
+DEFAULT_MAX_BINS = 30  # Bins per amount and balance histogram
+MAX_BINS = 200
+DEFAULT_MAX_STEPS = 250  # Points in the step distribution, steps are merged into ranges beyond this
+MAX_STEPS = 2000
+
 router = APIRouter()
 
 
-@router.get("/transactions/analytics")
-async def get_transaction_analytics(db: Session = Depends(get_db)):
-    step_distribution = (
-        db.query(
-            DBTransaction.step,
-            func.sum(case((DBPrediction.prediction == 0, 1), else_=0)).label('legitimate'),
-            func.sum(case((DBPrediction.prediction == 1, 1), else_=0)).label('fraudulent')
-        )
+def binned_rows(db, column, edges, *columns):
+    bin_index = bin_expression(column, edges)
+    return (
+        db.query(bin_index.label('bin'), *columns)
         .select_from(DBTransaction)
         .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
-        .group_by(DBTransaction.step)
-        .order_by(DBTransaction.step)
+        .group_by(bin_index)
+        .order_by(bin_index)
         .all()
     )
 
-    step_distribution = [
-        {
-            "step": row[0],
-            "legitimate": int(row[1]) if row[1] is not None else 0,
-            "fraudulent": int(row[2]) if row[2] is not None else 0
-        }
-        for row in step_distribution
-    ]
-
-    legitimate_count = sum(row["legitimate"] for row in step_distribution)
-    fraudulent_count = sum(row["fraudulent"] for row in step_distribution)
-    total_transactions = legitimate_count + fraudulent_count
-    fraudulent_percentage = round(fraudulent_count / total_transactions * 100, 2) if total_transactions > 0 else 0
-
-    # -5 to round the values to the nearest 10,000
-    balance_distribution = (
-        db.query(
-            func.round(DBTransaction.oldbalanceOrg, -5).label('balance_range'),
-            func.sum(case((DBPrediction.prediction == 0, 1), else_=0)).label('legitimate'),
-            func.sum(case((DBPrediction.prediction == 1, 1), else_=0)).label('fraudulent'),
-            func.avg(DBTransaction.oldbalanceOrg).label('avg_balance')
-        )
-        .select_from(DBTransaction)
-        .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
-        .group_by(func.round(DBTransaction.oldbalanceOrg, -5))
-        .order_by(func.round(DBTransaction.oldbalanceOrg, -5))
-        .all()
-    )
 
-    balance_distribution = [
-        {
-            "balanceRange": f"{int(row[0]):,} - {int(row[0] + 100000):,}",
-            "legitimate": int(row[1]) if row[1] is not None else 0,
-            "fraudulent": int(row[2]) if row[2] is not None else 0,
-            "avgBalance": float(row[3]) if row[3] is not None else 0
-        }
-        for row in balance_distribution
-    ]
+@router.get("/transactions/analytics")
+async def get_transaction_analytics(
+        max_bins: int = Query(DEFAULT_MAX_BINS, ge=1, le=MAX_BINS),
+        max_steps: int = Query(DEFAULT_MAX_STEPS, ge=1, le=MAX_STEPS),
+        binning: str = Query("log", pattern=f"^({'|'.join(BINNING_METHODS)})$"),
+        db: Session = Depends(get_db)
+):
+    """
+    Dashboard aggregates with a bounded number of rows per distribution.
 
-    # -2 to round the values to the nearest 100
-    amount_distribution = (
-        db.query(
-            func.round(DBTransaction.amount, -2).label('amount_range'),
-            func.count().label('count')
-        )
-        .select_from(DBTransaction)
-        .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
-        .group_by(func.round(DBTransaction.amount, -2))
-        .order_by(func.round(DBTransaction.amount, -2))
-        .all()
-    )
+    Amount and balance bins are placed from the data's range ('log' and 'linear')
+    or from a sample of its values ('quantile'), so the histograms keep their
+    shape and size however the values are spread.
 
-    amount_distribution = [
-        {
-            "amountRange": f"{int(row[0]):,} - {int(row[0] + 100):,}",
-            "count": int(row[1]) if row[1] is not None else 0
-        }
-        for row in amount_distribution
-    ]
+    Totals, summary statistics and the step distribution include archived
+    partitions, merged from the archive manifest. The amount and balance
+    histograms only cover transactions still in the database.
 
+    Args:
+        max_bins: Upper bound on the bins per histogram
+        max_steps: Upper bound on the step distribution points
+        binning: How the bin edges are placed
+    """
     basic_stats = (
         db.query(
-            func.avg(DBTransaction.amount).label('avg_amount'),
+            func.sum(DBTransaction.amount).label('amount_sum'),
             func.min(DBTransaction.amount).label('min_amount'),
             func.max(DBTransaction.amount).label('max_amount'),
-            func.count(DBTransaction.amount).label('total_count')
+            func.count(DBTransaction.amount).label('total_count'),
+            func.min(DBTransaction.oldbalanceOrg).label('min_balance'),
+            func.max(DBTransaction.oldbalanceOrg).label('max_balance'),
+            func.min(DBTransaction.step).label('first_step'),
+            func.max(DBTransaction.step).label('last_step')
         )
         .select_from(DBTransaction)
         .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
         .first()
     )
+    total_count = int(basic_stats[3]) if basic_stats[3] is not None else 0
+    archived = archive.aggregates()
+
+    step_distribution = []
+    balance_distribution = []
+    amount_distribution = []
+    step_size = 1
+    steps = list(archived['step_counts'])
+    if total_count > 0:
+        steps += [basic_stats[6], basic_stats[7]]
+    if steps:
+        first_step, last_step = min(steps), max(steps)
+        step_size = step_bucket_size(first_step, last_step, max_steps)
+        buckets = {}
+        if total_count > 0:
+            step_start = step_expression(DBTransaction.step, first_step, step_size)
+            rows = (
+                db.query(
+                    step_start.label('step_start'),
+                    func.sum(case((DBPrediction.prediction == 0, 1), else_=0)).label('legitimate'),
+                    func.sum(case((DBPrediction.prediction == 1, 1), else_=0)).label('fraudulent')
+                )
+                .select_from(DBTransaction)
+                .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+                .group_by(step_start)
+                .all()
+            )
+            for row in rows:
+                buckets[int(row[0])] = [int(row[1] or 0), int(row[2] or 0)]
+        for step, (legitimate, fraudulent) in archived['step_counts'].items():
+            counts = buckets.setdefault(step_expression(step, first_step, step_size), [0, 0])
+            counts[0] += legitimate
+            counts[1] += fraudulent
+        step_distribution = [
+            {
+                "step": start,
+                "stepEnd": start + step_size - 1,
+                "legitimate": legitimate,
+                "fraudulent": fraudulent
+            }
+            for start, (legitimate, fraudulent) in sorted(buckets.items())
+        ]
+
+    if total_count > 0:
+        edges = compute_edges(binning, db, DBTransaction.oldbalanceOrg, DBTransaction.id,
+                              float(basic_stats[4]), float(basic_stats[5]), total_count, max_bins)
+        rows = binned_rows(
+            db, DBTransaction.oldbalanceOrg, edges,
+            func.sum(case((DBPrediction.prediction == 0, 1), else_=0)).label('legitimate'),
+            func.sum(case((DBPrediction.prediction == 1, 1), else_=0)).label('fraudulent'),
+            func.avg(DBTransaction.oldbalanceOrg).label('avg_balance')
+        )
+        balance_distribution = [
+            {
+                "balanceRange": range_label(edges[row[0]], edges[row[0] + 1]),
+                "min": float(edges[row[0]]),
+                "max": float(edges[row[0] + 1]),
+                "legitimate": int(row[1]) if row[1] is not None else 0,
+                "fraudulent": int(row[2]) if row[2] is not None else 0,
+                "avgBalance": float(row[3]) if row[3] is not None else 0
+            }
+            for row in rows
+        ]
+
+        edges = compute_edges(binning, db, DBTransaction.amount, DBTransaction.id,
+                              float(basic_stats[1]), float(basic_stats[2]), total_count, max_bins)
+        rows = binned_rows(db, DBTransaction.amount, edges, func.count().label('count'))
+        amount_distribution = [
+            {
+                "amountRange": range_label(edges[row[0]], edges[row[0] + 1]),
+                "min": float(edges[row[0]]),
+                "max": float(edges[row[0] + 1]),
+                "count": int(row[1]) if row[1] is not None else 0
+            }
+            for row in rows
+        ]
+
+    legitimate_count = sum(row["legitimate"] for row in step_distribution)
+    fraudulent_count = sum(row["fraudulent"] for row in step_distribution)
+    total_transactions = legitimate_count + fraudulent_count
+    fraudulent_percentage = round(fraudulent_count / total_transactions * 100, 2) if total_transactions > 0 else 0
+
+    amount_sum = (float(basic_stats[0]) if basic_stats[0] is not None else 0) + archived['amount_sum']
+    amount_mins = [value for value in (basic_stats[1], archived['amount_min']) if value is not None]
+    amount_maxs = [value for value in (basic_stats[2], archived['amount_max']) if value is not None]
 
     return {
         "stepDistribution": step_distribution,
+        "stepBucketSize": step_size,
         "legitimateCount": legitimate_count,
         "fraudulentCount": fraudulent_count,
         "fraudulentPercentage": fraudulent_percentage,
         "balanceDistribution": balance_distribution,
         "amountDistribution": amount_distribution,
+        "binning": binning,
         "summaryStats": {
-            "avgAmount": float(basic_stats[0]) if basic_stats[0] is not None else 0,
-            "minAmount": float(basic_stats[1]) if basic_stats[1] is not None else 0,
-            "maxAmount": float(basic_stats[2]) if basic_stats[2] is not None else 0,
-            "totalTransactions": int(basic_stats[3]) if basic_stats[3] is not None else 0
+            "avgAmount": amount_sum / total_transactions if total_transactions > 0 else 0,
+            "minAmount": float(min(amount_mins)) if amount_mins else 0,
+            "maxAmount": float(max(amount_maxs)) if amount_maxs else 0,
+            "totalTransactions": total_transactions
+        },
+        "archived": {
+            "transactions": archived['rows'],
+            "fraudulent": archived['fraudulent'],
+            "partitions": archived['partitions'],
+            # Histograms are binned in the database, archived rows are only in the totals and steps
+            "inHistograms": False
         }
     }
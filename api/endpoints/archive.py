@@ -0,0 +1,52 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from api.archive import archive, RETENTION_STEPS
+from api.database import SessionLocal
+from api.endpoints.transactions import pagination_metadata
+from api.hot_window import hot_window
+
+router = APIRouter()
+
+
+@router.get("/archive")
+async def get_archive_summary():
+    return archive.summary()
+
+
+@router.get("/archive/transactions")
+async def get_archived_transactions(
+        page: int = Query(default=1, ge=1),
+        page_size: int = Query(default=15, ge=1, le=1000),
+        step_start: Optional[int] = Query(default=None, ge=0),
+        step_end: Optional[int] = Query(default=None, ge=0),
+        manual_review: Optional[bool] = Query(default=None)
+):
+    data, total_count = archive.query(step_start, step_end, manual_review,
+                                      offset=(page - 1) * page_size, limit=page_size)
+    return {
+        "data": data,
+        "pagination": pagination_metadata(total_count, page, page_size)
+    }
+
+
+def run_retention_in_session(retention_steps):
+    # Runs in a worker thread with its own session, the request's session belongs to the event loop thread
+    db = SessionLocal()
+    try:
+        return archive.run_retention(db, retention_steps)
+    finally:
+        db.close()
+
+
+@router.post("/archive/run")
+async def run_retention(retention_steps: int = Query(default=RETENTION_STEPS, ge=0)):
+    # Archiving rewrites files and deletes rows in bulk, and may wait for another process's run
+    archived = await asyncio.to_thread(run_retention_in_session, retention_steps)
+    if archived:
+        hot_window.invalidate()
+    return {
+        "archived_partitions": archived,
+        "archived_rows": sum(entry['rows'] for entry in archived)
+    }
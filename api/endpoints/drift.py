@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from api.drift_monitor import drift_monitor
+from models.inference import get_model
+
+router = APIRouter()
+
+
+@router.get("/drift")
+async def get_drift_report():
+    return drift_monitor.report(get_model())
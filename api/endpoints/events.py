@@ -0,0 +1,32 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from api.broadcaster import broadcaster
+
+router = APIRouter()
+
+HEARTBEAT_INTERVAL = 15  # Seconds between keep-alive comments on an idle stream
+
+
+@router.get("/events")
+async def stream_events():
+    subscriber = broadcaster.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    message = ": ping\n\n"
+                yield message
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
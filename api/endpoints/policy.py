@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import and_, case, literal, not_, select
+from sqlalchemy.orm import Session
+from api import review_queue
+from api.broadcaster import broadcaster
+from api.database import get_db
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+from api.hot_window import hot_window, bump_data_version
+from api.schemas import DecisionPolicyInput
+from models.decision_policy import DecisionPolicy, get_policy, set_policy
+
+router = APIRouter()
+
+
+@router.get("/policy")
+async def get_decision_policy():
+    return get_policy().to_dict()
+
+
+@router.put("/policy")
+async def update_decision_policy(
+        policy_input: DecisionPolicyInput,
+        reapply: bool = True,
+        db: Session = Depends(get_db)
+):
+    if policy_input.review_lower > policy_input.review_upper:
+        raise HTTPException(status_code=400, detail="review_lower must not exceed review_upper")
+    if any(not 0 <= threshold <= 1 for threshold in policy_input.type_thresholds.values()):
+        raise HTTPException(status_code=400, detail="Thresholds must be between 0 and 1")
+
+    policy = DecisionPolicy(**policy_input.model_dump())
+    previous_policy = get_policy()
+    # Review priorities are computed from the active policy, so it is switched before re-applying
+    set_policy(policy)
+
+    updated_predictions = 0
+    queue_changes = (0, 0)
+    if reapply:
+        try:
+            updated_predictions = apply_policy(db, policy)
+            queue_changes = review_queue.resync(db)
+            bump_data_version(db)
+            db.commit()
+        except Exception:
+            # Never leave the new policy in place over decisions made with the old one
+            db.rollback()
+            set_policy(previous_policy)
+            raise
+        hot_window.invalidate()
+        # Every stored decision may have changed, clients refetch instead of applying deltas
+        broadcaster.publish("resync", {})
+
+    return {
+        "policy": policy.to_dict(),
+        "updated_predictions": updated_predictions,
+        "review_queue": {"removed": queue_changes[0], "added": queue_changes[1]}
+    }
+
+
+def apply_policy(db: Session, policy: DecisionPolicy):
+    # Re-decide every stored prediction from its stored probability in a single UPDATE
+    if policy.type_thresholds:
+        transaction_type = (
+            select(DBTransaction.type)
+            .where(DBTransaction.id == DBPrediction.transaction_id)
+            .scalar_subquery()
+        )
+        threshold = case(policy.type_thresholds, value=transaction_type, else_=policy.threshold)
+    else:
+        threshold = literal(policy.threshold)
+
+    is_fraud = DBPrediction.probability > threshold
+    return db.query(DBPrediction).update({
+        DBPrediction.prediction: case((is_fraud, 1), else_=0),
+        DBPrediction.manual_review: and_(
+            not_(is_fraud),
+            DBPrediction.probability.between(policy.review_lower, policy.review_upper)
+        )
+    }, synchronize_session=False)
@@ -1,32 +1,117 @@
 import asyncio
 import logging
+import time
+from datetime import datetime, timezone
 from io import StringIO
+from typing import Optional
 import pandas as pd
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Header, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from api.broadcaster import broadcaster
 from api.database import get_db
-from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+from api.drift_monitor import drift_monitor
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, IdempotencyKey
+from api.hot_window import hot_window, bump_data_version
+from api.inference_pool import inference_pool, InferencePoolError
+from api.payloads import RESULT_DTYPE, decode_transactions, encode_results
+from api.persistence import save_scored_batch, TRANSACTION_FIELDS
+from api.prediction_cache import prediction_cache
+from api import review_queue
 from api.schemas import TransactionInput
-from models.train_paysim_model import FraudDetectionModel
+from api.validation import validate_transactions
+from models.decision_policy import reload_policy_if_changed, get_policy_version
+from models.inference import InferenceModel, get_model
 
 router = APIRouter()
 
 CHUNK_SIZE = 1000  # Process 1000 rows at a time
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB limit
 MAX_ROWS = 100000  # Maximum number of rows allowed
-
-model = FraudDetectionModel()
-model.load_model("models/fraud_model.pkl")
-
-
-async def process_file_in_background(db: Session, content: str):
-    df = pd.read_csv(StringIO(content))
-
+MODEL_RELOAD_INTERVAL = 30  # Seconds between checks for an updated model file
+
+last_reload_check = time.monotonic()
+
+
+def refresh_model():
+    # Pick up models written by the incremental updater and policies applied by
+    # other API processes without restarting
+    global last_reload_check
+    now = time.monotonic()
+    if now - last_reload_check < MODEL_RELOAD_INTERVAL:
+        return
+    last_reload_check = now
+    try:
+        if get_model().reload_if_changed():
+            prediction_cache.clear()
+        if reload_policy_if_changed():
+            prediction_cache.clear()
+    except Exception:
+        logging.exception("Failed to reload updated model or policy, keeping the current one")
+
+
+async def score_frame(frame: pd.DataFrame, model: InferenceModel):
+    # The classifier runs in the inference pool when one is configured, calibration and
+    # the decision policy are applied here so they always match this process
+    if inference_pool.running:
+        raw_probabilities = await inference_pool.predict_raw(frame)
+        return model.get_decision_table().lookup(raw_probabilities, frame['type'].to_numpy())
+    return model.score(frame)
+
+
+async def cached_predict(features: dict):
+    # Retried and replayed transactions skip the model, entries from an older model or policy are dropped
+    model = get_model()
+    prediction_cache.set_version((model.model_mtime, get_policy_version()))
+    key = prediction_cache.key(features)
+    result = prediction_cache.get(key)
+    if result is None:
+        if inference_pool.running:
+            probabilities, predictions = await score_frame(pd.DataFrame([features]), model)
+            result = {'prediction': int(predictions[0]), 'probability': float(probabilities[0])}
+        else:
+            result = model.predict_proba(features)
+        prediction_cache.put(key, result)
+    return result
+
+
+def stored_prediction(db: Session, idempotency_key: str, request_hash: str):
+    row = (
+        db.query(DBTransaction, DBPrediction, IdempotencyKey.request_hash)
+        .join(IdempotencyKey, IdempotencyKey.transaction_id == DBTransaction.id)
+        .join(DBPrediction, DBPrediction.id == IdempotencyKey.prediction_id)
+        .filter(IdempotencyKey.key == idempotency_key)
+        .first()
+    )
+    if row is None:
+        return None
+
+    transaction, prediction, stored_hash = row
+    if stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different transaction")
+    return {
+        'step': transaction.step,
+        'amount': transaction.amount,
+        'type': transaction.type,
+        'oldbalanceOrg': transaction.oldbalanceOrg,
+        'newbalanceOrig': transaction.newbalanceOrig,
+        'oldbalanceDest': transaction.oldbalanceDest,
+        'newbalanceDest': transaction.newbalanceDest,
+        'id': transaction.id,
+        'prediction_id': prediction.id,
+        'prediction': prediction.prediction,
+        'probability': prediction.probability,
+        'manual_review': prediction.manual_review
+    }
+
+
+async def process_file_in_background(db: Session, df: pd.DataFrame):
     # Process in chunks
-    chunks = [df[i:i + CHUNK_SIZE] for i in range(0, len(df), CHUNK_SIZE)]
+    chunks = [df.iloc[i:i + CHUNK_SIZE] for i in range(0, len(df), CHUNK_SIZE)]
     predictions = []
 
     # Process chunks concurrently
+    model = get_model()
     tasks = [process_chunk(chunk, db, model) for chunk in chunks]
     chunk_results = await asyncio.gather(*tasks)
 
@@ -34,12 +119,22 @@ async def process_file_in_background(db: Session, content: str):
     for result in chunk_results:
         predictions.extend(result)
 
+    hot_window.append(predictions)
+
     return predictions
 
 
-async def process_chunk(chunk: pd.DataFrame, db: Session, model: FraudDetectionModel):
+async def process_chunk(chunk: pd.DataFrame, db: Session, model: InferenceModel):
     predictions = []
 
+    # Score the whole chunk in one call before anything is stored
+    probabilities, labels = await score_frame(chunk, model)
+    drift_monitor.observe(model, chunk, probabilities)
+    batch_predictions = [
+        {'prediction': int(label), 'probability': float(probability)}
+        for label, probability in zip(labels, probabilities)
+    ]
+
     # Bulk insert transactions
     db_transactions = [DBTransaction(**row) for _, row in chunk.iterrows()]
     db.add_all(db_transactions)
@@ -52,31 +147,36 @@ async def process_chunk(chunk: pd.DataFrame, db: Session, model: FraudDetectionM
     # Get transaction IDs
     transaction_ids = [t.id for t in db_transactions]
 
-    # Make predictions one by one
-    batch_predictions = []
-    for _, row in chunk.iterrows():
-        pred = model.predict_proba(row.to_dict())
-        logging.info(f"Prediction for transaction: {pred}")
-        batch_predictions.append(pred)
-
     # Bulk insert predictions
     db_predictions = [
         DBPrediction(
             transaction_id=tid,
             prediction=pred['prediction'],
             probability=pred['probability'],
-            manual_review=pred['prediction'] == 0 and 0.45 <= pred['probability'] <= 0.55
+            manual_review=review_queue.needs_manual_review(pred['prediction'], pred['probability'])
         )
         for tid, pred in zip(transaction_ids, batch_predictions)
     ]
     db.add_all(db_predictions)
+    db.flush()
+    prediction_ids = [p.id for p in db_predictions]
+    review_queue.enqueue(db, [
+        {
+            'prediction_id': pid,
+            'transaction_id': p.transaction_id,
+            'probability': p.probability,
+            'amount': t.amount
+        }
+        for t, pid, p in zip(db_transactions, prediction_ids, db_predictions) if p.manual_review
+    ])
     db.commit()
 
     # Prepare response
-    for t, p in zip(db_transactions, batch_predictions):
-        manual_review = p['prediction'] == 0 and 0.45 <= p['probability'] <= 0.55
+    for t, pid, p in zip(db_transactions, prediction_ids, batch_predictions):
+        manual_review = review_queue.needs_manual_review(p['prediction'], p['probability'])
         predictions.append({
             'id': t.id,
+            'prediction_id': pid,
             'step': t.step,
             'amount': t.amount,
             'type': t.type,
@@ -93,20 +193,39 @@ async def process_chunk(chunk: pd.DataFrame, db: Session, model: FraudDetectionM
 
 
 @router.post("/predict")
-async def predict(transaction: TransactionInput, db: Session = Depends(get_db)):
-    # Save transaction to database
-    db_transaction = DBTransaction(**transaction.model_dump())
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+async def predict(
+        transaction: TransactionInput,
+        response: Response,
+        db: Session = Depends(get_db),
+        idempotency_key: Optional[str] = Header(default=None)
+):
+    # A replayed request with a known idempotency key gets the original prediction back
+    features = transaction.model_dump()
+    request_hash = prediction_cache.key(features)
+    if idempotency_key is not None:
+        stored = stored_prediction(db, idempotency_key, request_hash)
+        if stored is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored
+
+    refresh_model()
 
     # Make prediction
-    result = model.predict_proba(transaction.model_dump())
+    try:
+        result = await cached_predict(features)
+    except InferencePoolError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    drift_monitor.observe_record(get_model(), features, result['probability'])
 
     # Check if manual review is needed
-    manual_review = result['prediction'] == 0 and 0.45 <= result['probability'] <= 0.55
+    manual_review = review_queue.needs_manual_review(result['prediction'], result['probability'])
+
+    # Save transaction and prediction to database in a single commit
+    db_transaction = DBTransaction(**transaction.model_dump())
+    db.add(db_transaction)
+    db.flush()
 
-    # Save prediction to database
     db_prediction = DBPrediction(
         transaction_id=db_transaction.id,
         prediction=result['prediction'],
@@ -114,18 +233,53 @@ async def predict(transaction: TransactionInput, db: Session = Depends(get_db)):
         manual_review=manual_review
     )
     db.add(db_prediction)
-    db.commit()
+    db.flush()
+    transaction_id = db_transaction.id
+    prediction_id = db_prediction.id
+    if manual_review:
+        review_queue.enqueue(db, [{
+            'prediction_id': prediction_id,
+            'transaction_id': transaction_id,
+            'probability': result['probability'],
+            'amount': transaction.amount
+        }])
+    if idempotency_key is not None:
+        db.add(IdempotencyKey(key=idempotency_key, transaction_id=transaction_id, prediction_id=prediction_id,
+                              request_hash=request_hash, created_at=datetime.now(timezone.utc)))
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same idempotency key committed first
+        db.rollback()
+        stored = stored_prediction(db, idempotency_key, request_hash) if idempotency_key is not None else None
+        if stored is None:
+            raise
+        response.headers["Idempotent-Replayed"] = "true"
+        return stored
 
     # Prepare response
-    response = transaction.model_dump()
-    response.update({
-        'id': db_transaction.id,
+    prediction_response = transaction.model_dump()
+    prediction_response.update({
+        'id': transaction_id,
+        'prediction_id': prediction_id,
         'prediction': result['prediction'],
         'probability': result['probability'],
         'manual_review': manual_review
     })
+    hot_window.append([prediction_response])
+
+    return prediction_response
+
+
+@router.get("/predict/cache")
+async def get_prediction_cache_stats():
+    return prediction_cache.stats()
 
-    return response
+
+@router.get("/predict/pool")
+async def get_inference_pool_stats():
+    return inference_pool.stats()
 
 
 @router.post("/predict_batch")
@@ -149,7 +303,10 @@ async def predict_batch(
 
     # Read file in chunks
     content = await file.read()
-    df = pd.read_csv(StringIO(content.decode('utf-8')))
+    try:
+        df = pd.read_csv(StringIO(content.decode('utf-8')))
+    except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse the uploaded file: {e}")
 
     # Validate row count
     if len(df) > MAX_ROWS:
@@ -160,10 +317,95 @@ async def predict_batch(
     if not all(column in df.columns for column in required_columns):
         raise HTTPException(status_code=400, detail="Missing required columns in the uploaded file")
 
+    # Invalid rows are reported and skipped, the rest of the upload is still scored
+    valid_df, validation = validate_transactions(df)
+
+    refresh_model()
+
     # Add background task to process file
-    predictions = await process_file_in_background(db, content.decode('utf-8'))
+    try:
+        predictions = await process_file_in_background(db, valid_df)
+    except InferencePoolError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "message": "File processed successfully",
+        "predictions": predictions,
+        "validation": validation.to_dict()
+    }
+
+
+async def read_body(request: Request, limit: int):
+    # The limit is checked on the bytes received, chunked bodies have no Content-Length
+    try:
+        declared_size = int(request.headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    too_large = HTTPException(status_code=413, detail=f"Body size exceeds maximum limit of {limit / 1024 / 1024}MB")
+    if declared_size > limit:
+        raise too_large
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+@router.post("/predict_many")
+async def predict_many(request: Request, db: Session = Depends(get_db)):
+    """
+    Score many transactions in one model call for service-to-service callers.
+
+    The body is a JSON array of transactions, a JSON object with one array per
+    field, an Arrow IPC stream or file, or a NumPy structured array (.npy). The
+    response has one column per result field, in the same format and order.
+    Invalid rows are skipped like in /predict_batch: the row column gives the
+    request position of every result, the X-Invalid-Rows header counts the
+    skipped rows and JSON responses include the validation report.
+    """
+    body = await read_body(request, MAX_FILE_SIZE)
+    content_type = request.headers.get('content-type')
+    try:
+        df = decode_transactions(content_type, body)
+    except LookupError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow bodies need the pyarrow package on the server")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {"message": "File processed successfully", "predictions": predictions}
+    if len(df) > MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"Number of rows exceeds maximum limit of {MAX_ROWS}")
+    missing = [column for column in TRANSACTION_FIELDS if column not in df.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
+
+    valid_df, validation = validate_transactions(df)
+
+    refresh_model()
+
+    model = get_model()
+    probabilities, predictions = [], []
+    if len(valid_df):
+        try:
+            probabilities, predictions = await score_frame(valid_df, model)
+        except InferencePoolError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        drift_monitor.observe(model, valid_df, probabilities)
+
+    responses = save_scored_batch(db, valid_df.to_dict('records'), probabilities, predictions)
+    db.commit()
+    hot_window.append(responses)
+
+    results = {name: [response[name] for response in responses] for name in RESULT_DTYPE.names if name != 'row'}
+    results['row'] = valid_df.index.to_numpy()
+    report = validation.to_dict()
+    body, media_type = encode_results(content_type, results, report)
+    return Response(content=body, media_type=media_type, headers={'X-Invalid-Rows': str(report['invalid_rows'])})
 
 
 @router.put("/review/{prediction_id}")
@@ -174,7 +416,16 @@ async def review_prediction(prediction_id: int, reviewed_prediction: int, db: Se
 
     db_prediction.reviewed = True
     db_prediction.reviewed_prediction = reviewed_prediction
+    db_prediction.reviewed_at = datetime.now(timezone.utc)
+    review_queue.complete(db, prediction_id)
+    data_version = bump_data_version(db)
     db.commit()
     db.refresh(db_prediction)
+    hot_window.mark_reviewed(prediction_id, reviewed_prediction, data_version)
+    broadcaster.publish("review", {
+        "prediction_id": prediction_id,
+        "transaction_id": db_prediction.transaction_id,
+        "reviewed_prediction": reviewed_prediction
+    })
 
     return {"message": "Review status updated", "prediction": db_prediction}
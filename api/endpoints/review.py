@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from api import review_queue
+from api.database import get_db
+from api.database import Transaction as DBTransaction, ReviewQueueItem
+
+router = APIRouter()
+
+
+@router.get("/review/queue")
+async def get_review_queue(
+        db: Session = Depends(get_db),
+        limit: int = Query(default=10, ge=0, le=100)
+):
+    items = (
+        db.query(ReviewQueueItem)
+        .order_by(ReviewQueueItem.priority.desc())
+        .limit(limit)
+        .all()
+    )
+
+    return {
+        "stats": review_queue.stats(db),
+        "items": [queue_item_response(item) for item in items]
+    }
+
+
+@router.post("/review/queue/claim")
+async def claim_review(
+        reviewer: str,
+        db: Session = Depends(get_db),
+        lease_seconds: int = Query(default=review_queue.REVIEW_LEASE_SECONDS, ge=1, le=3600)
+):
+    item = review_queue.claim(db, reviewer, lease_seconds)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Review queue is empty")
+
+    transaction = db.get(DBTransaction, item.transaction_id)
+    response = queue_item_response(item)
+    response["transaction"] = {
+        "step": transaction.step,
+        "amount": transaction.amount,
+        "type": transaction.type,
+        "oldbalanceOrg": transaction.oldbalanceOrg,
+        "newbalanceOrig": transaction.newbalanceOrig,
+        "oldbalanceDest": transaction.oldbalanceDest,
+        "newbalanceDest": transaction.newbalanceDest
+    } if transaction else None
+
+    return response
+
+
+@router.post("/review/queue/{prediction_id}/release")
+async def release_review(prediction_id: int, reviewer: str, db: Session = Depends(get_db)):
+    if not review_queue.release(db, prediction_id, reviewer):
+        raise HTTPException(status_code=404, detail="No claim by this reviewer on the prediction")
+
+    return {"message": "Review released"}
+
+
+def queue_item_response(item: ReviewQueueItem):
+    return {
+        "prediction_id": item.prediction_id,
+        "transaction_id": item.transaction_id,
+        "probability": item.probability,
+        "amount": item.amount,
+        "priority": item.priority,
+        "claimed_by": item.claimed_by,
+        "lease_expires_at": item.lease_expires_at or None
+    }
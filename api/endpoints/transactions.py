@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from api.database import get_db
 from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+from api.hot_window import hot_window
 from math import ceil
 
 from api.schemas import TransactionResponse
@@ -16,8 +17,21 @@ async def get_transactions(
         db: Session = Depends(get_db),
         page: int = Query(default=1, ge=1),
         page_size: int = Query(default=15, ge=1, le=1000),
-        manual_review: Optional[bool] = Query(default=None)
+        manual_review: Optional[bool] = Query(default=None),
+        order: str = Query(default="asc", pattern="^(asc|desc)$")
 ):
+    # Calculate offset and limit
+    offset = (page - 1) * page_size
+
+    # Recent pages are served from the in-memory window of the newest transactions
+    hot_page = hot_window.get_page(db, page, page_size, manual_review, order)
+    if hot_page is not None:
+        response_data, total_count = hot_page
+        return {
+            "data": response_data,
+            "pagination": pagination_metadata(total_count, page, page_size)
+        }
+
     query = db.query(DBTransaction).join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
 
     if manual_review is not None:
@@ -26,10 +40,8 @@ async def get_transactions(
     # Get total count for pagination metadata
     total_count = query.count()
 
-    # Calculate offset and limit
-    offset = (page - 1) * page_size
-
     # Get paginated transactions
+    query = query.order_by(DBTransaction.id.desc() if order == "desc" else DBTransaction.id)
     transactions = query.offset(offset).limit(page_size).all()
 
     # Get corresponding predictions
@@ -60,12 +72,17 @@ async def get_transactions(
 
     return {
         "data": response_data,
-        "pagination": {
-            "total_items": total_count,
-            "total_pages": ceil(total_count / page_size),
-            "current_page": page,
-            "page_size": page_size,
-            "has_next": offset + page_size < total_count,
-            "has_previous": page > 1
-        }
+        "pagination": pagination_metadata(total_count, page, page_size)
+    }
+
+
+def pagination_metadata(total_count, page, page_size):
+    offset = (page - 1) * page_size
+    return {
+        "total_items": total_count,
+        "total_pages": ceil(total_count / page_size),
+        "current_page": page,
+        "page_size": page_size,
+        "has_next": offset + page_size < total_count,
+        "has_previous": page > 1
     }
@@ -0,0 +1,293 @@
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.archive import archive
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, DataVersion
+from api.schemas import TRANSACTION_TYPES
+
+HOT_WINDOW_SIZE = 10000  # Number of most recent scored transactions kept in memory
+RESYNC_INTERVAL = 5  # Minimum seconds between reloads of the window from the database
+
+# Bit flags packed into a single uint8 per row
+FLAG_FRAUD = 1
+FLAG_MANUAL_REVIEW = 2
+FLAG_REVIEWED = 4
+FLAG_REVIEWED_FRAUD = 8
+
+
+class HotWindow:
+    """
+    Ring buffer of the most recently scored transactions, stored column-wise.
+
+    Rows are appended in prediction id order by the predict endpoints. The window
+    only serves a page when it is known to match the database: prediction ids must
+    be contiguous since the last sync, the newest id must equal the newest id in
+    the predictions table and no process may have changed stored predictions in
+    place since. Anything else falls back to the database.
+
+    Args:
+        capacity: Maximum number of rows kept
+    """
+
+    def __init__(self, capacity=HOT_WINDOW_SIZE):
+        self.capacity = capacity
+        self.transaction_ids = np.zeros(capacity, dtype=np.int64)
+        self.prediction_ids = np.zeros(capacity, dtype=np.int64)
+        self.steps = np.zeros(capacity, dtype=np.int32)
+        self.amounts = np.zeros(capacity, dtype=np.float64)
+        self.balances = np.zeros((capacity, 4), dtype=np.float64)
+        self.type_codes = np.zeros(capacity, dtype=np.uint8)
+        self.probabilities = np.zeros(capacity, dtype=np.float32)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.type_names = list(TRANSACTION_TYPES)
+        self.type_lookup = {name: code for code, name in enumerate(self.type_names)}
+        self.reset()
+
+    def reset(self):
+        self.head = 0  # Next write position
+        self.size = 0
+        self.total = 0
+        self.manual_review_total = 0
+        self.synced = False
+        self.last_sync = 0.0
+        self.archive_version = None
+        self.data_version = None
+
+    def invalidate(self):
+        # Force a reload on the next read, e.g. after a bulk update of predictions
+        self.synced = False
+        self.last_sync = 0.0
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in (
+            self.transaction_ids, self.prediction_ids, self.steps, self.amounts,
+            self.balances, self.type_codes, self.probabilities, self.flags))
+
+    def type_code(self, name):
+        code = self.type_lookup.get(name)
+        if code is None:
+            if len(self.type_names) > 255:
+                raise ValueError("Too many distinct transaction types for the hot window")
+            code = len(self.type_names)
+            self.type_names.append(name)
+            self.type_lookup[name] = code
+        return code
+
+    def last_prediction_id(self):
+        if self.size == 0:
+            return None
+        return int(self.prediction_ids[(self.head - 1) % self.capacity])
+
+    def append(self, records):
+        """
+        Append scored transactions in prediction id order.
+
+        Args:
+            records: Dicts with the transaction fields plus id, prediction_id,
+                     prediction, probability, manual_review and optionally reviewed_prediction
+        """
+        n = len(records)
+        if n == 0:
+            return
+
+        prediction_ids = np.fromiter((r['prediction_id'] for r in records), dtype=np.int64, count=n)
+        last_id = self.last_prediction_id()
+        contiguous = np.all(np.diff(prediction_ids) == 1)
+        if last_id is not None and prediction_ids[0] != last_id + 1:
+            contiguous = False
+        if self.synced and not contiguous:
+            # Another process inserted predictions in between, the window no longer matches the database
+            logging.info("Hot window lost sync with the database")
+            self.synced = False
+
+        flags = np.fromiter((self.row_flags(r) for r in records), dtype=np.uint8, count=n)
+        self.write(
+            transaction_ids=np.fromiter((r['id'] for r in records), dtype=np.int64, count=n),
+            prediction_ids=prediction_ids,
+            steps=np.fromiter((r['step'] for r in records), dtype=np.int32, count=n),
+            amounts=np.fromiter((r['amount'] for r in records), dtype=np.float64, count=n),
+            balances=np.array([[r['oldbalanceOrg'], r['newbalanceOrig'], r['oldbalanceDest'], r['newbalanceDest']]
+                               for r in records], dtype=np.float64),
+            type_codes=np.fromiter((self.type_code(r['type']) for r in records), dtype=np.uint8, count=n),
+            probabilities=np.fromiter((r['probability'] for r in records), dtype=np.float32, count=n),
+            flags=flags
+        )
+        self.total += n
+        self.manual_review_total += int(np.count_nonzero(flags & FLAG_MANUAL_REVIEW))
+
+    @staticmethod
+    def row_flags(record):
+        flags = FLAG_FRAUD if record['prediction'] == 1 else 0
+        if record['manual_review']:
+            flags |= FLAG_MANUAL_REVIEW
+        reviewed_prediction = record.get('reviewed_prediction')
+        if reviewed_prediction is not None:
+            flags |= FLAG_REVIEWED
+            if reviewed_prediction == 1:
+                flags |= FLAG_REVIEWED_FRAUD
+        return flags
+
+    def write(self, **columns):
+        n = len(columns['prediction_ids'])
+        if n > self.capacity:
+            columns = {name: values[-self.capacity:] for name, values in columns.items()}
+            n = self.capacity
+
+        positions = (self.head + np.arange(n)) % self.capacity
+        for name, values in columns.items():
+            getattr(self, name)[positions] = values
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def mark_reviewed(self, prediction_id, reviewed_prediction, data_version):
+        """
+        Apply a review committed by this process.
+
+        Args:
+            prediction_id: Reviewed prediction
+            reviewed_prediction: Decision of the reviewer
+            data_version: Data version the review was committed with
+        """
+        if self.data_version == data_version - 1:
+            # Only our own review happened since the last sync, the window stays current
+            self.data_version = data_version
+        matches = np.flatnonzero(self.prediction_ids[:self.size] == prediction_id)
+        if len(matches) == 0:
+            return
+        index = matches[0]
+        flags = int(self.flags[index]) & ~FLAG_REVIEWED_FRAUD | FLAG_REVIEWED
+        if reviewed_prediction == 1:
+            flags |= FLAG_REVIEWED_FRAUD
+        self.flags[index] = flags
+
+    def sync(self, db: Session):
+        """Reload the window with the newest rows from the database."""
+        self.reset()
+        self.last_sync = time.monotonic()
+        self.archive_version = archive.version()
+        self.data_version = get_data_version(db)
+
+        base_query = db.query(DBTransaction, DBPrediction).join(
+            DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+        rows = base_query.order_by(DBPrediction.id.desc()).limit(self.capacity).all()
+        rows.reverse()
+
+        records = []
+        for transaction, prediction in rows:
+            records.append({
+                'id': transaction.id,
+                'prediction_id': prediction.id,
+                'step': transaction.step,
+                'amount': transaction.amount,
+                'type': transaction.type,
+                'oldbalanceOrg': transaction.oldbalanceOrg,
+                'newbalanceOrig': transaction.newbalanceOrig,
+                'oldbalanceDest': transaction.oldbalanceDest,
+                'newbalanceDest': transaction.newbalanceDest,
+                'prediction': prediction.prediction,
+                'probability': prediction.probability,
+                'manual_review': prediction.manual_review,
+                'reviewed_prediction': prediction.reviewed_prediction if prediction.reviewed else None
+            })
+        self.append(records)
+
+        self.total = base_query.count()
+        self.manual_review_total = base_query.filter(DBPrediction.manual_review.is_(True)).count()
+        self.synced = True
+        logging.info(f"Hot window synced with {self.size} of {self.total} transactions")
+
+    def is_current(self, db: Session):
+        # Primary key lookup, cheap compared to paging through the joined tables
+        newest_id = db.query(func.max(DBPrediction.id)).scalar()
+        # A retention run may have archived rows that are still in the window
+        archive_version = archive.version()
+        # Policy re-applications and reviews in other processes change rows the window holds
+        data_version = get_data_version(db)
+        if (self.synced and newest_id == self.last_prediction_id() and archive_version == self.archive_version
+                and data_version == self.data_version):
+            return True
+        if time.monotonic() - self.last_sync < RESYNC_INTERVAL:
+            return False
+        self.sync(db)
+        return True
+
+    def get_page(self, db: Session, page, page_size, manual_review=None, order="desc"):
+        """
+        Serve a page of the transaction listing from memory.
+
+        Returns None when the window can't answer the request exactly.
+        """
+        if not self.is_current(db):
+            return None
+
+        if manual_review is None:
+            total_count = self.total
+        elif manual_review:
+            total_count = self.manual_review_total
+        else:
+            total_count = self.total - self.manual_review_total
+
+        # Window positions from newest to oldest
+        positions = (self.head - 1 - np.arange(self.size)) % self.capacity
+        if manual_review is not None:
+            is_manual = (self.flags[positions] & FLAG_MANUAL_REVIEW) != 0
+            positions = positions[is_manual == manual_review]
+
+        complete = self.size == self.total
+        if order != "desc":
+            if not complete:
+                return None
+            positions = positions[::-1]
+
+        offset = (page - 1) * page_size
+        if not complete and min(offset + page_size, total_count) > len(positions):
+            return None
+
+        return self.to_records(positions[offset:offset + page_size]), total_count
+
+    def to_records(self, positions):
+        flags = self.flags[positions]
+        balances = self.balances[positions]
+        return [
+            {
+                'id': int(transaction_id),
+                'step': int(step),
+                'amount': float(amount),
+                'type': self.type_names[type_code],
+                'oldbalanceOrg': float(balance[0]),
+                'newbalanceOrig': float(balance[1]),
+                'oldbalanceDest': float(balance[2]),
+                'newbalanceDest': float(balance[3]),
+                'prediction': int(flag & FLAG_FRAUD),
+                'probability': round(float(probability), 6),
+                'manual_review': bool(flag & FLAG_MANUAL_REVIEW),
+                'reviewed_prediction': int(bool(flag & FLAG_REVIEWED_FRAUD)) if flag & FLAG_REVIEWED else None
+            }
+            for transaction_id, step, amount, type_code, balance, probability, flag in zip(
+                self.transaction_ids[positions], self.steps[positions], self.amounts[positions],
+                self.type_codes[positions], balances, self.probabilities[positions], flags)
+        ]
+
+
+def get_data_version(db: Session):
+    return db.query(DataVersion.version).filter(DataVersion.id == 1).scalar() or 0
+
+
+def bump_data_version(db: Session):
+    """Record an in-place change to stored predictions and return the new version. The caller commits."""
+    updated = db.query(DataVersion).filter(DataVersion.id == 1).update({
+        DataVersion.version: DataVersion.version + 1
+    }, synchronize_session=False)
+    if not updated:
+        db.add(DataVersion(id=1, version=1))
+        db.flush()
+    # The update holds the write lock, so no other process can bump in between
+    return get_data_version(db)
+
+
+hot_window = HotWindow()
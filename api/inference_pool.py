@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from api.schemas import TRANSACTION_TYPES
+from models.inference import InferenceModel, MODEL_PATH, NUMERIC_FEATURES
+
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "0"))  # Scoring processes, 0 scores inside the API process
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "1024"))  # Rows per shared-memory slot and per model call
+INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", "64"))  # Slots submitted or in flight, further submits wait
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))  # Seconds a submitted slot may take to be scored
+MODEL_RELOAD_INTERVAL = 30  # Seconds between checks for an updated model file in the scoring processes
+MONITOR_INTERVAL = 1.0  # Seconds between checks for crashed scoring processes
+
+TYPE_COLUMN = len(NUMERIC_FEATURES)  # The transaction type is passed as its index in TRANSACTION_TYPES
+FEATURE_COLUMNS = TYPE_COLUMN + 1
+
+
+class InferencePoolError(RuntimeError):
+    pass
+
+
+def slot_buffers(buffer, slots, slot_rows):
+    # Input features and one raw probability per row for every slot, then the worker
+    # and generation that last took each slot from the queue
+    input_size = slots * slot_rows * FEATURE_COLUMNS
+    output_size = slots * slot_rows
+    inputs = np.ndarray((slots, slot_rows, FEATURE_COLUMNS), dtype=np.float64, buffer=buffer)
+    outputs = np.ndarray((slots, slot_rows), dtype=np.float64, buffer=buffer, offset=input_size * 8)
+    owners = np.ndarray((slots, 2), dtype=np.int64, buffer=buffer, offset=(input_size + output_size) * 8)
+    return inputs, outputs, owners
+
+
+def buffer_size(slots, slot_rows):
+    return (slots * slot_rows * (FEATURE_COLUMNS + 1) + slots * 2) * 8
+
+
+def encode_features(frame: pd.DataFrame):
+    type_codes = pd.Categorical(frame['type'], categories=TRANSACTION_TYPES).codes
+    if (type_codes < 0).any():
+        unknown = sorted(set(frame['type'][type_codes < 0].astype(str)))
+        raise ValueError(f"Unknown transaction type: {', '.join(unknown)}")
+    values = np.empty((len(frame), FEATURE_COLUMNS), dtype=np.float64)
+    values[:, :TYPE_COLUMN] = frame[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+    values[:, TYPE_COLUMN] = type_codes
+    return values
+
+
+def decode_features(values):
+    frame = pd.DataFrame(values[:, :TYPE_COLUMN], columns=NUMERIC_FEATURES)
+    frame['type'] = np.asarray(TRANSACTION_TYPES, dtype=object)[values[:, TYPE_COLUMN].astype(np.intp)]
+    return frame
+
+
+def single_threaded(model):
+    # Parallelism comes from the pool, joblib cannot start workers inside a daemon process anyway
+    classifier = model.model[-1]
+    if hasattr(classifier, 'n_jobs'):
+        classifier.n_jobs = 1
+
+
+def worker_main(worker_id, shm_name, slots, slot_rows, requests, results, model_path):
+    """
+    Scoring process. Loads the model once, then scores slots until it receives None.
+
+    Requests already waiting on the queue are coalesced into one model call of up
+    to slot_rows rows, so a burst of single predictions is scored as a batch.
+    """
+    logging.basicConfig(level=logging.INFO)
+    model = InferenceModel()
+    model.load_model(model_path)
+    single_threaded(model)
+    last_reload_check = time.monotonic()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    inputs, outputs, owners = slot_buffers(shm.buf, slots, slot_rows)
+    logging.info(f"Inference worker {worker_id} ready")
+
+    stopping = False
+    try:
+        while not stopping:
+            request = requests.get()
+            if request is None:
+                break
+            owners[request[0]] = (worker_id, request[1])
+            picked_up = time.monotonic()
+            batch = [request]
+            rows = request[2]
+            while rows < slot_rows:
+                try:
+                    request = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                owners[request[0]] = (worker_id, request[1])
+                batch.append(request)
+                rows += request[2]
+
+            if picked_up - last_reload_check >= MODEL_RELOAD_INTERVAL:
+                last_reload_check = picked_up
+                try:
+                    if model.reload_if_changed():
+                        single_threaded(model)
+                except Exception:
+                    logging.exception("Failed to reload updated model, keeping the current one")
+
+            error = None
+            started = time.monotonic()
+            try:
+                features = decode_features(np.concatenate([inputs[slot, :count] for slot, _, count, _ in batch]))
+                raw_probabilities = model.model.predict_proba(features)[:, 1]
+                offset = 0
+                for slot, _, count, _ in batch:
+                    outputs[slot, :count] = raw_probabilities[offset:offset + count]
+                    offset += count
+            except Exception as e:
+                logging.exception("Inference worker failed to score a batch")
+                error = str(e)
+            compute = time.monotonic() - started
+
+            for slot, generation, count, submitted in batch:
+                results.put((slot, generation, picked_up - submitted, compute, rows, error))
+    finally:
+        del inputs, outputs, owners
+        shm.close()
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.slot_wait_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.batch_rows = 0
+        self.completed = 0
+
+    def record(self, slot_wait, queue_wait, compute, batch_rows):
+        self.completed += 1
+        self.slot_wait_seconds += slot_wait
+        self.queue_wait_seconds += queue_wait
+        self.compute_seconds += compute
+        self.batch_rows += batch_rows
+
+    def report(self):
+        completed = self.completed or 1
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'completed': self.completed,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'avg_slot_wait_seconds': round(self.slot_wait_seconds / completed, 6),
+            'avg_queue_wait_seconds': round(self.queue_wait_seconds / completed, 6),
+            'avg_compute_seconds': round(self.compute_seconds / completed, 6),
+            'avg_rows_per_model_call': round(self.batch_rows / completed, 1)
+        }
+
+
+class InferencePool:
+    """
+    Pool of scoring processes fed through a shared-memory ring of slots.
+
+    Each request is split into slots of at most batch_size rows. Features are
+    written into the slot in place, only the slot number travels over the request
+    queue, and the worker writes raw probabilities back into the same slot. The
+    number of slots bounds the work queued for the workers; submitters wait for a
+    free slot beyond that.
+
+    Args:
+        size: Number of scoring processes
+        batch_size: Rows per slot and maximum rows per model call
+        queue_limit: Number of slots
+        model_path: Model artifact each process loads
+        timeout: Seconds a slot may take to be scored
+    """
+
+    def __init__(self, size=INFERENCE_POOL_SIZE, batch_size=INFERENCE_BATCH_SIZE,
+                 queue_limit=INFERENCE_QUEUE_LIMIT, model_path=MODEL_PATH, timeout=INFERENCE_TIMEOUT):
+        self.size = size
+        self.batch_size = batch_size
+        self.slots = queue_limit
+        self.model_path = model_path
+        self.timeout = timeout
+        self.processes = []
+        self.shm = None
+        self.loop = None
+        self.metrics = PoolMetrics()
+
+    @property
+    def running(self):
+        return self.shm is not None
+
+    def start(self):
+        if self.size <= 0 or self.running:
+            return
+        # Spawned rather than forked, the API process runs threads that must not be copied
+        self.context = multiprocessing.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=buffer_size(self.slots, self.batch_size))
+        self.inputs, self.outputs, self.owners = slot_buffers(self.shm.buf, self.slots, self.batch_size)
+        self.owners[:] = -1
+        self.requests = self.context.Queue()
+        self.results = self.context.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.free_slots = list(range(self.slots))
+        self.slot_available = asyncio.Semaphore(self.slots)
+        self.generations = [0] * self.slots
+        self.pending = {}  # slot -> (generation, future, slot wait)
+        self.abandoned = {}  # slot -> generation of a timed out request still owned by a worker
+        self.processes = [self.spawn_worker(worker_id) for worker_id in range(self.size)]
+        self.stopping = False
+        self.listener = threading.Thread(target=self.listen, name="inference-results", daemon=True)
+        self.listener.start()
+        logging.info(f"Started {self.size} inference workers with {self.slots} slots of {self.batch_size} rows")
+
+    def spawn_worker(self, worker_id):
+        process = self.context.Process(
+            target=worker_main,
+            args=(worker_id, self.shm.name, self.slots, self.batch_size, self.requests, self.results,
+                  self.model_path),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def stop(self):
+        if not self.running:
+            return
+        self.stopping = True
+        for _ in self.processes:
+            self.requests.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+        self.listener.join(timeout=5)
+        for _, future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(InferencePoolError("Inference pool stopped"))
+        self.pending = {}
+        del self.inputs, self.outputs, self.owners
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+        self.processes = []
+        logging.info("Stopped inference workers")
+
+    def listen(self):
+        # Hands results to the event loop and restarts scoring processes that died
+        while True:
+            try:
+                result = self.results.get(timeout=MONITOR_INTERVAL)
+            except queue.Empty:
+                if self.stopping:
+                    return
+                for worker_id, process in enumerate(self.processes):
+                    if not process.is_alive() and not self.stopping:
+                        logging.error(f"Inference worker {worker_id} exited with {process.exitcode}, restarting")
+                        self.loop.call_soon_threadsafe(self.reclaim, worker_id)
+                        self.processes[worker_id] = self.spawn_worker(worker_id)
+                continue
+            if result is None:
+                return
+            self.loop.call_soon_threadsafe(self.finish, *result)
+
+    def finish(self, slot, generation, queue_wait, compute, batch_rows, error):
+        if self.abandoned.get(slot) == generation:
+            # The submitter timed out, the slot can be reused now that the worker is done with it
+            del self.abandoned[slot]
+            self.release(slot)
+            return
+        pending = self.pending.get(slot)
+        if pending is None or pending[0] != generation:
+            return
+        _, future, slot_wait = self.pending.pop(slot)
+        if error is not None:
+            self.metrics.errors += 1
+            self.release(slot)
+            future.set_exception(InferencePoolError(error))
+        else:
+            self.metrics.record(slot_wait, queue_wait, compute, batch_rows)
+            future.set_result(None)
+
+    def reclaim(self, worker_id):
+        # Slots the dead worker had taken from the queue will never get a result
+        for slot in range(self.slots):
+            owner, generation = self.owners[slot]
+            if owner != worker_id:
+                continue
+            if self.abandoned.get(slot) == generation:
+                del self.abandoned[slot]
+                self.release(slot)
+                continue
+            pending = self.pending.get(slot)
+            if pending is not None and pending[0] == generation:
+                del self.pending[slot]
+                self.metrics.errors += 1
+                self.release(slot)
+                pending[1].set_exception(InferencePoolError("Inference worker exited while scoring"))
+
+    def release(self, slot):
+        self.free_slots.append(slot)
+        self.slot_available.release()
+
+    async def score_slot(self, values):
+        waiting_since = time.monotonic()
+        await self.slot_available.acquire()
+        slot = self.free_slots.pop()
+        slot_wait = time.monotonic() - waiting_since
+        self.generations[slot] += 1
+        generation = self.generations[slot]
+        count = len(values)
+
+        self.inputs[slot, :count] = values
+        future = self.loop.create_future()
+        self.pending[slot] = (generation, future, slot_wait)
+        self.requests.put((slot, generation, count, time.monotonic()))
+        try:
+            await asyncio.wait_for(future, timeout=self.timeout)
+        except InferencePoolError:
+            # Failed by the worker or by reclaim, the slot is already released
+            raise
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            self.pending.pop(slot, None)
+            self.abandoned[slot] = generation
+            raise InferencePoolError(f"Scoring did not finish within {self.timeout} seconds")
+        except BaseException:
+            self.pending.pop(slot, None)
+            self.abandoned[slot] = generation
+            raise
+
+        raw_probabilities = self.outputs[slot, :count].copy()
+        self.release(slot)
+        return raw_probabilities
+
+    async def predict_raw(self, frame: pd.DataFrame):
+        """
+        Raw fraud probabilities for a frame of transactions, scored by the pool.
+
+        Args:
+            frame: DataFrame with the model features
+        """
+        if not self.running:
+            raise InferencePoolError("Inference pool is not running")
+        values = encode_features(frame)
+        self.metrics.requests += 1
+        self.metrics.rows += len(values)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.float64)
+        parts = await asyncio.gather(*[
+            self.score_slot(values[i:i + self.batch_size]) for i in range(0, len(values), self.batch_size)
+        ])
+        return np.concatenate(parts)
+
+    def stats(self):
+        report = self.metrics.report()
+        report.update({
+            'enabled': self.running,
+            'workers': self.size if self.running else 0,
+            'workers_alive': sum(process.is_alive() for process in self.processes),
+            'batch_size': self.batch_size,
+            'slots': self.slots,
+            'slots_in_use': self.slots - len(self.free_slots) if self.running else 0
+        })
+        return report
+
+
+inference_pool = InferencePool()
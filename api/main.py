@@ -1,16 +1,37 @@
 import logging
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.admission import AdmissionMiddleware
+from api.inference_pool import inference_pool
 from api.routers import router
-from models.train_paysim_model import FraudDetectionModel
+from models.inference import get_model
 
-app = FastAPI()
-
-logging.basicConfig(level=logging.INFO)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The model is loaded once here, before the first request, and shared by all endpoints.
+    # Scoring processes start with the app, pool size 0 keeps scoring in-process
+    started = time.monotonic()
+    get_model()
+    inference_pool.start()
+    logging.info(f"Startup completed in {time.monotonic() - started:.2f}s")
+    try:
+        yield
+    finally:
+        inference_pool.stop()
+
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so shed requests still carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,11 +41,3 @@ app.add_middleware(
 )
 
 app.include_router(router)
-
-model = FraudDetectionModel()
-
-
-@asynccontextmanager
-async def lifespan_event():
-    model.load_model("models/fraud_model.pkl")
-    yield
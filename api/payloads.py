@@ -0,0 +1,113 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+JSON_TYPE = "application/json"
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_TYPE = "application/vnd.apache.arrow.file"
+NPY_TYPE = "application/x-npy"
+RESULT_DTYPE = np.dtype([('row', '<i8'), ('id', '<i8'), ('prediction_id', '<i8'), ('prediction', 'i1'),
+                         ('probability', '<f8'), ('manual_review', '?')])
+
+
+def media_type(content_type):
+    return (content_type or JSON_TYPE).split(';')[0].strip().lower()
+
+
+def decode_json(body):
+    # Either an array of transaction objects or one array per field
+    data = json.loads(body)
+    if isinstance(data, list):
+        if not all(isinstance(row, dict) for row in data):
+            raise ValueError("Expected an array of transaction objects")
+        return pd.DataFrame.from_records(data)
+    if isinstance(data, dict):
+        if not all(isinstance(values, list) for values in data.values()):
+            raise ValueError("Expected an array of values per field")
+        return pd.DataFrame(data)
+    raise ValueError("Expected an array of transactions or an object of columns")
+
+
+def decode_arrow(body, file_format=False):
+    # pyarrow is only needed by callers that send Arrow
+    import pyarrow as pa
+
+    reader = pa.ipc.open_file(body) if file_format else pa.ipc.open_stream(body)
+    return reader.read_all().to_pandas()
+
+
+def decode_npy(body):
+    values = np.load(io.BytesIO(body), allow_pickle=False)
+    if values.dtype.names is None:
+        raise ValueError("Expected a structured array with one field per transaction column")
+    values = values.reshape(-1)
+    frame = pd.DataFrame({name: values[name] for name in values.dtype.names})
+    for name in values.dtype.names:
+        if values.dtype[name].kind == 'S':
+            frame[name] = values[name].astype(str)
+    return frame
+
+
+def decode_transactions(content_type, body):
+    """
+    Transactions of a bulk request as a DataFrame, one row per transaction.
+
+    Args:
+        content_type: Request content type, JSON when missing
+        body: Raw request body
+
+    Raises:
+        ValueError: The body does not match its content type
+        ImportError: Arrow body without pyarrow installed
+        LookupError: Unsupported content type
+    """
+    kind = media_type(content_type)
+    try:
+        if kind == JSON_TYPE:
+            return decode_json(body)
+        if kind in (ARROW_STREAM_TYPE, ARROW_FILE_TYPE):
+            return decode_arrow(body, file_format=kind == ARROW_FILE_TYPE)
+        if kind == NPY_TYPE:
+            return decode_npy(body)
+    except (ImportError, ValueError):
+        raise
+    except Exception as e:
+        # Arrow and NumPy report malformed input with their own exception types
+        raise ValueError(f"Could not read the {kind} body: {e}")
+    raise LookupError(f"Unsupported content type {kind}, use {JSON_TYPE}, {ARROW_STREAM_TYPE}, "
+                      f"{ARROW_FILE_TYPE} or {NPY_TYPE}")
+
+
+def encode_results(content_type, results, validation=None):
+    """
+    Column-oriented results in the format of the request.
+
+    Args:
+        content_type: Request content type
+        results: Dict with an array per RESULT_DTYPE field, in request order
+        validation: Validation report, only included in JSON results
+
+    Returns:
+        Tuple of the response body and its media type
+    """
+    kind = media_type(content_type)
+    if kind in (ARROW_STREAM_TYPE, ARROW_FILE_TYPE):
+        import pyarrow as pa
+
+        table = pa.table({name: np.asarray(results[name], dtype=RESULT_DTYPE[name]) for name in RESULT_DTYPE.names})
+        sink = pa.BufferOutputStream()
+        writer = pa.ipc.new_file(sink, table.schema) if kind == ARROW_FILE_TYPE else pa.ipc.new_stream(sink, table.schema)
+        with writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), kind
+    if kind == NPY_TYPE:
+        values = np.empty(len(results['id']), dtype=RESULT_DTYPE)
+        for name in RESULT_DTYPE.names:
+            values[name] = results[name]
+        buffer = io.BytesIO()
+        np.save(buffer, values, allow_pickle=False)
+        return buffer.getvalue(), kind
+    columns = {name: np.asarray(results[name], dtype=RESULT_DTYPE[name]).tolist() for name in RESULT_DTYPE.names}
+    return json.dumps(dict(count=len(results['id']), **columns, validation=validation)).encode(), JSON_TYPE
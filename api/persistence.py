@@ -0,0 +1,76 @@
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from api import review_queue
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+from models.decision_policy import get_policy
+
+TRANSACTION_FIELDS = ['step', 'amount', 'type', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+
+
+def save_scored_batch(db: Session, records, probabilities, predictions):
+    """
+    Bulk insert scored transactions with their predictions and review queue entries.
+    The caller commits.
+
+    Args:
+        db: Database session
+        records: Transaction dicts with the TRANSACTION_FIELDS
+        probabilities: Fraud probability per record
+        predictions: Prediction per record
+
+    Returns:
+        Response dicts in the same order as the records
+    """
+    if len(records) == 0:
+        return []
+
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    predictions = np.asarray(predictions, dtype=np.int64)
+    manual_review = get_policy().manual_review_mask(predictions, probabilities)
+
+    # One executemany per table, ids come back in parameter order
+    transaction_rows = [{field: record[field] for field in TRANSACTION_FIELDS} for record in records]
+    transaction_ids = db.execute(
+        insert(DBTransaction).returning(DBTransaction.id, sort_by_parameter_order=True),
+        transaction_rows
+    ).scalars().all()
+
+    prediction_rows = [
+        {
+            'transaction_id': transaction_id,
+            'prediction': int(prediction),
+            'probability': float(probability),
+            'manual_review': bool(review),
+            'reviewed': False
+        }
+        for transaction_id, prediction, probability, review in zip(
+            transaction_ids, predictions, probabilities, manual_review)
+    ]
+    prediction_ids = db.execute(
+        insert(DBPrediction).returning(DBPrediction.id, sort_by_parameter_order=True),
+        prediction_rows
+    ).scalars().all()
+
+    responses = [
+        dict(transaction_row, id=transaction_id, prediction_id=prediction_id, **{
+            'prediction': prediction_row['prediction'],
+            'probability': prediction_row['probability'],
+            'manual_review': prediction_row['manual_review']
+        })
+        for transaction_row, transaction_id, prediction_id, prediction_row in zip(
+            transaction_rows, transaction_ids, prediction_ids, prediction_rows)
+    ]
+
+    review_queue.enqueue(db, [
+        {
+            'prediction_id': response['prediction_id'],
+            'transaction_id': response['id'],
+            'probability': response['probability'],
+            'amount': response['amount']
+        }
+        for response in responses if response['manual_review']
+    ])
+
+    return responses
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))  # Maximum number of cached predictions
+CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))  # Seconds a cached prediction stays valid
+
+FEATURES = ['step', 'amount', 'type', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model results with a time-to-live, keyed by the
+    transaction features and the version of the model and decision policy.
+
+    Args:
+        max_size: Maximum number of entries, least recently used entries are evicted
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(features: dict):
+        # Canonical form: fixed feature order, ints and floats with the same value hash the same
+        values = [features[name] if name == 'type' else float(features[name]) for name in FEATURES]
+        return hashlib.blake2b(json.dumps(values).encode(), digest_size=16).hexdigest()
+
+    def set_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def clear(self):
+        self.entries.clear()
+        self.invalidations += 1
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = (time.monotonic() + self.ttl, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+prediction_cache = PredictionCache()
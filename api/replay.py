@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from models.inference import NUMERIC_FEATURES, CATEGORICAL_FEATURES
+
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+DEFAULT_CONCURRENCY = 32  # Concurrent clients sending requests
+DEFAULT_BATCH_SIZE = 100  # Transactions per /predict_batch upload or /predict_many request
+REQUEST_TIMEOUT = 60  # Seconds before a request counts as an error
+PERCENTILES = [50, 95, 99]
+
+
+def load_transactions(path, limit=None, start_step=None):
+    """
+    Read PaySim transactions in step order with the columns the model is trained on.
+
+    Args:
+        path: PaySim CSV file
+        limit: Maximum number of transactions
+        start_step: Skip transactions before this step
+    """
+    df = pd.read_csv(path, usecols=FEATURES)
+    if start_step is not None:
+        df = df[df['step'] >= start_step]
+    if limit is not None:
+        df = df.head(limit)
+    logging.info(f"Loaded {len(df)} transactions from {path}")
+    return df.sort_values('step', kind='stable').reset_index(drop=True)
+
+
+def tps_schedule(n, tps):
+    # Evenly spaced send times for a constant rate
+    return np.arange(n, dtype=np.float64) / tps
+
+
+def step_schedule(steps, step_seconds):
+    """
+    Send times that follow the PaySim steps: every step lasts step_seconds and
+    its transactions are spread evenly over it, so bursty steps stay bursty.
+
+    Args:
+        steps: Step of every transaction, in order
+        step_seconds: Wall clock seconds one step is compressed into
+    """
+    steps = pd.Series(np.asarray(steps))
+    position = steps.groupby(steps).cumcount().to_numpy()
+    per_step = steps.map(steps.value_counts()).to_numpy()
+    return ((steps.to_numpy() - steps.iloc[0]) + position / per_step) * step_seconds
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.transactions = 0
+        self.latencies = []
+        self.delays = []
+        self.errors = Counter()
+
+    def record(self, status, latency, delay, transactions):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.delays.append(delay)
+        if status == 200:
+            self.transactions += transactions
+        else:
+            self.errors[str(status)] += 1
+
+    def report(self, elapsed):
+        latencies = np.asarray(self.latencies) * 1000
+        # Latency measured from the scheduled send time includes time spent waiting for a free client
+        scheduled = (np.asarray(self.latencies) + np.asarray(self.delays)) * 1000
+        report = {
+            'requests': self.requests,
+            'transactions': self.transactions,
+            'errors': dict(self.errors),
+            'error_rate': round(sum(self.errors.values()) / self.requests, 4) if self.requests else 0.0,
+            'requests_per_second': round(self.requests / elapsed, 1) if elapsed else 0.0,
+            'transactions_per_second': round(self.transactions / elapsed, 1) if elapsed else 0.0
+        }
+        if self.requests:
+            for p, value, value_scheduled in zip(PERCENTILES, np.percentile(latencies, PERCENTILES),
+                                                 np.percentile(scheduled, PERCENTILES)):
+                report[f'p{p}_ms'] = round(float(value), 2)
+                report[f'p{p}_from_schedule_ms'] = round(float(value_scheduled), 2)
+            report['max_ms'] = round(float(latencies.max()), 2)
+        return report
+
+
+def build_requests(df, offsets, endpoint, batch_size, batch_fraction=0.5, seed=42):
+    """
+    Turn transactions into (send time, endpoint, payload, transactions) tuples in send order.
+
+    Args:
+        df: Transactions
+        offsets: Send time of every transaction in seconds from the start
+        endpoint: predict, predict_batch, predict_many or mixed
+        batch_size: Transactions per batch upload or bulk request
+        batch_fraction: Share of transactions uploaded in batches when mixed
+    """
+    records = df[FEATURES].to_dict('records')
+    if endpoint == 'predict':
+        use_batch = np.zeros(len(df), dtype=bool)
+    elif endpoint in ('predict_batch', 'predict_many'):
+        use_batch = np.ones(len(df), dtype=bool)
+    else:
+        use_batch = np.random.default_rng(seed).random(len(df)) < batch_fraction
+
+    requests = [(offsets[i], 'predict', records[i], 1) for i in np.flatnonzero(~use_batch)]
+    batch_rows = np.flatnonzero(use_batch)
+    for i in range(0, len(batch_rows), batch_size):
+        rows = batch_rows[i:i + batch_size]
+        # A batch is sent once its last transaction is due
+        if endpoint == 'predict_many':
+            requests.append((offsets[rows[-1]], 'predict_many', df.iloc[rows][FEATURES].to_dict('list'), len(rows)))
+        else:
+            content = df.iloc[rows][FEATURES].to_csv(index=False)
+            requests.append((offsets[rows[-1]], 'predict_batch', content, len(rows)))
+    requests.sort(key=lambda request: request[0])
+    return requests
+
+
+async def send(client, endpoint, payload):
+    if endpoint == 'predict':
+        response = await client.post("/api/predict", json=payload)
+    elif endpoint == 'predict_many':
+        response = await client.post("/api/predict_many", json=payload)
+    else:
+        response = await client.post("/api/predict_batch", files={'file': ('batch.csv', payload, 'text/csv')})
+    return response.status_code
+
+
+async def run_load(client, requests, concurrency=DEFAULT_CONCURRENCY, duration=None):
+    """
+    Send the requests on schedule through a fixed number of concurrent clients.
+
+    The schedule is open loop: requests are released at their send time whether
+    or not earlier ones have finished. When every client is busy a request waits,
+    and that wait is reported separately from the request latency.
+
+    Args:
+        client: httpx.AsyncClient pointing at the API
+        requests: Output of build_requests
+        concurrency: Number of concurrent clients
+        duration: Stop releasing requests after this many seconds
+
+    Returns:
+        Report per endpoint
+    """
+    import httpx
+
+    stats = {'predict': EndpointStats(), 'predict_batch': EndpointStats(), 'predict_many': EndpointStats()}
+    pending = asyncio.Queue(maxsize=concurrency)
+    started = time.monotonic()
+
+    async def worker():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            scheduled_at, endpoint, payload, transactions = item
+            sent_at = time.monotonic()
+            try:
+                status = await send(client, endpoint, payload)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            stats[endpoint].record(status, time.monotonic() - sent_at, sent_at - scheduled_at, transactions)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for offset, endpoint, payload, transactions in requests:
+        if duration is not None and offset > duration:
+            break
+        delay = started + offset - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await pending.put((started + offset, endpoint, payload, transactions))
+    for _ in workers:
+        await pending.put(None)
+    await asyncio.gather(*workers)
+
+    elapsed = time.monotonic() - started
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'endpoints': {endpoint: endpoint_stats.report(elapsed)
+                      for endpoint, endpoint_stats in stats.items() if endpoint_stats.requests}
+    }
+
+
+async def main(args):
+    import httpx
+
+    df = load_transactions(args.csv, args.limit, args.start_step)
+    if args.step_seconds is not None:
+        offsets = step_schedule(df['step'], args.step_seconds)
+    else:
+        offsets = tps_schedule(len(df), args.tps)
+    requests = build_requests(df, offsets, args.endpoint, args.batch_size, args.batch_fraction)
+    logging.info(f"Replaying {len(df)} transactions in {len(requests)} requests over {offsets[-1]:.1f}s")
+
+    timeout = httpx.Timeout(REQUEST_TIMEOUT)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.in_process:
+        from api.main import app
+
+        # The ASGI transport does not run the lifespan, start the app the way uvicorn would
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+                report = await run_load(client, requests, args.concurrency, args.duration)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            report = await run_load(client, requests, args.concurrency, args.duration)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Replay PaySim transactions against the prediction endpoints")
+    parser.add_argument("--csv", default="data/paysim.csv", help="PaySim CSV file")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running API")
+    parser.add_argument("--in-process", action="store_true", help="Run the API in this process over ASGI")
+    parser.add_argument("--endpoint", choices=['predict', 'predict_batch', 'predict_many', 'mixed'], default='predict')
+    parser.add_argument("--tps", type=float, default=50.0, help="Target transactions per second")
+    parser.add_argument("--step-seconds", type=float,
+                        help="Follow the PaySim steps instead of a constant rate, one step lasting this many seconds")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent clients")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Transactions per batch upload or bulk request")
+    parser.add_argument("--batch-fraction", type=float, default=0.5,
+                        help="Share of transactions uploaded in batches with --endpoint mixed")
+    parser.add_argument("--limit", type=int, default=10000, help="Maximum number of transactions replayed")
+    parser.add_argument("--start-step", type=int, help="First PaySim step replayed")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    asyncio.run(main(parser.parse_args()))
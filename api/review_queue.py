@@ -0,0 +1,151 @@
+import math
+import os
+import time
+
+from sqlalchemy.orm import Session
+
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, ReviewQueueItem, ReviewQueueStats
+from models.decision_policy import get_policy
+
+# Share of the priority taken by the transaction amount, the rest is closeness to the threshold
+REVIEW_AMOUNT_WEIGHT = float(os.getenv("REVIEW_AMOUNT_WEIGHT", "0.3"))
+REVIEW_AMOUNT_SCALE = 10_000_000  # Amounts at or above this get the full amount weight
+REVIEW_LEASE_SECONDS = 300  # Default time a reviewer holds a claimed item
+CLAIM_CANDIDATES = 10  # Items fetched per claim attempt, covers reviewers racing for the same item
+
+
+def needs_manual_review(prediction, probability):
+    return get_policy().needs_manual_review(prediction, probability)
+
+
+def review_priority(probability, amount):
+    policy = get_policy()
+    center = (policy.review_lower + policy.review_upper) / 2
+    half_width = (policy.review_upper - policy.review_lower) / 2 or 1.0
+    closeness = max(0.0, 1 - abs(probability - center) / half_width)
+    amount_score = min(1.0, math.log1p(max(amount, 0.0)) / math.log1p(REVIEW_AMOUNT_SCALE))
+    return (1 - REVIEW_AMOUNT_WEIGHT) * closeness + REVIEW_AMOUNT_WEIGHT * amount_score
+
+
+def update_stats(db: Session, depth=0, enqueued=0, completed=0):
+    # Counters live in a single row so queue depth never needs a count over the queue
+    updated = db.query(ReviewQueueStats).filter(ReviewQueueStats.id == 1).update({
+        ReviewQueueStats.depth: ReviewQueueStats.depth + depth,
+        ReviewQueueStats.enqueued_total: ReviewQueueStats.enqueued_total + enqueued,
+        ReviewQueueStats.completed_total: ReviewQueueStats.completed_total + completed
+    }, synchronize_session=False)
+    if not updated:
+        db.add(ReviewQueueStats(id=1, depth=depth, enqueued_total=enqueued, completed_total=completed))
+
+
+def enqueue(db: Session, items):
+    """
+    Add predictions to the review queue. The caller commits.
+
+    Args:
+        db: Database session
+        items: Dicts with prediction_id, transaction_id, probability and amount
+    """
+    if not items:
+        return
+    now = time.time()
+    db.add_all([
+        ReviewQueueItem(
+            prediction_id=item['prediction_id'],
+            transaction_id=item['transaction_id'],
+            probability=item['probability'],
+            amount=item['amount'],
+            priority=review_priority(item['probability'], item['amount']),
+            lease_expires_at=0.0,
+            enqueued_at=now
+        )
+        for item in items
+    ])
+    update_stats(db, depth=len(items), enqueued=len(items))
+
+
+def claim(db: Session, reviewer, lease_seconds=REVIEW_LEASE_SECONDS):
+    """Lease the highest priority item that isn't held by another reviewer."""
+    while True:
+        now = time.time()
+        # Walks the priority index from the top, skipping items that are currently leased
+        candidates = (
+            db.query(ReviewQueueItem.prediction_id)
+            .filter(ReviewQueueItem.lease_expires_at <= now)
+            .order_by(ReviewQueueItem.priority.desc())
+            .limit(CLAIM_CANDIDATES)
+            .all()
+        )
+        if not candidates:
+            return None
+
+        for (prediction_id,) in candidates:
+            # Conditional update so two reviewers can never hold the same item
+            claimed = db.query(ReviewQueueItem).filter(
+                ReviewQueueItem.prediction_id == prediction_id,
+                ReviewQueueItem.lease_expires_at <= now
+            ).update({
+                ReviewQueueItem.claimed_by: reviewer,
+                ReviewQueueItem.lease_expires_at: now + lease_seconds
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.get(ReviewQueueItem, prediction_id)
+
+
+def release(db: Session, prediction_id, reviewer):
+    released = db.query(ReviewQueueItem).filter(
+        ReviewQueueItem.prediction_id == prediction_id,
+        ReviewQueueItem.claimed_by == reviewer
+    ).update({
+        ReviewQueueItem.claimed_by: None,
+        ReviewQueueItem.lease_expires_at: 0.0
+    }, synchronize_session=False)
+    db.commit()
+    return bool(released)
+
+
+def complete(db: Session, prediction_id):
+    """Remove a reviewed prediction from the queue. The caller commits."""
+    removed = db.query(ReviewQueueItem).filter(
+        ReviewQueueItem.prediction_id == prediction_id
+    ).delete(synchronize_session=False)
+    if removed:
+        update_stats(db, depth=-removed, completed=removed)
+    return bool(removed)
+
+
+def resync(db: Session):
+    """Align the queue with the manual_review flags after a bulk update. The caller commits."""
+    removed = db.query(ReviewQueueItem).filter(ReviewQueueItem.prediction_id.in_(
+        db.query(DBPrediction.id).filter(DBPrediction.manual_review.is_(False))
+    )).delete(synchronize_session=False)
+    if removed:
+        update_stats(db, depth=-removed)
+
+    missing = (
+        db.query(DBPrediction.id, DBPrediction.transaction_id, DBPrediction.probability, DBTransaction.amount)
+        .join(DBTransaction, DBTransaction.id == DBPrediction.transaction_id)
+        .outerjoin(ReviewQueueItem, ReviewQueueItem.prediction_id == DBPrediction.id)
+        .filter(DBPrediction.manual_review.is_(True), DBPrediction.reviewed.isnot(True),
+                ReviewQueueItem.prediction_id.is_(None))
+        .all()
+    )
+    enqueue(db, [
+        {'prediction_id': pid, 'transaction_id': tid, 'probability': probability, 'amount': amount}
+        for pid, tid, probability, amount in missing
+    ])
+    return removed, len(missing)
+
+
+def stats(db: Session):
+    row = db.get(ReviewQueueStats, 1)
+    return {
+        "depth": row.depth if row else 0,
+        "enqueued_total": row.enqueued_total if row else 0,
+        "completed_total": row.completed_total if row else 0,
+        "thresholds": {
+            "lower": get_policy().review_lower,
+            "upper": get_policy().review_upper
+        }
+    }
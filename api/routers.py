@@ -2,8 +2,20 @@ from fastapi import APIRouter
 from api.endpoints.transactions import router as transactions_router
 from api.endpoints.predictions import router as predictions_router
 from api.endpoints.analytics import router as analytics_router
+from api.endpoints.review import router as review_router
+from api.endpoints.policy import router as policy_router
+from api.endpoints.events import router as events_router
+from api.endpoints.archive import router as archive_router
+from api.endpoints.drift import router as drift_router
+from api.endpoints.admission import router as admission_router
 
 router = APIRouter()
 router.include_router(transactions_router, prefix="/api")
 router.include_router(predictions_router, prefix="/api")
 router.include_router(analytics_router, prefix="/api")
+router.include_router(review_router, prefix="/api")
+router.include_router(policy_router, prefix="/api")
+router.include_router(events_router, prefix="/api")
+router.include_router(archive_router, prefix="/api")
+router.include_router(drift_router, prefix="/api")
+router.include_router(admission_router, prefix="/api")
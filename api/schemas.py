@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import Dict, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+TRANSACTION_TYPES = ['CASH_IN', 'CASH_OUT', 'DEBIT', 'PAYMENT', 'TRANSFER']
 
 
 class TransactionInput(BaseModel):
@@ -26,3 +28,10 @@ class TransactionResponse(BaseModel):
     probability: float
     manual_review: bool
     reviewed_prediction: Optional[int] = None
+
+
+class DecisionPolicyInput(BaseModel):
+    threshold: float = Field(default=0.5, ge=0, le=1)
+    type_thresholds: Dict[str, float] = {}
+    review_lower: float = Field(default=0.45, ge=0, le=1)
+    review_upper: float = Field(default=0.55, ge=0, le=1)
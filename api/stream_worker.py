@@ -0,0 +1,480 @@
+import argparse
+import fcntl
+import json
+import logging
+import os
+import queue
+import select
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from pydantic import ValidationError
+
+from api.database import SessionLocal
+from api.drift_monitor import drift_monitor
+from api.persistence import save_scored_batch, TRANSACTION_FIELDS
+from api.schemas import TransactionInput
+from models.decision_policy import reload_policy_if_changed
+from models.inference import InferenceModel, MODEL_PATH
+
+MIN_BATCH_SIZE = 16
+MAX_BATCH_SIZE = 4096
+TARGET_BATCH_LATENCY = 0.25  # Seconds per scored and persisted batch the batch size adapts to
+MAX_WAIT = 0.5  # Seconds a read waits for a batch to fill up
+QUEUE_BATCHES = 4  # Batches read ahead of scoring, the reader blocks beyond this
+LEASE_SECONDS = 60  # Time a claimed file range or stream entry may stay unacknowledged
+METRICS_INTERVAL = 10  # Seconds between metric reports
+MODEL_RELOAD_INTERVAL = 30  # Seconds between checks for an updated model or policy
+RETRY_BACKOFF = 1  # Seconds before the first retry of a failed batch, doubled on every further failure
+MAX_RETRY_BACKOFF = 60  # Upper bound of the retry delay
+
+
+class Batch:
+    def __init__(self, token, records):
+        self.token = token
+        self.records = records
+        self.read_at = time.monotonic()
+        self.committed = False  # A retry after a failed ack must not store the batch again
+
+
+class NDJSONFileSource:
+    """
+    Tails a newline-delimited JSON file.
+
+    Workers sharing the file claim disjoint byte ranges under a file lock. A range
+    is only committed once it has been acknowledged, ranges that aren't
+    acknowledged within the lease are handed out again (at-least-once).
+
+    Args:
+        path: NDJSON file to consume
+        lease_seconds: Seconds before an unacknowledged range is redelivered
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.state_path = f"{path}.offsets"
+        self.lock_path = f"{path}.lock"
+        self.lease_seconds = lease_seconds
+
+    @contextmanager
+    def locked_state(self):
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.state_path):
+                    with open(self.state_path) as f:
+                        state = json.load(f)
+                else:
+                    state = {'committed': 0, 'next': 0, 'inflight': [], 'done': []}
+                yield state
+                tmp_path = f"{self.state_path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def claim(self, max_records):
+        now = time.time()
+        with self.locked_state() as state:
+            for claim in state['inflight']:
+                if claim[2] < now:
+                    claim[2] = now + self.lease_seconds
+                    return claim[0], claim[1], self.read_range(claim[0], claim[1])
+
+            start = state['next']
+            lines = []
+            end = start
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                while len(lines) < max_records:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break  # Partially written line, picked up on a later read
+                    lines.append(line)
+                    end += len(line)
+            if not lines:
+                return None
+
+            state['inflight'].append([start, end, now + self.lease_seconds])
+            state['next'] = end
+            return start, end, lines
+
+    def read_range(self, start, end):
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start).splitlines(keepends=True)
+
+    def read(self, max_records, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            claim = self.claim(max_records)
+            if claim is not None:
+                start, end, lines = claim
+                return Batch((start, end), [parse_record(line) for line in lines if line.strip()])
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(0.05, timeout))
+
+    def ack(self, token):
+        start, end = token
+        with self.locked_state() as state:
+            state['inflight'] = [claim for claim in state['inflight'] if claim[0] != start]
+            state['done'].append([start, end])
+            state['done'].sort()
+            # Advance the committed offset over the contiguous acknowledged ranges
+            while state['done'] and state['done'][0][0] <= state['committed']:
+                state['committed'] = max(state['committed'], state['done'].pop(0)[1])
+
+    def lag(self):
+        with self.locked_state() as state:
+            committed = state['committed']
+        return {'bytes': max(0, os.path.getsize(self.path) - committed)}
+
+
+class NamedPipeSource:
+    """
+    Reads newline-delimited JSON from a named pipe. Data in a pipe can't be
+    replayed, so delivery is at-most-once and the pipe has a single consumer.
+
+    Args:
+        path: Path of the FIFO, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        self.fd = None
+        self.buffer = b''
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+
+    def read(self, max_records, timeout):
+        if self.fd is None:
+            self.open()
+
+        deadline = time.monotonic() + timeout
+        while self.buffer.count(b'\n') < max_records:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                break
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                # All writers closed the pipe, reopen to wait for the next one
+                os.close(self.fd)
+                self.open()
+                time.sleep(min(0.05, remaining))
+                continue
+            self.buffer += chunk
+
+        lines = self.buffer.split(b'\n')
+        complete, self.buffer = lines[:-1], lines[-1]
+        if len(complete) > max_records:
+            self.buffer = b'\n'.join(complete[max_records:] + [self.buffer])
+            complete = complete[:max_records]
+        if not complete:
+            return None
+        return Batch(None, [parse_record(line) for line in complete if line.strip()])
+
+    def ack(self, token):
+        pass
+
+    def lag(self):
+        return {'buffered_bytes': len(self.buffer)}
+
+
+class RedisStreamSource:
+    """
+    Consumes a Redis stream (or any server speaking the Redis streams protocol)
+    through a consumer group, so any number of workers can share it. Entries are
+    acknowledged after they're persisted and entries left pending by a crashed
+    worker are claimed by the others after the lease (at-least-once).
+
+    Each entry holds the transaction either as JSON in a "data" field or as one
+    field per transaction attribute.
+
+    Args:
+        url: Redis connection URL
+        stream: Stream key
+        group: Consumer group shared by the workers
+        consumer: Name of this worker within the group
+        lease_seconds: Idle time after which pending entries are claimed
+    """
+
+    def __init__(self, url, stream, group, consumer, lease_seconds=LEASE_SECONDS):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis source requires the redis package (pip install redis)") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.lease_ms = int(lease_seconds * 1000)
+        self.last_claim = 0.0
+        try:
+            self.client.xgroup_create(stream, group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def read(self, max_records, timeout):
+        entries = []
+        if time.monotonic() - self.last_claim >= self.lease_ms / 1000:
+            self.last_claim = time.monotonic()
+            entries = self.client.xautoclaim(self.stream, self.group, self.consumer,
+                                             min_idle_time=self.lease_ms, start_id='0-0', count=max_records)[1]
+        if not entries:
+            response = self.client.xreadgroup(self.group, self.consumer, {self.stream: '>'},
+                                              count=max_records, block=max(1, int(timeout * 1000)))
+            entries = response[0][1] if response else []
+        if not entries:
+            return None
+
+        records = []
+        for _, fields in entries:
+            fields = {key.decode(): value.decode() for key, value in fields.items()}
+            records.append(parse_record(fields['data']) if 'data' in fields else fields)
+        return Batch([entry_id for entry_id, _ in entries], records)
+
+    def ack(self, token):
+        self.client.xack(self.stream, self.group, *token)
+
+    def lag(self):
+        for group in self.client.xinfo_groups(self.stream):
+            name = group['name'].decode() if isinstance(group['name'], bytes) else group['name']
+            if name == self.group:
+                return {'entries': group.get('lag'), 'pending': group.get('pending')}
+        return {}
+
+
+def parse_record(line):
+    try:
+        return json.loads(line)
+    except (ValueError, TypeError):
+        return None
+
+
+class StreamMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.records_scored = 0
+        self.records_invalid = 0
+        self.batches = 0
+        self.batch_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.failures = 0
+        self.window_start = time.monotonic()
+        self.window_records = 0
+
+    def record_batch(self, scored, invalid, queue_wait, seconds):
+        self.records_scored += scored
+        self.records_invalid += invalid
+        self.batches += 1
+        self.batch_seconds += seconds
+        self.queue_wait_seconds += queue_wait
+        self.window_records += scored
+
+    def report(self, batch_size, queued_batches, lag):
+        now = time.monotonic()
+        throughput = self.window_records / (now - self.window_start) if now > self.window_start else 0.0
+        self.window_start = now
+        self.window_records = 0
+        return {
+            'uptime_seconds': round(now - self.started, 1),
+            'records_scored': self.records_scored,
+            'records_invalid': self.records_invalid,
+            'batches': self.batches,
+            'failed_attempts': self.failures,
+            'throughput_per_second': round(throughput, 1),
+            'avg_batch_seconds': round(self.batch_seconds / self.batches, 4) if self.batches else 0.0,
+            'avg_queue_wait_seconds': round(self.queue_wait_seconds / self.batches, 4) if self.batches else 0.0,
+            'batch_size': batch_size,
+            'queued_batches': queued_batches,
+            'lag': lag
+        }
+
+
+class StreamWorker:
+    """
+    Scores transactions from a source in adaptive micro-batches and persists them in bulk.
+
+    A reader thread fills a bounded queue of batches, so a slow database or model
+    stops reading from the source instead of buffering without limit. Batches are
+    acknowledged only after they are committed.
+    """
+
+    def __init__(self, source, model, metrics_file=None):
+        self.source = source
+        self.model = model
+        self.metrics_file = metrics_file
+        self.batch_size = MIN_BATCH_SIZE
+        self.batches = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.metrics = StreamMetrics()
+        self.running = False
+
+    def read_loop(self):
+        while self.running:
+            try:
+                batch = self.source.read(self.batch_size, MAX_WAIT)
+            except Exception:
+                logging.exception("Reading from the source failed")
+                time.sleep(1)
+                continue
+            if batch is None:
+                continue
+            while self.running:
+                try:
+                    self.batches.put(batch, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    def adapt_batch_size(self, batch, seconds):
+        # Grow while batches are full and fast, shrink when they exceed the latency target
+        if seconds > TARGET_BATCH_LATENCY:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+        elif len(batch.records) >= self.batch_size and seconds < TARGET_BATCH_LATENCY / 2:
+            self.batch_size = min(MAX_BATCH_SIZE, self.batch_size * 2)
+
+    def process(self, batch):
+        start_time = time.monotonic()
+        valid = []
+        for record in batch.records:
+            try:
+                valid.append(TransactionInput(**record).model_dump())
+            except (ValidationError, TypeError):
+                logging.warning(f"Skipping invalid stream record: {record}")
+
+        if valid and not batch.committed:
+            frame = pd.DataFrame(valid, columns=TRANSACTION_FIELDS)
+            probabilities, predictions = self.model.score(frame)
+            db = SessionLocal()
+            try:
+                save_scored_batch(db, valid, probabilities, predictions)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            batch.committed = True
+            try:
+                drift_monitor.observe(self.model, frame, probabilities)
+            except Exception:
+                logging.exception("Failed to record the batch for drift monitoring")
+
+        self.source.ack(batch.token)
+        seconds = time.monotonic() - start_time
+        self.metrics.record_batch(len(valid), len(batch.records) - len(valid), start_time - batch.read_at, seconds)
+        self.adapt_batch_size(batch, seconds)
+
+    def report_metrics(self):
+        try:
+            lag = self.source.lag()
+        except Exception:
+            lag = None
+        report = self.metrics.report(self.batch_size, self.batches.qsize(), lag)
+        logging.info(f"Stream metrics: {report}")
+        if self.metrics_file:
+            tmp_path = f"{self.metrics_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(report, f)
+            os.replace(tmp_path, self.metrics_file)
+
+    def wait(self, seconds):
+        # Sleeps in short steps so a stop request isn't held up by a long backoff
+        deadline = time.monotonic() + seconds
+        while self.running and time.monotonic() < deadline:
+            time.sleep(min(0.1, deadline - time.monotonic()))
+
+    def stop(self, *args):
+        logging.info("Stopping stream worker, unacknowledged batches will be redelivered")
+        self.running = False
+
+    def run(self):
+        self.running = True
+        reader = threading.Thread(target=self.read_loop, daemon=True)
+        reader.start()
+
+        last_report = last_reload = time.monotonic()
+        batch = None
+        failures = 0
+        while self.running:
+            if batch is None:
+                try:
+                    batch = self.batches.get(timeout=1)
+                except queue.Empty:
+                    pass
+            if batch is not None:
+                try:
+                    self.process(batch)
+                    batch = None
+                    failures = 0
+                except Exception:
+                    # Keep the batch and retry it, e.g. while the database is locked or unavailable
+                    failures += 1
+                    self.metrics.failures += 1
+                    delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** (failures - 1))
+                    logging.exception(f"Failed to process a batch of {len(batch.records)} records, "
+                                      f"retrying in {delay}s")
+                    self.wait(delay)
+
+            now = time.monotonic()
+            if now - last_reload >= MODEL_RELOAD_INTERVAL:
+                last_reload = now
+                try:
+                    self.model.reload_if_changed()
+                    reload_policy_if_changed()
+                except Exception:
+                    logging.exception("Failed to reload updated model or policy, keeping the current one")
+            if now - last_report >= METRICS_INTERVAL:
+                last_report = now
+                self.report_metrics()
+
+        reader.join(timeout=MAX_WAIT * 2)
+        self.report_metrics()
+
+
+def create_source(args):
+    if args.source == 'file':
+        return NDJSONFileSource(args.path)
+    if args.source == 'pipe':
+        return NamedPipeSource(args.path)
+    return RedisStreamSource(args.redis_url, args.stream, args.group,
+                             args.consumer or f"{socket.gethostname()}-{os.getpid()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Score transactions from a stream and store the predictions")
+    parser.add_argument("source", choices=['file', 'pipe', 'redis'], help="Kind of source to consume")
+    parser.add_argument("--path", help="NDJSON file or named pipe to read from")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--stream", default="transactions", help="Redis stream key")
+    parser.add_argument("--group", default="fraud-scorers", help="Consumer group shared by all workers")
+    parser.add_argument("--consumer", help="Consumer name within the group (default: host and pid)")
+    parser.add_argument("--metrics-file", help="Write the latest metrics as JSON to this file")
+    args = parser.parse_args()
+    if args.source in ('file', 'pipe') and not args.path:
+        parser.error(f"--path is required for the {args.source} source")
+
+    model = InferenceModel()
+    model.load_model(MODEL_PATH)
+
+    worker = StreamWorker(create_source(args), model, args.metrics_file)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
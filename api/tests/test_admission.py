@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.admission import AdmissionController, AdmissionMiddleware, WINDOW_SIZE
+
+CLASSES = {
+    'realtime': {'rank': 0, 'limit': 2, 'min_limit': 1, 'max_limit': 8, 'queue': 1, 'max_wait': 0.5,
+                 'target_latency': 0.05},
+    'bulk': {'rank': 1, 'limit': 4, 'min_limit': 1, 'max_limit': 8, 'queue': 1, 'max_wait': 0.05,
+             'target_latency': 10.0}
+}
+ENDPOINTS = {('POST', '/api/predict'): 'realtime', ('POST', '/api/predict_batch'): 'bulk'}
+
+
+def make_app(controller, release):
+    app = FastAPI()
+
+    @app.post("/api/predict")
+    async def predict():
+        await release.wait()
+        return {'prediction': 0}
+
+    @app.post("/api/predict_batch")
+    async def predict_batch():
+        await release.wait()
+        return {'predictions': []}
+
+    @app.get("/api/health")
+    async def health():
+        return {'status': 'ok'}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_excess_requests_queue_then_shed():
+    controller = AdmissionController(CLASSES, ENDPOINTS, enabled=True)
+    release = asyncio.Event()
+    async with make_app(controller, release) as client:
+        # Two run, one waits and the fourth finds the queue full
+        running = [asyncio.create_task(client.post("/api/predict")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        shed = await client.post("/api/predict")
+        unlimited = await client.get("/api/health")
+        release.set()
+        responses = await asyncio.gather(*running)
+
+    assert shed.status_code == 503 and int(shed.headers['Retry-After']) >= 1
+    assert unlimited.status_code == 200
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    stats = controller.stats()['endpoints']['POST /api/predict']
+    assert stats['admitted'] == 3 and stats['queued'] == 1 and stats['rejected']['queue_full'] == 1
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_too_long_is_rejected():
+    controller = AdmissionController(CLASSES, ENDPOINTS, enabled=True)
+    release = asyncio.Event()
+    async with make_app(controller, release) as client:
+        running = [asyncio.create_task(client.post("/api/predict_batch")) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        timed_out = await client.post("/api/predict_batch")
+        release.set()
+        await asyncio.gather(*running)
+
+    assert timed_out.status_code == 503
+    assert controller.stats()['endpoints']['POST /api/predict_batch']['rejected']['timeout'] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_give_their_slot_back():
+    controller = AdmissionController(CLASSES, ENDPOINTS, enabled=True)
+    limiter = controller.limiter_for('POST', '/api/predict')
+    await limiter.acquire()
+    await limiter.acquire()
+
+    # Cancelled while still queued
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert limiter.in_flight == 2 and len(limiter.waiters) == 0
+
+    # Cancelled right after being handed a slot
+    admitted = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release(0.01)
+    admitted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await admitted
+
+    assert limiter.in_flight == 1 and len(limiter.waiters) == 0
+    await limiter.acquire()
+    assert limiter.in_flight == 2
+
+
+def test_limits_follow_latency_and_priority():
+    controller = AdmissionController(CLASSES, ENDPOINTS, enabled=True)
+    realtime = controller.limiter_for('POST', '/api/predict')
+    bulk = controller.limiter_for('POST', '/api/predict_batch')
+
+    # Saturated and fast: additive increase
+    realtime.peak = 2
+    for _ in range(WINDOW_SIZE):
+        realtime.record(0.01)
+    assert realtime.limit == 3
+
+    # Slow: multiplicative decrease, and bulk drops to its minimum while real-time backs off
+    for _ in range(WINDOW_SIZE):
+        realtime.record(0.5)
+    assert realtime.limit == pytest.approx(2.25)
+    assert bulk.current_limit() == 1
+    assert controller.stats()['classes_under_pressure'] == ['realtime']
+    assert realtime.current_limit() == 2
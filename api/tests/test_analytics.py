@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from api.archive import Archive
+from api.endpoints import analytics
+from api.endpoints.analytics import get_transaction_analytics
+from api.persistence import save_scored_batch
+
+
+def store(db, steps, amounts, balances, predictions):
+    records = [
+        {'step': int(step), 'amount': float(amount), 'type': 'TRANSFER', 'oldbalanceOrg': float(balance),
+         'newbalanceOrig': 0.0, 'oldbalanceDest': 0.0, 'newbalanceDest': float(amount)}
+        for step, amount, balance in zip(steps, amounts, balances)
+    ]
+    save_scored_batch(db, records, [float(p) for p in predictions], [int(p) for p in predictions])
+    db.commit()
+
+
+@pytest.fixture(autouse=True)
+def archive(tmp_path, monkeypatch):
+    archive = Archive(str(tmp_path / "archive"))
+    monkeypatch.setattr(analytics, 'archive', archive)
+    return archive
+
+
+@pytest.fixture
+def spread_out(db):
+    # Amounts spread over seven orders of magnitude and a third of the balances zero
+    rng = np.random.default_rng(0)
+    n = 3000
+    amounts = 10 ** rng.uniform(0, 7, n)
+    balances = np.where(np.arange(n) % 3 == 0, 0.0, 10 ** rng.uniform(2, 8, n))
+    store(db, np.arange(n) % 700, amounts, balances, np.arange(n) % 10 == 0)
+    return db
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("binning", ["log", "quantile", "linear"])
+async def test_histograms_are_bounded_and_complete(spread_out, binning):
+    result = await get_transaction_analytics(max_bins=20, max_steps=250, binning=binning, db=spread_out)
+
+    assert 0 < len(result['amountDistribution']) <= 20
+    assert 0 < len(result['balanceDistribution']) <= 20
+    assert sum(row['count'] for row in result['amountDistribution']) == 3000
+    assert sum(row['legitimate'] + row['fraudulent'] for row in result['balanceDistribution']) == 3000
+    lows = [row['min'] for row in result['amountDistribution']]
+    assert lows == sorted(lows)
+
+
+@pytest.mark.asyncio
+async def test_log_bins_resolve_small_amounts(spread_out):
+    result = await get_transaction_analytics(max_bins=20, max_steps=250, binning="log", db=spread_out)
+
+    # Fixed width bins would put every amount below 100,000 into one bin
+    assert sum(row['max'] <= 100000 for row in result['amountDistribution']) >= 10
+
+
+@pytest.mark.asyncio
+async def test_steps_are_merged_into_ranges(spread_out):
+    result = await get_transaction_analytics(max_bins=20, max_steps=100, binning="log", db=spread_out)
+
+    steps = result['stepDistribution']
+    assert result['stepBucketSize'] == 7
+    assert len(steps) == 100
+    assert steps[0]['step'] == 0 and steps[0]['stepEnd'] == 6
+    assert all(row['step'] % 7 == 0 for row in steps)
+    assert result['legitimateCount'] + result['fraudulentCount'] == 3000
+    assert result['fraudulentCount'] == 300
+
+
+@pytest.mark.asyncio
+async def test_single_value_and_empty_tables(db):
+    result = await get_transaction_analytics(max_bins=20, max_steps=250, binning="quantile", db=db)
+    assert result['amountDistribution'] == [] and result['summaryStats']['totalTransactions'] == 0
+
+    store(db, [3, 3], [50.0, 50.0], [0.0, 0.0], [0, 1])
+    result = await get_transaction_analytics(max_bins=20, max_steps=250, binning="log", db=db)
+    assert result['amountDistribution'] == [{'amountRange': '50 - 50', 'min': 50.0, 'max': 50.0, 'count': 2}]
+    assert result['stepDistribution'] == [{'step': 3, 'stepEnd': 3, 'legitimate': 1, 'fraudulent': 1}]
+
+
+@pytest.mark.asyncio
+async def test_archived_rows_stay_in_the_aggregates(db, archive):
+    store(db, np.arange(100), np.arange(100) + 1.0, np.full(100, 50.0), np.arange(100) % 4 == 0)
+    before = await get_transaction_analytics(max_bins=20, max_steps=30, binning="log", db=db)
+
+    archived = archive.run_retention(db, retention_steps=50)
+    after = await get_transaction_analytics(max_bins=20, max_steps=30, binning="log", db=db)
+
+    assert sum(entry['rows'] for entry in archived) == 48
+    for key in ('stepDistribution', 'stepBucketSize', 'legitimateCount', 'fraudulentCount', 'summaryStats'):
+        assert after[key] == before[key]
+    assert after['archived'] == {'transactions': 48, 'fraudulent': 12, 'partitions': 2, 'inHistograms': False}
+    assert sum(row['count'] for row in after['amountDistribution']) == 52
+
+    # Manifests written before per-step counts existed are read from the archive files
+    entries = archive.manifest()
+    for entry in entries:
+        del entry['step_counts'], entry['amount_min'], entry['amount_max']
+    archive.save_manifest(entries)
+    legacy = await get_transaction_analytics(max_bins=20, max_steps=30, binning="log", db=db)
+    assert legacy['stepDistribution'] == before['stepDistribution']
+    assert legacy['summaryStats'] == before['summaryStats']
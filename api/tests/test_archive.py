@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from api import review_queue
+from api.archive import Archive
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, IdempotencyKey
+from api.persistence import save_scored_batch
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return Archive(str(tmp_path / "archive"))
+
+
+def store(db, steps, probabilities):
+    records = [
+        {'step': step, 'amount': 100.0 + i, 'type': 'TRANSFER' if i % 2 else 'PAYMENT', 'oldbalanceOrg': 500.0,
+         'newbalanceOrig': 400.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 100.0}
+        for i, step in enumerate(steps)
+    ]
+    predictions = [int(p > 0.5) for p in probabilities]
+    responses = save_scored_batch(db, records, probabilities, predictions)
+    db.commit()
+    return responses
+
+
+def test_old_partitions_are_archived_and_queryable(db, archive):
+    # Steps 0-23 and 24-47 are old, 200 is the newest step
+    old = store(db, [1, 5, 30, 30], [0.1, 0.9, 0.2, 0.3])
+    store(db, [190, 200], [0.1, 0.2])
+    db.add(IdempotencyKey(key="retry-1", transaction_id=old[0]['id'], prediction_id=old[0]['prediction_id'],
+                          created_at=datetime(2024, 1, 1)))
+    db.commit()
+
+    archived = archive.run_retention(db, retention_steps=100)
+
+    assert [entry['step_start'] for entry in archived] == [0, 24]
+    assert [entry['rows'] for entry in archived] == [2, 2]
+    assert all(entry['committed'] for entry in archive.manifest())
+    assert db.query(DBTransaction).count() == 2
+    assert db.query(DBPrediction).count() == 2
+    assert db.query(IdempotencyKey).count() == 0
+
+    rows, total = archive.query()
+    assert total == 4
+    assert [row['id'] for row in rows] == [response['id'] for response in old]
+    assert rows[1]['prediction'] == 1 and rows[1]['type'] == 'TRANSFER'
+
+    rows, total = archive.query(step_start=30, step_end=30, limit=1)
+    assert total == 2
+    assert len(rows) == 1 and rows[0]['step'] == 30
+
+    summary = archive.summary()
+    assert summary['rows'] == 4
+    assert summary['fraudulent'] == 1
+
+
+def test_rows_pending_review_stay_in_database(db, archive):
+    pending = store(db, [2, 3], [0.5, 0.1])
+    store(db, [300], [0.1])
+
+    archive.run_retention(db, retention_steps=100)
+    assert archive.summary()['rows'] == 1
+    assert db.query(DBPrediction).filter(DBPrediction.id == pending[0]['prediction_id']).count() == 1
+
+    # Once reviewed the row is archived by the next run, in a second file for the same partition
+    review_queue.complete(db, pending[0]['prediction_id'])
+    db.commit()
+    archived = archive.run_retention(db, retention_steps=100)
+
+    assert [entry['file'] for entry in archived] == ["steps_0000000_0000023_001.npz"]
+    rows, total = archive.query(manual_review=True)
+    assert total == 1
+    assert rows[0]['prediction_id'] == pending[0]['prediction_id']
+
+
+def test_interrupted_run_is_completed(db, archive):
+    store(db, [1, 2], [0.1, 0.2])
+    store(db, [300], [0.1])
+    # Simulate a crash after the archive file and manifest were written
+    def crash(*args):
+        raise RuntimeError("interrupted")
+
+    archive.delete_rows = crash
+    with pytest.raises(RuntimeError):
+        archive.run_retention(db, retention_steps=100)
+    assert db.query(DBTransaction).count() == 3
+    assert not archive.manifest()[0]['committed']
+
+    del archive.delete_rows
+    archive.run_retention(db, retention_steps=100)
+
+    assert db.query(DBTransaction).count() == 1
+    assert archive.summary()['rows'] == 2
+    assert all(entry['committed'] for entry in archive.manifest())
+
+
+def test_concurrent_runs_are_serialised(db, archive):
+    store(db, [1, 2], [0.1, 0.2])
+    store(db, [300], [0.1])
+    # A second process pointing at the same directory waits for the running one
+    other = Archive(archive.directory)
+    results = []
+    with archive.lock():
+        thread = threading.Thread(target=lambda: results.append(other.run_retention(db, retention_steps=100)))
+        thread.start()
+        time.sleep(0.2)
+        assert thread.is_alive()
+        assert archive.manifest() == []
+        # The lock holder archives the partition, the waiting run then finds nothing left
+        entry = archive.archive_partition(db, 0)
+    thread.join()
+
+    assert entry['rows'] == 2
+    assert results == [[]]
+    assert len(archive.manifest()) == 1 and archive.summary()['rows'] == 2
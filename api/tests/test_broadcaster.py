@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from sqlalchemy.orm import sessionmaker
+import api.broadcaster
+from api.broadcaster import Broadcaster
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+
+
+def add_scored(db, step, prediction, amount=100.0):
+    transaction = DBTransaction(step=step, amount=amount, type='TRANSFER', oldbalanceOrg=0.0,
+                                newbalanceOrig=0.0, oldbalanceDest=0.0, newbalanceDest=0.0)
+    db.add(transaction)
+    db.flush()
+    db.add(DBPrediction(transaction_id=transaction.id, prediction=prediction, probability=0.9 * prediction))
+    db.commit()
+
+
+@pytest.mark.asyncio
+async def test_publish_fans_out_one_message():
+    broadcaster = Broadcaster()
+    broadcaster.subscribers = {asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)}
+
+    broadcaster.publish("review", {"prediction_id": 1})
+
+    messages = [subscriber.get_nowait() for subscriber in broadcaster.subscribers]
+    assert messages[0] is messages[1]
+    assert messages[0].startswith("event: review\n")
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_told_to_resync():
+    broadcaster = Broadcaster()
+    subscriber = asyncio.Queue(maxsize=1)
+    broadcaster.subscribers = {subscriber}
+
+    broadcaster.publish("review", {})
+    broadcaster.publish("review", {})
+
+    assert subscriber.get_nowait().startswith("event: resync")
+
+
+def test_collect_deltas_only_covers_new_rows(db, monkeypatch):
+    monkeypatch.setattr(api.broadcaster, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    broadcaster = Broadcaster()
+    add_scored(db, step=1, prediction=0)
+    assert broadcaster.collect_deltas() is None
+
+    add_scored(db, step=1, prediction=1, amount=50.0)
+    add_scored(db, step=2, prediction=0, amount=150.0)
+    deltas = broadcaster.collect_deltas()
+
+    assert deltas["transactions"]["count"] == 2
+    assert [t["step"] for t in deltas["transactions"]["data"]] == [2, 1]
+    assert deltas["buckets"]["steps"] == [[1, 0, 1], [2, 1, 0]]
+    assert deltas["buckets"]["amountSum"] == 200.0
+    assert broadcaster.collect_deltas() is None
+
+
+@pytest.mark.asyncio
+async def test_reconnect_after_idle_sends_no_stale_deltas(db, monkeypatch):
+    monkeypatch.setattr(api.broadcaster, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(api.broadcaster, "POLL_INTERVAL", 0.01)
+    broadcaster = Broadcaster()
+    add_scored(db, step=1, prediction=0)
+
+    subscriber = broadcaster.subscribe()
+    await asyncio.sleep(0.05)
+    broadcaster.unsubscribe(subscriber)
+    await broadcaster.task
+
+    # Stored while nobody was connected, the reconnecting client fetches these itself
+    add_scored(db, step=2, prediction=1)
+    add_scored(db, step=3, prediction=0)
+    subscriber = broadcaster.subscribe()
+    await asyncio.sleep(0.05)
+    add_scored(db, step=4, prediction=1)
+    await asyncio.sleep(0.05)
+    broadcaster.unsubscribe(subscriber)
+    await broadcaster.task
+
+    messages = []
+    while not subscriber.empty():
+        messages.append(subscriber.get_nowait())
+    buckets = [message for message in messages if message.startswith("event: buckets")]
+    assert len(buckets) == 1
+    assert '"steps":[[4,0,1]]' in buckets[0]
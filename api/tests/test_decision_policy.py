@@ -0,0 +1,58 @@
+import numpy as np
+from api import review_queue
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, ReviewQueueItem
+from api.endpoints.policy import apply_policy
+from models.decision_policy import Calibrator, DecisionPolicy, DecisionTable
+
+
+def test_decision_table_applies_type_thresholds():
+    policy = DecisionPolicy(threshold=0.5, type_thresholds={'TRANSFER': 0.2})
+    table = DecisionTable(policy)
+
+    probabilities, predictions = table.lookup(np.array([0.3, 0.3, 0.7]), ['TRANSFER', 'PAYMENT', 'PAYMENT'])
+
+    assert np.allclose(probabilities, [0.3, 0.3, 0.7])
+    assert predictions.tolist() == [1, 0, 1]
+
+
+def test_manual_review_mask_matches_needs_manual_review():
+    policy = DecisionPolicy(review_lower=0.4, review_upper=0.6)
+    predictions = [0, 0, 0, 1, 0]
+    probabilities = [0.39, 0.4, 0.6, 0.5, 0.61]
+
+    mask = policy.manual_review_mask(predictions, probabilities)
+
+    assert mask.tolist() == [False, True, True, False, False]
+    assert [policy.needs_manual_review(p, q) for p, q in zip(predictions, probabilities)] == mask.tolist()
+
+
+def test_calibrator_is_monotone_lookup():
+    rng = np.random.default_rng(0)
+    raw = rng.random(2000)
+    y = (rng.random(2000) < raw ** 2).astype(int)
+
+    for method in ['isotonic', 'platt']:
+        calibrator = Calibrator.fit(raw, y, method)
+        assert np.all(np.diff(calibrator.table) >= 0)
+        assert calibrator.transform([0.1])[0] < calibrator.transform([0.9])[0]
+
+
+def test_apply_policy_updates_stored_predictions(db):
+    for i, (transaction_type, probability) in enumerate([('TRANSFER', 0.3), ('PAYMENT', 0.3), ('PAYMENT', 0.6)]):
+        db.add(DBTransaction(id=i + 1, step=1, amount=100.0, type=transaction_type, oldbalanceOrg=0.0,
+                             newbalanceOrig=0.0, oldbalanceDest=0.0, newbalanceDest=0.0))
+        db.add(DBPrediction(id=i + 1, transaction_id=i + 1, prediction=int(probability > 0.5),
+                            probability=probability, manual_review=False))
+    db.commit()
+
+    policy = DecisionPolicy(threshold=0.5, type_thresholds={'TRANSFER': 0.2}, review_lower=0.25, review_upper=0.35)
+    assert apply_policy(db, policy) == 3
+    db.commit()
+
+    rows = db.query(DBPrediction).order_by(DBPrediction.id).all()
+    assert [row.prediction for row in rows] == [1, 0, 1]
+    assert [row.manual_review for row in rows] == [False, True, False]
+
+    assert review_queue.resync(db) == (0, 1)
+    db.commit()
+    assert [item.prediction_id for item in db.query(ReviewQueueItem).all()] == [2]
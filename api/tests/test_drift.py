@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from api.drift_monitor import DriftMonitor
+from models.drift import DriftReference
+
+
+def make_frame(n, seed=0, amount_scale=1.0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.lognormal(8, 1.5, n) * amount_scale
+    balances = rng.lognormal(9, 2, n)
+    return pd.DataFrame({
+        'step': rng.integers(1, 744, n),
+        'amount': amounts,
+        'type': rng.choice(['CASH_IN', 'CASH_OUT', 'PAYMENT', 'TRANSFER'], n, p=[0.2, 0.35, 0.35, 0.1]),
+        'oldbalanceOrg': balances,
+        'newbalanceOrig': np.maximum(balances - amounts, 0),
+        'oldbalanceDest': balances[::-1],
+        'newbalanceDest': balances[::-1] + amounts
+    })
+
+
+class FakeModel:
+    def __init__(self, reference):
+        self.drift_reference = reference
+
+
+def make_reference():
+    X = make_frame(5000)
+    return DriftReference.fit(X, np.random.default_rng(1).beta(1, 20, len(X))).to_dict()
+
+
+def test_shifted_amounts_are_reported(tmp_path):
+    model = FakeModel(make_reference())
+    monitor = DriftMonitor(str(tmp_path))
+
+    live = make_frame(2000, seed=2)
+    monitor.observe(model, live, np.random.default_rng(3).beta(1, 20, len(live)))
+    report = monitor.report(model)
+    assert report['status'] == 'stable'
+    assert report['features']['amount']['psi'] < 0.1
+
+    monitor = DriftMonitor(str(tmp_path / "shifted"))
+    shifted = make_frame(2000, seed=2, amount_scale=5.0)
+    shifted['type'] = 'TRANSFER'
+    monitor.observe(model, shifted, np.random.default_rng(3).beta(1, 20, len(shifted)))
+    report = monitor.report(model)
+    assert report['status'] == 'drift'
+    assert {'amount', 'type'} <= set(report['drifted'])
+    assert report['features']['type']['live_shares']['TRANSFER'] == 1.0
+
+
+def test_single_records_match_batches():
+    reference = DriftReference.from_dict(make_reference())
+    frame = make_frame(200, seed=4)
+    probabilities = np.linspace(0, 1, len(frame))
+
+    batch = reference.new_sketch()
+    batch.update(frame, probabilities)
+    single = reference.new_sketch()
+    for record, probability in zip(frame.to_dict('records'), probabilities):
+        single.update_record(record, probability)
+
+    assert batch.counts_dict() == single.counts_dict()
+
+
+def test_sketches_of_other_processes_are_merged(tmp_path):
+    model = FakeModel(make_reference())
+    monitor = DriftMonitor(str(tmp_path))
+    frame = make_frame(300, seed=5)
+    monitor.observe(model, frame, np.full(len(frame), 0.01))
+    monitor.flush()
+
+    # Another process with the same reference, and a stale one from an older model
+    other = monitor.reference.new_sketch()
+    other.update(frame, np.full(len(frame), 0.01))
+    with open(os.path.join(tmp_path, "worker-2.json"), 'w') as f:
+        json.dump({'reference_id': monitor.reference.reference_id, 'counts': other.counts_dict()}, f)
+    with open(os.path.join(tmp_path, "worker-3.json"), 'w') as f:
+        json.dump({'reference_id': 'older-model', 'counts': other.counts_dict()}, f)
+
+    report = monitor.report(model)
+    assert report['live_rows'] == 600
+    assert report['processes'] == 2
+
+
+def test_model_without_reference():
+    assert DriftMonitor().report(FakeModel(None))['status'] == 'no_reference'
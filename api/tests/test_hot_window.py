@@ -0,0 +1,81 @@
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction
+from api.hot_window import HotWindow, bump_data_version
+
+
+def insert_scored(db, count, start_step=1):
+    records = []
+    for i in range(count):
+        transaction = DBTransaction(step=start_step + i, amount=100.0 + i, type='TRANSFER', oldbalanceOrg=1000.0,
+                                    newbalanceOrig=900.0, oldbalanceDest=0.0, newbalanceDest=100.0)
+        db.add(transaction)
+        db.flush()
+        probability = 0.5 if i % 3 == 0 else 0.1
+        prediction = DBPrediction(transaction_id=transaction.id, prediction=0, probability=probability,
+                                  manual_review=i % 3 == 0)
+        db.add(prediction)
+        db.flush()
+        records.append({
+            'id': transaction.id, 'prediction_id': prediction.id, 'step': transaction.step,
+            'amount': transaction.amount, 'type': transaction.type, 'oldbalanceOrg': 1000.0,
+            'newbalanceOrig': 900.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 100.0,
+            'prediction': 0, 'probability': probability, 'manual_review': i % 3 == 0
+        })
+    db.commit()
+    return records
+
+
+def test_serves_newest_pages_from_memory(db):
+    insert_scored(db, 20)
+    window = HotWindow(capacity=8)
+    window.sync(db)
+    window.append(insert_scored(db, 4, start_step=100))
+
+    data, total = window.get_page(db, page=1, page_size=5)
+    assert total == 24
+    assert [row['step'] for row in data] == [103, 102, 101, 100, 20]
+
+    data, total = window.get_page(db, page=1, page_size=2, manual_review=True)
+    assert total == 9
+    assert all(row['manual_review'] for row in data)
+
+    # Pages beyond the window fall back to the database
+    assert window.get_page(db, page=2, page_size=5) is None
+    assert window.get_page(db, page=1, page_size=5, order="asc") is None
+
+
+def test_detects_writes_from_other_processes(db):
+    window = HotWindow(capacity=8)
+    window.sync(db)
+    window.append(insert_scored(db, 2))
+    insert_scored(db, 1)
+    window.last_sync = float('inf')
+
+    assert window.get_page(db, page=1, page_size=2) is None
+
+
+def test_mark_reviewed(db):
+    window = HotWindow(capacity=8)
+    window.sync(db)
+    records = insert_scored(db, 3)
+    window.append(records)
+    data_version = bump_data_version(db)
+    db.commit()
+    window.mark_reviewed(records[1]['prediction_id'], 1, data_version)
+
+    data, _ = window.get_page(db, page=1, page_size=3)
+    assert [row['reviewed_prediction'] for row in data] == [None, 1, None]
+    assert window.nbytes / window.capacity < 80
+
+
+def test_detects_updates_from_other_processes(db):
+    window = HotWindow(capacity=8)
+    window.sync(db)
+    records = insert_scored(db, 3)
+    window.append(records)
+    # A review or policy re-application committed by another process
+    db.query(DBPrediction).filter(DBPrediction.id == records[0]['prediction_id']).update({DBPrediction.prediction: 1})
+    bump_data_version(db)
+    db.commit()
+    window.last_sync = float('inf')
+
+    assert window.get_page(db, page=1, page_size=3) is None
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from api.database import Prediction as DBPrediction
+from api.persistence import save_scored_batch
+from models.decision_policy import Calibrator
+from models.incremental_update import Reservoir, IncrementalUpdater
+from models.train_paysim_model import FraudDetectionModel
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'step': rng.integers(1, 100, n),
+        'amount': rng.random(n) * 1000,
+        'oldbalanceOrg': rng.random(n) * 1000,
+        'newbalanceOrig': rng.random(n) * 1000,
+        'oldbalanceDest': rng.random(n) * 1000,
+        'newbalanceDest': rng.random(n) * 1000,
+        'type': rng.choice(['TRANSFER', 'PAYMENT'], n),
+        'isFraud': np.arange(n) % 2
+    })
+
+
+def test_reservoir_keeps_fixed_size():
+    reservoir = Reservoir(capacity=10)
+    reservoir.add({'value': i} for i in range(1000))
+
+    assert len(reservoir) == 10
+    assert reservoir.seen == 1000
+    assert len(reservoir.sample(5)) == 5
+    assert len(reservoir.sample(50)) == 10
+
+
+def fitted_pipeline(df):
+    features = ['step', 'amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+    pipeline = Pipeline([
+        ('preprocessor', ColumnTransformer([('num', StandardScaler(), features),
+                                            ('cat', OneHotEncoder(drop='first', sparse_output=False), ['type'])])),
+        ('classifier', RandomForestClassifier(n_estimators=10, random_state=42))
+    ])
+    pipeline.fit(df.drop(columns='isFraud'), df['isFraud'])
+    return pipeline
+
+
+def test_update_model_keeps_the_trained_trees(tmp_path):
+    df = make_frame(200)
+    pipeline = fitted_pipeline(df)
+    trained = list(pipeline.named_steps['classifier'].estimators_)
+
+    updater = IncrementalUpdater(state_path=str(tmp_path / 'state.pkl'), trees_per_update=5, max_incremental_trees=3)
+    updater.update_model(pipeline, make_frame(50, seed=1))
+    updater.update_model(pipeline, make_frame(50, seed=2))
+
+    # Only the added trees slide, the forest of the full training run stays whole
+    estimators = pipeline.named_steps['classifier'].estimators_
+    assert len(estimators) == 13
+    assert estimators[:10] == trained
+    assert pipeline.predict_proba(df.drop(columns='isFraud')).shape == (200, 2)
+
+
+def test_scored_transactions_feed_the_reservoir(db, tmp_path):
+    records = make_frame(6).drop(columns='isFraud').to_dict('records')
+    responses = save_scored_batch(db, records, [0.9, 0.1, 0.1, 0.1, 0.1, 0.1], [1, 0, 0, 0, 0, 0])
+    db.query(DBPrediction).filter(DBPrediction.id == responses[1]['prediction_id']).update({
+        DBPrediction.reviewed: True, DBPrediction.reviewed_prediction: 1})
+    db.commit()
+    updater = IncrementalUpdater(state_path=str(tmp_path / 'state.pkl'))
+
+    assert updater.add_scored(db) == 5
+    assert [row['isFraud'] for row in updater.reservoir.rows] == [1, 0, 0, 0, 0]
+    assert updater.add_scored(db) == 0
+    save_scored_batch(db, records[:1], [0.1], [0])
+    db.commit()
+    assert updater.add_scored(db) == 1
+
+
+def test_update_refits_or_drops_the_calibration(tmp_path):
+    df = make_frame(200)
+    model = FraudDetectionModel()
+    model.model = fitted_pipeline(df)
+    stale = Calibrator.fit(model.model.predict_proba(df.drop(columns='isFraud'))[:, 1], df['isFraud'], 'platt')
+    model.calibrator = stale
+    updater = IncrementalUpdater(state_path=str(tmp_path / 'state.pkl'), trees_per_update=5)
+
+    updater.update(model, make_frame(80, seed=1))
+    assert model.calibrator is not stale and model.calibrator.method == 'platt'
+    assert len(model.model.named_steps['classifier'].estimators_) == 15
+
+    # Two fraudulent rows can't be split into training and calibration rows
+    rare = make_frame(40, seed=2).assign(isFraud=lambda frame: (frame.index < 2).astype(int))
+    updater.update(model, rare)
+    assert model.calibrator is None
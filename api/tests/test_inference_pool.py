@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.inference_pool import InferencePool, InferencePoolError, decode_features, encode_features
+from models.inference import InferenceModel, MODEL_PATH
+
+
+def make_frame(n):
+    rng = np.random.default_rng(0)
+    amounts = rng.uniform(10, 50000, n).round(2)
+    balances = rng.uniform(0, 100000, n).round(2)
+    return pd.DataFrame({
+        'step': rng.integers(1, 744, n),
+        'amount': amounts,
+        'type': rng.choice(['CASH_IN', 'CASH_OUT', 'DEBIT', 'PAYMENT', 'TRANSFER'], n),
+        'oldbalanceOrg': balances,
+        'newbalanceOrig': np.maximum(balances - amounts, 0),
+        'oldbalanceDest': balances[::-1],
+        'newbalanceDest': balances[::-1] + amounts
+    })
+
+
+def test_feature_encoding_round_trip():
+    frame = make_frame(50)
+    decoded = decode_features(encode_features(frame))
+
+    assert list(decoded['type']) == list(frame['type'])
+    assert np.array_equal(decoded['amount'].to_numpy(), frame['amount'].to_numpy())
+    assert np.array_equal(decoded['step'].to_numpy(), frame['step'].to_numpy())
+
+
+def test_unknown_type_is_rejected():
+    frame = make_frame(3)
+    frame.loc[1, 'type'] = 'BITCOIN'
+
+    with pytest.raises(ValueError, match="BITCOIN"):
+        encode_features(frame)
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="Trained model not available")
+async def test_pool_matches_in_process_scoring():
+    model = InferenceModel()
+    model.load_model(MODEL_PATH)
+    frame = make_frame(300)
+    expected = model.model.predict_proba(frame)[:, 1]
+
+    # Small slots so the frame is split and several slots are in flight at once
+    pool = InferencePool(size=2, batch_size=64, queue_limit=3)
+    pool.start()
+    try:
+        raw_probabilities = await pool.predict_raw(frame)
+        single = await pool.predict_raw(frame.iloc[:1])
+        stats = pool.stats()
+    finally:
+        pool.stop()
+
+    assert np.allclose(raw_probabilities, expected)
+    assert np.isclose(single[0], expected[0])
+    assert stats['requests'] == 2
+    assert stats['rows'] == 301
+    assert stats['completed'] == 6
+    assert stats['slots_in_use'] == 0
+    assert not pool.running
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="Trained model not available")
+async def test_slots_of_a_crashed_worker_are_reclaimed():
+    # One slot large enough that the worker is still scoring when it is killed
+    pool = InferencePool(size=1, batch_size=20000, queue_limit=1, timeout=60)
+    pool.start()
+    try:
+        await pool.predict_raw(make_frame(1))
+        scoring = asyncio.create_task(pool.predict_raw(make_frame(20000)))
+        while 0 not in pool.pending or pool.owners[0][1] != pool.pending[0][0]:
+            await asyncio.sleep(0.001)
+        pool.processes[0].kill()
+
+        with pytest.raises(InferencePoolError, match="exited"):
+            await asyncio.wait_for(scoring, timeout=30)
+        # More requests than slots, each needs the reclaimed slot
+        for _ in range(3):
+            await asyncio.wait_for(pool.predict_raw(make_frame(2)), timeout=60)
+        stats = pool.stats()
+    finally:
+        pool.stop()
+
+    assert stats['errors'] == 1
+    assert stats['slots_in_use'] == 0
+    assert stats['workers_alive'] == 1
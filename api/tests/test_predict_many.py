@@ -0,0 +1,131 @@
+import io
+from unittest.mock import MagicMock
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI, HTTPException
+from starlette.requests import Request
+
+from api.database import get_db, Transaction as DBTransaction, Prediction as DBPrediction
+from api.endpoints import predictions
+from api.payloads import ARROW_STREAM_TYPE, NPY_TYPE
+from models.inference import InferenceModel
+
+TRANSACTIONS = [
+    {'step': 1, 'amount': 100.0, 'type': 'TRANSFER', 'oldbalanceOrg': 1000.0, 'newbalanceOrig': 900.0,
+     'oldbalanceDest': 0.0, 'newbalanceDest': 100.0},
+    {'step': 2, 'amount': 900.0, 'type': 'CASH_OUT', 'oldbalanceOrg': 900.0, 'newbalanceOrig': 0.0,
+     'oldbalanceDest': 0.0, 'newbalanceDest': 900.0},
+    {'step': 2, 'amount': 5.0, 'type': 'PAYMENT', 'oldbalanceOrg': 50.0, 'newbalanceOrig': 45.0,
+     'oldbalanceDest': 0.0, 'newbalanceDest': 0.0}
+]
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    model = MagicMock(spec=InferenceModel)
+    model.score.side_effect = lambda x: (x['amount'].to_numpy() / 1000, (x['amount'].to_numpy() > 500).astype(int))
+    monkeypatch.setattr(predictions, 'get_model', lambda: model)
+    monkeypatch.setattr(predictions, 'hot_window', MagicMock())
+    app = FastAPI()
+    app.include_router(predictions.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: db
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"), model
+
+
+@pytest.mark.asyncio
+async def test_rows_and_columns_are_scored_in_one_call(client, db):
+    client, model = client
+    columns = {field: [row[field] for row in TRANSACTIONS] for field in TRANSACTIONS[0]}
+    async with client:
+        by_rows = await client.post("/api/predict_many", json=TRANSACTIONS)
+        by_columns = await client.post("/api/predict_many", json=columns)
+
+    assert by_rows.status_code == 200 and by_columns.status_code == 200
+    result = by_rows.json()
+    assert result['count'] == 3
+    assert result['prediction'] == [0, 1, 0]
+    assert result['probability'] == [0.1, 0.9, 0.005]
+    assert by_columns.json()['prediction'] == result['prediction']
+    assert model.score.call_count == 2
+    assert db.query(DBTransaction).count() == 6 and db.query(DBPrediction).count() == 6
+
+
+@pytest.mark.asyncio
+async def test_npy_bodies_get_npy_results(client):
+    client, _ = client
+    values = np.array([(1, 100.0, b'TRANSFER', 1000.0, 900.0, 0.0, 100.0)],
+                      dtype=[('step', '<i8'), ('amount', '<f8'), ('type', 'S8'), ('oldbalanceOrg', '<f8'),
+                             ('newbalanceOrig', '<f8'), ('oldbalanceDest', '<f8'), ('newbalanceDest', '<f8')])
+    buffer = io.BytesIO()
+    np.save(buffer, values)
+    async with client:
+        response = await client.post("/api/predict_many", content=buffer.getvalue(), headers={'content-type': NPY_TYPE})
+
+    assert response.headers['content-type'] == NPY_TYPE
+    result = np.load(io.BytesIO(response.content))
+    assert result['probability'].tolist() == [0.1]
+    assert result['row'].tolist() == [0] and result['id'][0] > 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_rows_are_skipped_and_reported(client, db):
+    client, model = client
+    rows = [dict(TRANSACTIONS[0], type='WIRE')] + TRANSACTIONS
+    async with client:
+        invalid = await client.post("/api/predict_many", json=rows)
+        unsupported = await client.post("/api/predict_many", content=b"a,b", headers={'content-type': 'text/csv'})
+        malformed = await client.post("/api/predict_many", content=b"[{", headers={'content-type': 'application/json'})
+
+    result = invalid.json()
+    assert invalid.headers['X-Invalid-Rows'] == '1'
+    assert result['row'] == [1, 2, 3]
+    assert result['validation']['errors'][0]['row'] == 0
+    assert unsupported.status_code == 415
+    assert malformed.status_code == 400
+    assert model.score.call_count == 1
+    assert db.query(DBTransaction).count() == 3
+
+
+@pytest.mark.asyncio
+async def test_arrow_bodies_get_arrow_results(client):
+    pa = pytest.importorskip("pyarrow")
+    client, _ = client
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(pd.DataFrame(TRANSACTIONS))
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    async with client:
+        response = await client.post("/api/predict_many", content=sink.getvalue().to_pybytes(),
+                                     headers={'content-type': ARROW_STREAM_TYPE})
+
+    assert response.headers['content-type'] == ARROW_STREAM_TYPE
+    result = pa.ipc.open_stream(response.content).read_all().to_pydict()
+    assert result['row'] == [0, 1, 2]
+    assert result['prediction'] == [0, 1, 0]
+
+
+@pytest.mark.asyncio
+async def test_body_size_is_enforced_on_the_bytes_read(client, monkeypatch):
+    client, _ = client
+    monkeypatch.setattr(predictions, 'MAX_FILE_SIZE', 64)
+
+    async def chunked():
+        # No Content-Length, the body arrives in pieces
+        for _ in range(10):
+            yield b'[' + b' ' * 20 + b']'
+
+    async with client:
+        response = await client.post("/api/predict_many", content=chunked(),
+                                     headers={'content-type': 'application/json'})
+    assert response.status_code == 413
+
+    # A malformed Content-Length is the client's error
+    async def receive():
+        return {'type': 'http.request', 'body': b'[]', 'more_body': False}
+    request = Request({'type': 'http', 'method': 'POST', 'headers': [(b'content-length', b'12abc')]}, receive)
+    with pytest.raises(HTTPException) as error:
+        await predictions.read_body(request, 64)
+    assert error.value.status_code == 400
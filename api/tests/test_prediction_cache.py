@@ -0,0 +1,41 @@
+from api.prediction_cache import PredictionCache
+
+FEATURES = {'step': 1, 'amount': 100.0, 'type': 'TRANSFER', 'oldbalanceOrg': 1000.0,
+            'newbalanceOrig': 900.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 100.0}
+
+
+def test_key_is_canonical():
+    reordered = dict(reversed(list(FEATURES.items())))
+    as_int = dict(FEATURES, amount=100)
+
+    assert PredictionCache.key(FEATURES) == PredictionCache.key(reordered) == PredictionCache.key(as_int)
+    assert PredictionCache.key(FEATURES) != PredictionCache.key(dict(FEATURES, step=2))
+
+
+def test_lru_eviction_and_ttl():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+    expired = PredictionCache(ttl=-1)
+    expired.put('a', 1)
+    assert expired.get('a') is None
+    assert expired.stats()['expirations'] == 1
+
+
+def test_version_change_invalidates():
+    cache = PredictionCache()
+    cache.set_version(('model', 1))
+    cache.put('a', 1)
+    cache.set_version(('model', 1))
+    assert cache.get('a') == 1
+
+    cache.set_version(('model', 2))
+    assert cache.get('a') is None
+    assert cache.stats()['invalidations'] == 1
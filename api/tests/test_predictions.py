@@ -1,9 +1,14 @@
+import numpy as np
 import pytest
 import pandas as pd
+from datetime import datetime, timezone
 from unittest.mock import MagicMock
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from api.endpoints.predictions import process_chunk
-from models.train_paysim_model import FraudDetectionModel
+from api.database import Transaction as DBTransaction, Prediction as DBPrediction, IdempotencyKey
+from api.endpoints.predictions import process_chunk, stored_prediction
+from api.prediction_cache import PredictionCache
+from models.inference import InferenceModel
 
 @pytest.fixture
 def mock_session():
@@ -12,8 +17,8 @@ def mock_session():
 
 @pytest.fixture
 def mock_model():
-    model = MagicMock(spec=FraudDetectionModel)
-    model.predict_proba.side_effect = lambda x: {'prediction': 0, 'probability': 0.5}
+    model = MagicMock(spec=InferenceModel)
+    model.score.side_effect = lambda x: (np.full(len(x), 0.5), np.zeros(len(x), dtype=int))
     return model
 
 @pytest.mark.asyncio
@@ -43,4 +48,23 @@ async def test_process_chunk(mock_session, mock_model):
     # Verify database interactions
     assert mock_session.add_all.called
     assert mock_session.commit.called
-    assert mock_session.refresh.called
\ No newline at end of file
+    assert mock_session.refresh.called
+
+
+def test_idempotency_key_replay_must_match_the_transaction(db):
+    features = {'step': 1, 'amount': 100.0, 'type': 'TRANSFER', 'oldbalanceOrg': 1000.0,
+                'newbalanceOrig': 900.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 100.0}
+    db.add(DBTransaction(id=1, **features))
+    db.add(DBPrediction(id=1, transaction_id=1, prediction=0, probability=0.1, manual_review=False))
+    db.add(IdempotencyKey(key="retry-1", transaction_id=1, prediction_id=1,
+                          request_hash=PredictionCache.key(features), created_at=datetime.now(timezone.utc)))
+    db.commit()
+
+    # Same values with an int amount are the same transaction
+    replayed = stored_prediction(db, "retry-1", PredictionCache.key(dict(features, amount=100)))
+    assert replayed['prediction_id'] == 1 and replayed['amount'] == 100.0
+    assert stored_prediction(db, "unknown", PredictionCache.key(features)) is None
+
+    with pytest.raises(HTTPException) as error:
+        stored_prediction(db, "retry-1", PredictionCache.key(dict(features, amount=250.0)))
+    assert error.value.status_code == 422
@@ -0,0 +1,66 @@
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI, File, Response, UploadFile
+
+from api.replay import build_requests, run_load, step_schedule, tps_schedule
+
+
+def make_transactions(steps):
+    n = len(steps)
+    return pd.DataFrame({
+        'step': steps,
+        'type': ['PAYMENT'] * n,
+        'amount': np.arange(n, dtype=float) + 1,
+        'oldbalanceOrg': [100.0] * n,
+        'newbalanceOrig': [99.0] * n,
+        'oldbalanceDest': [0.0] * n,
+        'newbalanceDest': [1.0] * n
+    })
+
+
+def test_schedules():
+    assert np.allclose(tps_schedule(4, 2.0), [0, 0.5, 1.0, 1.5])
+    # Two transactions in step 1, one in step 2 and a quiet step 3 before step 4
+    assert np.allclose(step_schedule([1, 1, 2, 4], 10.0), [0, 5, 10, 30])
+
+
+def test_mixed_requests_are_split_and_ordered():
+    df = make_transactions([1] * 10)
+    requests = build_requests(df, tps_schedule(10, 100.0), 'mixed', batch_size=3, batch_fraction=0.5)
+
+    assert sum(transactions for *_, transactions in requests) == 10
+    assert [request[0] for request in requests] == sorted(request[0] for request in requests)
+    batches = [request for request in requests if request[1] == 'predict_batch']
+    assert batches and all(payload.startswith('step,') for _, _, payload, _ in batches)
+
+
+@pytest.mark.asyncio
+async def test_run_load_reports_per_endpoint():
+    app = FastAPI()
+
+    @app.post("/api/predict")
+    async def predict(transaction: dict, response: Response):
+        # Every fifth amount fails so error rates are reported
+        if transaction['amount'] % 5 == 0:
+            response.status_code = 500
+        return {'prediction': 0}
+
+    @app.post("/api/predict_batch")
+    async def predict_batch(file: UploadFile = File(...)):
+        return {'predictions': []}
+
+    df = make_transactions([1] * 20)
+    requests = build_requests(df, tps_schedule(20, 1000.0), 'mixed', batch_size=4, batch_fraction=0.5, seed=1)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        report = await run_load(client, requests, concurrency=4)
+
+    single = report['endpoints']['predict']
+    batch = report['endpoints']['predict_batch']
+    assert single['requests'] + sum(1 for r in requests if r[1] == 'predict_batch') == len(requests)
+    assert batch['errors'] == {}
+    assert single['errors'].get('500', 0) == sum(
+        1 for r in requests if r[1] == 'predict' and r[2]['amount'] % 5 == 0)
+    assert single['transactions'] + batch['transactions'] + sum(single['errors'].values()) == 20
+    assert single['p50_ms'] <= single['p99_ms']
@@ -0,0 +1,53 @@
+from api import review_queue
+from api.database import ReviewQueueItem
+
+
+def enqueue_items(db, probabilities, amount=100.0):
+    review_queue.enqueue(db, [
+        {'prediction_id': i + 1, 'transaction_id': i + 1, 'probability': p, 'amount': amount}
+        for i, p in enumerate(probabilities)
+    ])
+    db.commit()
+
+
+def test_needs_manual_review():
+    assert review_queue.needs_manual_review(0, 0.5)
+    assert not review_queue.needs_manual_review(1, 0.5)
+    assert not review_queue.needs_manual_review(0, 0.2)
+
+
+def test_claims_in_priority_order_without_double_claims(db):
+    enqueue_items(db, [0.46, 0.5, 0.54])
+
+    first = review_queue.claim(db, "alice")
+    second = review_queue.claim(db, "bob")
+
+    assert first.prediction_id == 2
+    assert first.claimed_by == "alice"
+    assert second.prediction_id != first.prediction_id
+    assert review_queue.stats(db)["depth"] == 3
+
+
+def test_expired_lease_can_be_reclaimed(db):
+    enqueue_items(db, [0.5])
+    review_queue.claim(db, "alice", lease_seconds=60)
+    assert review_queue.claim(db, "bob") is None
+
+    db.query(ReviewQueueItem).update({ReviewQueueItem.lease_expires_at: 1.0})
+    db.commit()
+    assert review_queue.claim(db, "bob").claimed_by == "bob"
+
+
+def test_release_and_complete(db):
+    enqueue_items(db, [0.5, 0.47])
+    item = review_queue.claim(db, "alice")
+
+    assert not review_queue.release(db, item.prediction_id, "bob")
+    assert review_queue.release(db, item.prediction_id, "alice")
+
+    assert review_queue.complete(db, item.prediction_id)
+    db.commit()
+    stats = review_queue.stats(db)
+    assert stats["depth"] == 1
+    assert stats["enqueued_total"] == 2
+    assert stats["completed_total"] == 1
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Training-only packages that must not be imported when the API starts
+TRAINING_MODULES = ['imblearn', 'sklearn.model_selection', 'sklearn.metrics', 'models.train_paysim_model']
+
+
+def import_profile(module, cwd):
+    # `python -X importtime` writes one line per imported module:
+    # "import time: <self us> | <cumulative us> | <indented module name>"
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_api_import_skips_training_stack(tmp_path):
+    # Run in an empty directory, importing the API creates the SQLite database and needs no model file
+    profile = import_profile("api.main", tmp_path)
+
+    assert "api.main" in profile
+    for module in TRAINING_MODULES:
+        assert module not in profile, f"{module} is imported by the API"
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from api import stream_worker
+from api.database import Prediction as DBPrediction, ReviewQueueItem
+from api.persistence import save_scored_batch
+from api.stream_worker import Batch, NDJSONFileSource, StreamWorker
+
+RECORD = {'step': 1, 'amount': 100.0, 'type': 'TRANSFER', 'oldbalanceOrg': 1000.0,
+          'newbalanceOrig': 900.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 100.0}
+
+
+def write_records(path, count):
+    with open(path, 'a') as f:
+        for i in range(count):
+            f.write(json.dumps(dict(RECORD, step=i)) + '\n')
+
+
+def test_file_source_shares_ranges_between_workers(tmp_path):
+    path = str(tmp_path / 'stream.ndjson')
+    write_records(path, 5)
+    first = NDJSONFileSource(path)
+    second = NDJSONFileSource(path)
+
+    batch_a = first.read(3, timeout=0)
+    batch_b = second.read(3, timeout=0)
+    assert [r['step'] for r in batch_a.records] == [0, 1, 2]
+    assert [r['step'] for r in batch_b.records] == [3, 4]
+    assert second.read(3, timeout=0) is None
+
+    # Committed offset only moves over contiguous acknowledged ranges
+    second.ack(batch_b.token)
+    assert first.lag()['bytes'] > 0
+    first.ack(batch_a.token)
+    assert first.lag()['bytes'] == 0
+
+
+def test_file_source_redelivers_expired_claims(tmp_path):
+    path = str(tmp_path / 'stream.ndjson')
+    write_records(path, 2)
+    crashed = NDJSONFileSource(path, lease_seconds=-1)
+    crashed.read(10, timeout=0)
+
+    batch = NDJSONFileSource(path).read(10, timeout=0)
+    assert [r['step'] for r in batch.records] == [0, 1]
+
+
+def test_save_scored_batch(db):
+    records = [dict(RECORD, step=i) for i in range(3)]
+
+    responses = save_scored_batch(db, records, [0.1, 0.5, 0.9], [0, 0, 1])
+    db.commit()
+
+    assert [r['step'] for r in responses] == [0, 1, 2]
+    assert [r['manual_review'] for r in responses] == [False, True, False]
+    assert db.query(DBPrediction).count() == 3
+    assert db.query(ReviewQueueItem).one().prediction_id == responses[1]['prediction_id']
+
+
+class ListSource:
+    def __init__(self, batches):
+        self.batches = batches
+        self.acked = []
+
+    def read(self, max_records, timeout):
+        if not self.batches:
+            time.sleep(timeout)
+            return None
+        return self.batches.pop(0)
+
+    def ack(self, token):
+        self.acked.append(token)
+
+    def lag(self):
+        return {}
+
+
+class FixedModel:
+    def score(self, frame):
+        return np.full(len(frame), 0.1), np.zeros(len(frame), dtype=int)
+
+
+def test_failed_batch_is_retried(db, monkeypatch):
+    attempts = []
+
+    def flaky_save(session, records, probabilities, predictions):
+        attempts.append(len(records))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        return save_scored_batch(session, records, probabilities, predictions)
+
+    monkeypatch.setattr(stream_worker, 'SessionLocal', sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(stream_worker, 'save_scored_batch', flaky_save)
+    monkeypatch.setattr(stream_worker.drift_monitor, 'observe', lambda *args: None)
+    monkeypatch.setattr(stream_worker, 'RETRY_BACKOFF', 0.01)
+    source = ListSource([Batch('first', [dict(RECORD, step=i) for i in range(3)])])
+    worker = StreamWorker(source, FixedModel())
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not source.acked and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+        thread.join()
+
+    assert attempts == [3, 3]
+    assert source.acked == ['first']
+    assert db.query(DBPrediction).count() == 3
+    assert worker.metrics.failures == 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from models import train_anonymous_model
+from models.train_anonymous_model import FEATURES, create_models, fit_models, load_features
+
+
+def write_csv(path, n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {'Time': np.linspace(0, 200000, n)}
+    data.update({f'V{i}': rng.normal(size=n) for i in range(1, 29)})
+    data['Amount'] = rng.exponential(80, n)
+    data['Class'] = (np.arange(n) % 20 == 0).astype(int)
+    pd.DataFrame(data).to_csv(path, index=False)
+    return pd.DataFrame(data)
+
+
+def test_features_match_row_wise_derivation_and_are_cached(tmp_path, monkeypatch):
+    source = write_csv(tmp_path / "creditcard.csv")
+    cache_dir = tmp_path / "cache"
+
+    X, y = load_features(str(tmp_path / "creditcard.csv"), str(cache_dir))
+
+    assert list(X.columns) == FEATURES
+    np.testing.assert_allclose(X['Hour'], source['Time'].apply(lambda x: (x / 3600) % 24))
+    np.testing.assert_allclose(X['Day'], source['Time'].apply(lambda x: (x / (3600 * 24)) % 7))
+    assert len(list(cache_dir.iterdir())) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV parsed despite a cached feature matrix")
+
+    monkeypatch.setattr(train_anonymous_model.pd, 'read_csv', fail)
+    cached_X, cached_y = load_features(str(tmp_path / "creditcard.csv"), str(cache_dir))
+    pd.testing.assert_frame_equal(cached_X, X)
+    np.testing.assert_array_equal(cached_y, y)
+
+
+def test_changed_source_gets_a_new_cache_entry(tmp_path):
+    path = tmp_path / "creditcard.csv"
+    write_csv(path, seed=0)
+    load_features(str(path), str(tmp_path / "cache"))
+    write_csv(path, seed=1)
+    load_features(str(path), str(tmp_path / "cache"))
+
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+def test_every_model_is_fitted_once_besides_its_folds(tmp_path):
+    write_csv(tmp_path / "creditcard.csv")
+    X, y = load_features(str(tmp_path / "creditcard.csv"), None)
+
+    results = fit_models(create_models('undersample'), X.to_numpy(), y, n_jobs=1, folds=3)
+
+    assert set(results) == {'Random Forest', 'SVM', 'Logistic Regression'}
+    for result in results.values():
+        assert len(result['cv_scores']) == 3
+        assert 'sampler' in result['model'].named_steps
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from models.algorithm_comparison import AlgorithmComparison
+from models.train_paysim_model import create_sampler
+
+
+def imbalanced(n_fraud, n_legit=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_fraud + n_legit, 3))
+    y = np.array([1] * n_fraud + [0] * n_legit)
+    return X, y
+
+
+def test_fast_smote_only_tops_up_rare_fraud():
+    X, y = imbalanced(n_fraud=8)
+    _, resampled = create_sampler('fast_smote').fit_resample(X, y)
+    assert np.bincount(resampled).tolist() == [200, 20]
+
+    # A sample already above the ratio is left as it is instead of raising
+    X, y = imbalanced(n_fraud=60)
+    _, resampled = create_sampler('fast_smote').fit_resample(X, y)
+    assert np.bincount(resampled).tolist() == [200, 60]
+
+
+def test_class_weight_runs_leave_the_shared_models_untouched():
+    rng = np.random.default_rng(0)
+    n = 100
+    X = pd.DataFrame({
+        'step': rng.integers(1, 744, n), 'amount': rng.uniform(10, 1000, n),
+        'type': rng.choice(['PAYMENT', 'TRANSFER'], n), 'oldbalanceOrg': rng.uniform(0, 1000, n),
+        'newbalanceOrig': rng.uniform(0, 1000, n), 'oldbalanceDest': rng.uniform(0, 1000, n),
+        'newbalanceDest': rng.uniform(0, 1000, n)
+    })
+    y = np.arange(n) % 5 == 0
+    comparison = AlgorithmComparison(X, y)
+    comparison.models = {'Logistic Regression': LogisticRegression(max_iter=200)}
+
+    comparison.evaluate_all(comparison.create_preprocessor(), imbalance='class_weight')
+
+    assert comparison.models['Logistic Regression'].class_weight is None
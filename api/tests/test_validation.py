@@ -0,0 +1,55 @@
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from api.validation import validate_transactions, MAX_REPORTED_ERRORS
+
+CSV = """step,type,amount,oldbalanceOrg,newbalanceOrig,oldbalanceDest,newbalanceDest,isFraud
+1,PAYMENT,100.5,1000,899.5,0,0,0
+2, transfer ,50,50,0,10,60,1
+x,PAYMENT,10,100,90,0,0,0
+3,BITCOIN,10,100,90,0,0,0
+4,CASH_OUT,-5,100,105,0,0,0
+5,CASH_IN,10,100,110,,0,0
+6,TRANSFER,10,100,0,0,10,0
+7.5,DEBIT,10,100,90,0,10,0
+"""
+
+
+def test_invalid_rows_are_dropped_and_reported():
+    valid, report = validate_transactions(pd.read_csv(StringIO(CSV)))
+    result = report.to_dict()
+
+    assert list(valid.index) == [0, 1]
+    assert list(valid.columns) == ['step', 'amount', 'type', 'oldbalanceOrg', 'newbalanceOrig',
+                                   'oldbalanceDest', 'newbalanceDest']
+    assert valid['step'].dtype == np.int64
+    assert valid.loc[1, 'type'] == 'TRANSFER'
+
+    errors = {(error['row'], error['column']): error for error in result['errors']}
+    assert errors[(2, 'step')]['error'] == "not a number"
+    assert errors[(2, 'step')]['value'] == 'x'
+    assert errors[(3, 'type')]['value'] == 'BITCOIN'
+    assert errors[(4, 'amount')]['error'] == "must not be negative"
+    assert errors[(5, 'oldbalanceDest')]['error'] == "missing value"
+    assert errors[(6, 'newbalanceOrig')]['error'] == "balance change of the originator exceeds the amount"
+    assert errors[(7, 'step')]['error'] == "must be a whole number"
+    assert result['invalid_rows'] == 6
+    assert not result['errors_truncated']
+
+
+def test_error_report_is_capped():
+    n = MAX_REPORTED_ERRORS + 500
+    df = pd.DataFrame({
+        'step': np.arange(n), 'type': ['UNKNOWN'] * n, 'amount': 1.0, 'oldbalanceOrg': 1.0,
+        'newbalanceOrig': 0.0, 'oldbalanceDest': 0.0, 'newbalanceDest': 1.0
+    })
+    valid, report = validate_transactions(df)
+    result = report.to_dict()
+
+    assert len(valid) == 0
+    assert result['invalid_rows'] == n
+    assert result['error_counts'] == {'type': n}
+    assert len(result['errors']) == MAX_REPORTED_ERRORS
+    assert result['errors_truncated']
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from api.persistence import TRANSACTION_FIELDS
+from api.schemas import TRANSACTION_TYPES
+
+MAX_REPORTED_ERRORS = 1000  # Row errors listed in a response, all of them are counted
+BALANCE_COLUMNS = ['oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+BALANCE_TOLERANCE = 0.01  # Rounding allowed when comparing balance changes to the amount
+
+
+class ValidationReport:
+    def __init__(self):
+        self.errors = []
+        self.error_counts = {}
+        self.invalid = None
+
+    def add(self, mask, frame, column, message):
+        """
+        Record an error for every row in mask.
+
+        Args:
+            mask: Boolean array over the rows of the frame
+            frame: The uploaded rows, used for the offending values
+            column: Column the error refers to
+            message: Error description
+        """
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return
+        self.error_counts[column] = self.error_counts.get(column, 0) + len(rows)
+        self.invalid[rows] = True
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        if room <= 0:
+            return
+        values = frame[column].to_numpy()[rows[:room]] if column in frame.columns else [None] * min(room, len(rows))
+        self.errors.extend(
+            {'row': int(row), 'column': column, 'value': None if pd.isna(value) else str(value), 'error': message}
+            for row, value in zip(rows[:room], values)
+        )
+
+    def to_dict(self):
+        return {
+            'invalid_rows': int(np.count_nonzero(self.invalid)),
+            'error_counts': self.error_counts,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': sum(self.error_counts.values()) > len(self.errors)
+        }
+
+
+def validate_transactions(df: pd.DataFrame):
+    """
+    Coerce and check uploaded transactions column-wise.
+
+    Invalid rows are dropped and reported instead of failing the upload. Rows are
+    numbered from 0 in upload order.
+
+    Args:
+        df: Uploaded rows with at least the TRANSACTION_FIELDS columns
+
+    Returns:
+        Tuple of the valid rows, with only the TRANSACTION_FIELDS columns in
+        their model dtypes and the upload row number as index, and the ValidationReport
+    """
+    report = ValidationReport()
+    report.invalid = np.zeros(len(df), dtype=bool)
+    valid = pd.DataFrame(index=df.index)
+
+    for column in ['step', 'amount'] + BALANCE_COLUMNS:
+        raw = df[column]
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        missing = raw.isna().to_numpy()
+        report.add(missing, df, column, "missing value")
+        report.add(~missing & np.isnan(values), df, column, "not a number")
+        report.add(np.isinf(values), df, column, "not a finite number")
+        report.add(values < 0, df, column, "must not be negative")
+        valid[column] = values
+
+    steps = valid['step'].to_numpy()
+    report.add(np.isfinite(steps) & (steps != np.floor(steps)), df, 'step', "must be a whole number")
+
+    # Types are normalised per distinct value, not per row
+    codes, names = pd.factorize(df['type'])
+    names = np.array([str(name).strip().upper() for name in names] + [None], dtype=object)
+    types = names[codes]
+    report.add(~np.isin(types, TRANSACTION_TYPES), df, 'type', f"must be one of {', '.join(TRANSACTION_TYPES)}")
+    valid['type'] = types
+
+    # The originator balance can change by at most the amount, in either direction
+    amounts = valid['amount'].to_numpy()
+    change = np.abs(valid['newbalanceOrig'].to_numpy() - valid['oldbalanceOrg'].to_numpy())
+    report.add(change > amounts + BALANCE_TOLERANCE, df, 'newbalanceOrig',
+               "balance change of the originator exceeds the amount")
+
+    valid = valid.loc[~report.invalid, TRANSACTION_FIELDS]
+    valid['step'] = valid['step'].astype(np.int64)
+    return valid, report
@@ -3,6 +3,7 @@
 import React, {useEffect, useState} from 'react';
 import {useFetchData} from "@/hooks/userFetchData";
 import {useFileUpload} from "@/hooks/useFileUpload";
+import {useServerEvents} from "@/hooks/useServerEvents";
 import {Transaction} from "@/types/transaction";
 import {
     Card,
@@ -107,6 +108,38 @@ const columns: ColumnDef<Transaction>[] = [
     }
 ];
 
+const applyBucketDelta = (analytics: any, delta: any) => {
+    const steps = new Map<number, any>(analytics.stepDistribution.map((row: any) => [row.step, {...row}]));
+    // Steps are merged into ranges of stepBucketSize on large tables, every range starts on the same grid
+    const size = analytics.stepBucketSize ?? 1;
+    const origin = analytics.stepDistribution[0]?.step ?? 0;
+    delta.steps.forEach(([step, legitimate, fraudulent]: [number, number, number]) => {
+        const start = origin + Math.floor((step - origin) / size) * size;
+        const row = steps.get(start) ?? {step: start, stepEnd: start + size - 1, legitimate: 0, fraudulent: 0};
+        steps.set(start, {...row, legitimate: row.legitimate + legitimate, fraudulent: row.fraudulent + fraudulent});
+    });
+
+    const stats = analytics.summaryStats;
+    const count = delta.legitimate + delta.fraudulent;
+    const totalTransactions = stats.totalTransactions + count;
+    const legitimateCount = analytics.legitimateCount + delta.legitimate;
+    const fraudulentCount = analytics.fraudulentCount + delta.fraudulent;
+
+    return {
+        ...analytics,
+        stepDistribution: Array.from(steps.values()).sort((a, b) => a.step - b.step),
+        legitimateCount,
+        fraudulentCount,
+        fraudulentPercentage: totalTransactions > 0 ? Math.round(fraudulentCount / totalTransactions * 10000) / 100 : 0,
+        summaryStats: {
+            avgAmount: totalTransactions > 0 ? (stats.avgAmount * stats.totalTransactions + delta.amountSum) / totalTransactions : 0,
+            minAmount: stats.totalTransactions > 0 ? Math.min(stats.minAmount, delta.minAmount) : delta.minAmount,
+            maxAmount: Math.max(stats.maxAmount, delta.maxAmount),
+            totalTransactions,
+        },
+    };
+};
+
 const FraudDashboard: React.FC = () => {
     const [transactions, setTransactions] = useState<Transaction[]>([]);
     const [analytics, setAnalytics] = useState<any>(null);
@@ -114,14 +147,40 @@ const FraudDashboard: React.FC = () => {
     const [currentPage, setCurrentPage] = useState<number>(1);
     const [columnFilters, setColumnFilters] = useState<ColumnFiltersState>([]);
     const [sorting, setSorting] = useState<SortingState>([]);
+    const [refreshKey, setRefreshKey] = useState<number>(0);
 
-    const {data: transactionsData} = useFetchData(`${process.env.NEXT_PUBLIC_API_URL}/transactions?page=${currentPage}&manualReview=false`, [currentPage]);
-    const {data: analyticsData} = useFetchData(`${process.env.NEXT_PUBLIC_API_URL}/transactions/analytics`, []);
+    const {data: transactionsData} = useFetchData(`${process.env.NEXT_PUBLIC_API_URL}/transactions?page=${currentPage}&manualReview=false&order=desc`, [currentPage, refreshKey]);
+    const {data: analyticsData} = useFetchData(`${process.env.NEXT_PUBLIC_API_URL}/transactions/analytics`, [refreshKey]);
     const {
         handleFileUpload,
         isLoading: fileUploadLoading,
         error: fileUploadError
-    } = useFileUpload(setTransactions, setAnalytics, setPagination);
+    } = useFileUpload();
+
+    // Apply pushed deltas instead of refetching the transactions and analytics
+    useServerEvents(`${process.env.NEXT_PUBLIC_API_URL}/events`, {
+        transactions: (delta) => {
+            setPagination((previous: any) => previous && {
+                ...previous,
+                total_items: previous.total_items + delta.count,
+                total_pages: Math.ceil((previous.total_items + delta.count) / previous.page_size),
+            });
+            if (currentPage === 1) {
+                setTransactions((previous) => [...delta.data, ...previous].slice(0, Math.max(previous.length, 15)));
+            }
+        },
+        buckets: (delta) => {
+            setAnalytics((previous: any) => previous && applyBucketDelta(previous, delta));
+        },
+        review: (review) => {
+            setTransactions((previous) => previous.map((transaction) =>
+                transaction.id === review.transaction_id
+                    ? {...transaction, reviewed_prediction: review.reviewed_prediction}
+                    : transaction
+            ));
+        },
+        resync: () => setRefreshKey((key) => key + 1),
+    });
 
     useEffect(() => {
         if (transactionsData) {
@@ -205,7 +264,7 @@ const FraudDashboard: React.FC = () => {
                                     type="file"
                                     className="hidden"
                                     accept=".csv"
-                                    onChange={(event) => handleFileUpload(event, transactions, analytics)}
+                                    onChange={handleFileUpload}
                                     disabled={fileUploadLoading}
                                 />
                             </label>
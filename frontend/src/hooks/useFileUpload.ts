@@ -1,19 +1,11 @@
 import React, {useState} from 'react';
-import {pollData} from '@/helper/pollData';
 
-export const useFileUpload = (
-    setTransactions: React.Dispatch<React.SetStateAction<any>>,
-    setAnalytics: React.Dispatch<React.SetStateAction<any>>,
-    setPagination: React.Dispatch<React.SetStateAction<any>>
-) => {
+export const useFileUpload = () => {
     const [isLoading, setIsLoading] = useState<boolean>(false);
     const [error, setError] = useState<string>('');
 
-    const handleFileUpload = async (
-        event: React.ChangeEvent<HTMLInputElement>,
-        previousTransactionsData: any,
-        previousAnalyticsData: any
-    ) => {
+    // New transactions and analytics reach the dashboard through server-sent events
+    const handleFileUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
         const file = event.target.files?.[0];
         if (!file) return;
 
@@ -31,12 +23,13 @@ export const useFileUpload = (
 
             if (!uploadResponse.ok) throw new Error('Upload failed');
 
-            const transactionsData = await pollData(`${process.env.NEXT_PUBLIC_API_URL}/transactions`, 2000, 10, previousTransactionsData);
-            const analyticsData = await pollData(`${process.env.NEXT_PUBLIC_API_URL}/transactions/analytics`, 2000, 10, previousAnalyticsData);
-
-            setTransactions(transactionsData.data);
-            setAnalytics(analyticsData);
-            setPagination(transactionsData.pagination);
+            // Invalid rows are skipped by the API, the valid ones are still scored
+            const {validation} = await uploadResponse.json();
+            if (validation?.invalid_rows > 0) {
+                const [first] = validation.errors;
+                setError(`Skipped ${validation.invalid_rows} invalid rows` +
+                    (first ? `, e.g. row ${first.row}: ${first.column} ${first.error}` : ''));
+            }
         } catch (err) {
             setError(`Failed to process file: ${err instanceof Error ? err.message : 'Unknown error'}`);
         } finally {
@@ -45,4 +38,4 @@ export const useFileUpload = (
     };
 
     return {handleFileUpload, isLoading, error};
-};
\ No newline at end of file
+};
@@ -0,0 +1,23 @@
+import {useEffect, useRef} from 'react';
+
+type EventHandlers = Record<string, (data: any) => void>;
+
+export const useServerEvents = (url: string, handlers: EventHandlers) => {
+    const handlersRef = useRef(handlers);
+    handlersRef.current = handlers;
+
+    useEffect(() => {
+        const source = new EventSource(url);
+
+        const listeners = Object.keys(handlersRef.current).map((event) => {
+            const listener = (message: MessageEvent) => handlersRef.current[event]?.(JSON.parse(message.data));
+            source.addEventListener(event, listener);
+            return {event, listener};
+        });
+
+        return () => {
+            listeners.forEach(({event, listener}) => source.removeEventListener(event, listener));
+            source.close();
+        };
+    }, [url]);
+};
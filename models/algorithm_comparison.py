@@ -8,18 +8,19 @@ from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 
 import pandas as pd
-from imblearn.over_sampling import SMOTE
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.metrics import (average_precision_score,
                              roc_auc_score, confusion_matrix, classification_report)
+from sklearn.base import clone
 from sklearn.model_selection import cross_val_score
 import time
+import argparse
 import logging
 
-from models.train_paysim_model import FraudDetectionModel
+from models.train_paysim_model import FraudDetectionModel, IMBALANCE_STRATEGIES, create_sampler
 
 
 class AlgorithmComparison:
@@ -51,18 +52,24 @@ class AlgorithmComparison:
 
         return preprocessor
 
-    def evaluate_all(self, preprocessor):
-        logging.info("Starting algorithm comparison...")
+    def evaluate_all(self, preprocessor, imbalance='smote'):
+        logging.info(f"Starting algorithm comparison (imbalance strategy: {imbalance})...")
 
         for name, model in self.models.items():
             logging.info(f"\nEvaluating {name}...")
 
+            # Fresh copy, so the class weight doesn't leak into later runs with other strategies
+            model = clone(model)
+            if imbalance == 'class_weight' and 'class_weight' in model.get_params():
+                model.set_params(class_weight='balanced')
+
             # Create pipeline with current model
-            pipeline = Pipeline([
-                ('preprocessor', preprocessor),
-                ('smote', SMOTE(random_state=42)),
-                ('classifier', model)
-            ])
+            steps = [('preprocessor', preprocessor)]
+            sampler = create_sampler(imbalance)
+            if sampler is not None:
+                steps.append(('sampler', sampler))
+            steps.append(('classifier', model))
+            pipeline = Pipeline(steps)
 
             # Time the training
             start_time = time.time()
@@ -126,6 +133,14 @@ class AlgorithmComparison:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare classification algorithms on the PaySim dataset")
+    parser.add_argument("--imbalance", choices=IMBALANCE_STRATEGIES, default="smote",
+                        help="Strategy for handling the class imbalance")
+    args = parser.parse_args()
+
     # Load and prepare data
     model = FraudDetectionModel()
     df = pd.read_csv("../data/paysim.csv")
@@ -138,7 +153,7 @@ if __name__ == "__main__":
     preprocessor = comparison.create_preprocessor()
 
     # Run comparison
-    results_df = comparison.evaluate_all(preprocessor)
+    results_df = comparison.evaluate_all(preprocessor, imbalance=args.imbalance)
 
     # Display results
     logging.info("\nFinal algorithm comparison:")
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+DEFAULT_THRESHOLD = float(os.getenv("FRAUD_THRESHOLD", "0.5"))
+# Predictions below the fraud threshold with a probability in this band are queued for manual review
+REVIEW_LOWER_THRESHOLD = float(os.getenv("REVIEW_LOWER_THRESHOLD", "0.45"))
+REVIEW_UPPER_THRESHOLD = float(os.getenv("REVIEW_UPPER_THRESHOLD", "0.55"))
+POLICY_PATH = "models/decision_policy.json"
+
+GRID_SIZE = 1001  # Probabilities are looked up on a 0.001 grid
+CALIBRATION_METHODS = ['isotonic', 'platt']
+
+
+class Calibrator:
+    """
+    Monotone mapping from raw model scores to calibrated probabilities, stored
+    as a lookup table over the probability grid.
+
+    Args:
+        table: Calibrated probability for every grid point
+        method: Method the table was fitted with
+    """
+
+    def __init__(self, table, method):
+        self.table = np.asarray(table, dtype=np.float64)
+        self.method = method
+
+    @classmethod
+    def fit(cls, raw_probabilities, y, method='isotonic'):
+        grid = np.linspace(0, 1, GRID_SIZE)
+        raw_probabilities = np.asarray(raw_probabilities, dtype=np.float64)
+        if method == 'isotonic':
+            from sklearn.isotonic import IsotonicRegression
+            regressor = IsotonicRegression(y_min=0, y_max=1, out_of_bounds='clip')
+            regressor.fit(raw_probabilities, y)
+            table = regressor.predict(grid)
+        elif method == 'platt':
+            from sklearn.linear_model import LogisticRegression
+            regressor = LogisticRegression()
+            regressor.fit(raw_probabilities.reshape(-1, 1), y)
+            table = regressor.predict_proba(grid.reshape(-1, 1))[:, 1]
+        else:
+            raise ValueError(f"Unknown calibration method: {method}")
+        return cls(table, method)
+
+    def transform(self, raw_probabilities):
+        return self.table[grid_index(raw_probabilities)]
+
+
+class DecisionPolicy:
+    """
+    Turns fraud probabilities into decisions.
+
+    Args:
+        threshold: Probability above which a transaction is fraudulent
+        type_thresholds: Per transaction type overrides of the threshold
+        review_lower: Lower bound of the manual review band
+        review_upper: Upper bound of the manual review band
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, type_thresholds=None,
+                 review_lower=REVIEW_LOWER_THRESHOLD, review_upper=REVIEW_UPPER_THRESHOLD):
+        self.threshold = threshold
+        self.type_thresholds = dict(type_thresholds or {})
+        self.review_lower = review_lower
+        self.review_upper = review_upper
+
+    def threshold_for(self, transaction_type):
+        return self.type_thresholds.get(transaction_type, self.threshold)
+
+    def needs_manual_review(self, prediction, probability):
+        return bool(self.manual_review_mask([prediction], [probability])[0])
+
+    def manual_review_mask(self, predictions, probabilities):
+        """
+        Which predictions go to manual review: legitimate ones inside the review band.
+
+        Args:
+            predictions: Prediction per row
+            probabilities: Fraud probability per row
+        """
+        predictions = np.asarray(predictions)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        return (predictions == 0) & (probabilities >= self.review_lower) & (probabilities <= self.review_upper)
+
+    def to_dict(self):
+        return {
+            'threshold': self.threshold,
+            'type_thresholds': self.type_thresholds,
+            'review_lower': self.review_lower,
+            'review_upper': self.review_upper
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def save(self, path=POLICY_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=POLICY_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            policy = cls.from_dict(json.load(f))
+        logging.info(f"Loaded decision policy from {path}: {policy.to_dict()}")
+        return policy
+
+
+class DecisionTable:
+    """
+    Calibration and policy precomputed for every (transaction type, grid point),
+    so scoring a transaction is a single table lookup.
+
+    Args:
+        policy: Decision policy to apply
+        calibrator: Optional calibrator applied before the policy
+    """
+
+    def __init__(self, policy, calibrator=None):
+        self.policy = policy
+        self.calibrator = calibrator
+        grid = np.linspace(0, 1, GRID_SIZE)
+        calibrated = calibrator.table if calibrator is not None else grid
+
+        # Row 0 applies the default threshold, one extra row per type with an override
+        self.type_rows = {name: row for row, name in enumerate(policy.type_thresholds, start=1)}
+        thresholds = np.array([policy.threshold] + list(policy.type_thresholds.values()))
+        self.probabilities = calibrated
+        self.predictions = (calibrated[np.newaxis, :] > thresholds[:, np.newaxis]).astype(np.uint8)
+
+    def lookup(self, raw_probabilities, types):
+        """
+        Calibrated probabilities and predictions for raw model scores.
+
+        Args:
+            raw_probabilities: Raw fraud probabilities from the classifier
+            types: Transaction type of every row
+        """
+        index = grid_index(raw_probabilities)
+        rows = np.fromiter((self.type_rows.get(t, 0) for t in types), dtype=np.intp, count=len(index))
+        return self.probabilities[index], self.predictions[rows, index]
+
+
+active_policy = None
+active_policy_mtime = None
+policy_version = 0  # Incremented whenever the active policy is replaced
+
+
+def get_policy():
+    global active_policy
+    if active_policy is None:
+        load_policy()
+    return active_policy
+
+
+def get_policy_version():
+    get_policy()
+    return policy_version
+
+
+def set_policy(policy, path=POLICY_PATH):
+    global active_policy, active_policy_mtime, policy_version
+    policy.save(path)
+    active_policy = policy
+    active_policy_mtime = os.path.getmtime(path)
+    policy_version += 1
+
+
+def load_policy(path=POLICY_PATH):
+    global active_policy, active_policy_mtime, policy_version
+    active_policy = DecisionPolicy.load(path)
+    active_policy_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    policy_version += 1
+
+
+def reload_policy_if_changed(path=POLICY_PATH):
+    # Other API processes may have applied a new policy
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if mtime == active_policy_mtime:
+        return False
+    load_policy(path)
+    return True
+
+
+def grid_index(probabilities):
+    return np.rint(np.clip(np.asarray(probabilities, dtype=np.float64), 0, 1) * (GRID_SIZE - 1)).astype(np.intp)
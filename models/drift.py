@@ -0,0 +1,182 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from models.inference import NUMERIC_FEATURES
+
+FEATURE_BINS = 20  # Quantile bins per numeric feature, fewer when the training data has repeated values
+PROBABILITY_EDGES = np.linspace(0, 1, 21)[1:-1]  # Fixed 0.05 wide bins for the fraud probability
+PSI_MODERATE = 0.1  # Population stability index above which a shift is reported as moderate
+PSI_SIGNIFICANT = 0.25  # and above which it is reported as significant
+SHARE_FLOOR = 1e-4  # Empty bins are floored to this share so the PSI stays finite
+
+
+def bin_counts(edges, values):
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+
+def psi(expected, actual):
+    expected = np.maximum(expected / max(expected.sum(), 1), SHARE_FLOOR)
+    actual = np.maximum(actual / max(actual.sum(), 1), SHARE_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected, actual):
+    # Kolmogorov-Smirnov statistic on the binned distributions, a lower bound of the exact one
+    expected_cdf = np.cumsum(expected) / max(expected.sum(), 1)
+    actual_cdf = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(expected_cdf - actual_cdf)))
+
+
+def drift_status(value):
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    if value >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftSketch:
+    """
+    Fixed-size histograms of the model inputs and the fraud probability.
+
+    The bins come from a reference, so memory does not grow with traffic and two
+    sketches of the same reference are merged by adding their counts.
+
+    Args:
+        edges: Inner bin edges per numeric feature
+        type_names: Transaction types with their own count, anything else is counted as other
+    """
+
+    def __init__(self, edges, type_names):
+        self.edges = edges
+        self.type_names = list(type_names)
+        self.type_index = {name: i for i, name in enumerate(self.type_names)}
+        self.feature_counts = {feature: np.zeros(len(edges[feature]) + 1, dtype=np.int64) for feature in edges}
+        self.type_counts = np.zeros(len(self.type_names) + 1, dtype=np.int64)
+        self.probability_counts = np.zeros(len(PROBABILITY_EDGES) + 1, dtype=np.int64)
+        self.rows = 0
+
+    def update(self, frame, probabilities):
+        """
+        Add scored rows.
+
+        Args:
+            frame: DataFrame with the model features
+            probabilities: Fraud probability per row
+        """
+        for feature, edges in self.edges.items():
+            self.feature_counts[feature] += bin_counts(edges, frame[feature].to_numpy(dtype=np.float64))
+        other = len(self.type_names)
+        codes = np.fromiter((self.type_index.get(t, other) for t in frame['type']), dtype=np.intp, count=len(frame))
+        self.type_counts += np.bincount(codes, minlength=other + 1)
+        self.probability_counts += bin_counts(PROBABILITY_EDGES, np.asarray(probabilities, dtype=np.float64))
+        self.rows += len(frame)
+
+    def update_record(self, record, probability):
+        # Single transaction, avoids building a DataFrame on the /predict path
+        for feature, edges in self.edges.items():
+            self.feature_counts[feature][np.searchsorted(edges, record[feature], side='right')] += 1
+        self.type_counts[self.type_index.get(record['type'], len(self.type_names))] += 1
+        self.probability_counts[np.searchsorted(PROBABILITY_EDGES, probability, side='right')] += 1
+        self.rows += 1
+
+    def merge(self, other):
+        for feature in self.feature_counts:
+            self.feature_counts[feature] += other.feature_counts[feature]
+        self.type_counts += other.type_counts
+        self.probability_counts += other.probability_counts
+        self.rows += other.rows
+
+    def counts_dict(self):
+        return {
+            'rows': self.rows,
+            'features': {feature: counts.tolist() for feature, counts in self.feature_counts.items()},
+            'types': self.type_counts.tolist(),
+            'probability': self.probability_counts.tolist()
+        }
+
+    def load_counts(self, counts):
+        self.rows = counts['rows']
+        self.feature_counts = {feature: np.asarray(values, dtype=np.int64)
+                               for feature, values in counts['features'].items()}
+        self.type_counts = np.asarray(counts['types'], dtype=np.int64)
+        self.probability_counts = np.asarray(counts['probability'], dtype=np.int64)
+        return self
+
+
+class DriftReference:
+    """
+    Sketch of the training sample stored with the model artifact. Live sketches
+    use its bins and are compared against it.
+    """
+
+    def __init__(self, sketch, reference_id):
+        self.sketch = sketch
+        self.reference_id = reference_id
+
+    @classmethod
+    def fit(cls, X, probabilities):
+        """
+        Args:
+            X: Training features
+            probabilities: Calibrated fraud probabilities on held-out data
+        """
+        edges = {}
+        for feature in NUMERIC_FEATURES:
+            quantiles = np.quantile(X[feature].to_numpy(dtype=np.float64), np.linspace(0, 1, FEATURE_BINS + 1)[1:-1])
+            edges[feature] = np.unique(quantiles)
+        sketch = DriftSketch(edges, sorted(X['type'].unique()))
+        for feature, feature_edges in edges.items():
+            sketch.feature_counts[feature] = bin_counts(feature_edges, X[feature].to_numpy(dtype=np.float64))
+        sketch.type_counts[:-1] = X['type'].value_counts().reindex(sketch.type_names, fill_value=0).to_numpy()
+        sketch.probability_counts = bin_counts(PROBABILITY_EDGES, np.asarray(probabilities, dtype=np.float64))
+        sketch.rows = len(X)
+        return cls(sketch, datetime.now(timezone.utc).isoformat())
+
+    def new_sketch(self):
+        return DriftSketch(self.sketch.edges, self.sketch.type_names)
+
+    def to_dict(self):
+        # Plain lists so the artifact does not depend on this class when unpickled
+        return {
+            'reference_id': self.reference_id,
+            'edges': {feature: edges.tolist() for feature, edges in self.sketch.edges.items()},
+            'type_names': self.sketch.type_names,
+            'counts': self.sketch.counts_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        edges = {feature: np.asarray(values, dtype=np.float64) for feature, values in data['edges'].items()}
+        sketch = DriftSketch(edges, data['type_names']).load_counts(data['counts'])
+        return cls(sketch, data['reference_id'])
+
+    def compare(self, live):
+        """
+        PSI and KS of every feature and of the fraud probability against the reference.
+
+        Args:
+            live: Sketch built from the reference's bins
+        """
+        results = {}
+        for feature, expected in self.sketch.feature_counts.items():
+            actual = live.feature_counts[feature]
+            value = psi(expected, actual)
+            results[feature] = {'psi': round(value, 4), 'ks': round(ks(expected, actual), 4),
+                                'status': drift_status(value)}
+
+        value = psi(self.sketch.type_counts, live.type_counts)
+        names = self.sketch.type_names + ['other']
+        results['type'] = {
+            'psi': round(value, 4),
+            'status': drift_status(value),
+            'reference_shares': dict(zip(names, np.round(self.sketch.type_counts / max(self.sketch.rows, 1), 4).tolist())),
+            'live_shares': dict(zip(names, np.round(live.type_counts / max(live.rows, 1), 4).tolist()))
+        }
+
+        expected, actual = self.sketch.probability_counts, live.probability_counts
+        value = psi(expected, actual)
+        results['probability'] = {'psi': round(value, 4), 'ks': round(ks(expected, actual), 4),
+                                  'status': drift_status(value)}
+        return results
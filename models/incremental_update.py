@@ -0,0 +1,269 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from api.database import SessionLocal, Transaction as DBTransaction, Prediction as DBPrediction
+from models.decision_policy import Calibrator
+from models.train_paysim_model import FraudDetectionModel
+
+MODEL_PATH = "models/fraud_model.pkl"
+STATE_PATH = "models/incremental_state.pkl"
+RESERVOIR_SIZE = 50000  # Rows of labelled history kept for replay
+HISTORY_RATIO = 4  # History rows replayed per newly reviewed row
+TREES_PER_UPDATE = 10  # Trees added to the forest on every update
+MAX_INCREMENTAL_TREES = 200  # Oldest added trees are dropped beyond this, trees of the full training run always stay
+SEED_CHUNK = 10000  # Stored transactions read per query when feeding the reservoir
+UPDATE_INTERVAL = 300  # Seconds between update runs
+CALIBRATION_FRACTION = 0.25  # Share of every update's rows held out to refit the probability calibration
+MIN_CALIBRATION_ROWS = 5  # Held-out rows needed of each class, the calibration is dropped with fewer
+
+
+class Reservoir:
+    """
+    Fixed-size uniform sample of a stream of labelled rows (Algorithm R).
+
+    Args:
+        capacity: Maximum number of rows kept
+        seed: Random seed for reproducible sampling
+    """
+
+    def __init__(self, capacity=RESERVOIR_SIZE, seed=42):
+        self.capacity = capacity
+        self.rows = []
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, rows):
+        for row in rows:
+            self.seen += 1
+            if len(self.rows) < self.capacity:
+                self.rows.append(row)
+            else:
+                index = self.rng.integers(0, self.seen)
+                if index < self.capacity:
+                    self.rows[index] = row
+
+    def sample(self, n):
+        if n >= len(self.rows):
+            return pd.DataFrame(self.rows)
+        indices = self.rng.choice(len(self.rows), size=n, replace=False)
+        return pd.DataFrame([self.rows[i] for i in indices])
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class IncrementalUpdater:
+    def __init__(self, model_path=MODEL_PATH, state_path=STATE_PATH,
+                 trees_per_update=TREES_PER_UPDATE, max_incremental_trees=MAX_INCREMENTAL_TREES):
+        self.model_path = model_path
+        self.state_path = state_path
+        self.trees_per_update = trees_per_update
+        self.max_incremental_trees = max_incremental_trees
+        self.features = FraudDetectionModel().numeric_features + ['type']
+        self.load_state()
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            state = joblib.load(self.state_path)
+            self.reservoir = state['reservoir']
+            self.last_reviewed_at = state['last_reviewed_at']
+            self.last_scored_id = state.get('last_scored_id', 0)
+        else:
+            self.reservoir = Reservoir()
+            self.last_reviewed_at = None
+            self.last_scored_id = 0
+        logging.info(f"Incremental state: {len(self.reservoir)} history rows, "
+                     f"last review consumed at {self.last_reviewed_at}")
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        joblib.dump({'reservoir': self.reservoir, 'last_reviewed_at': self.last_reviewed_at,
+                     'last_scored_id': self.last_scored_id}, tmp_path)
+        os.replace(tmp_path, self.state_path)
+
+    def seed_from_csv(self, path, chunksize=500000):
+        logging.info(f"Seeding history reservoir from {path}...")
+        for chunk in pd.read_csv(path, usecols=self.features + ['isFraud'], chunksize=chunksize):
+            self.reservoir.add(chunk.to_dict('records'))
+        self.save_state()
+        logging.info(f"Reservoir holds {len(self.reservoir)} of {self.reservoir.seen} rows seen")
+
+    def add_scored(self, db):
+        """
+        Feed transactions scored since the last run into the history reservoir, so
+        history is sampled even when it was never seeded from a CSV. Unreviewed rows
+        are labelled with their stored prediction, reviewed rows enter with their review.
+        """
+        added = 0
+        while True:
+            rows = (
+                db.query(DBTransaction, DBPrediction.id, DBPrediction.prediction)
+                .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+                .filter(DBPrediction.id > self.last_scored_id, DBPrediction.reviewed.isnot(True))
+                .order_by(DBPrediction.id)
+                .limit(SEED_CHUNK)
+                .all()
+            )
+            if not rows:
+                break
+            self.reservoir.add(
+                dict({feature: getattr(transaction, feature) for feature in self.features}, isFraud=int(prediction))
+                for transaction, _, prediction in rows
+            )
+            self.last_scored_id = rows[-1][1]
+            added += len(rows)
+        if added:
+            logging.info(f"Added {added} scored transactions to the history reservoir, "
+                         f"it holds {len(self.reservoir)} of {self.reservoir.seen} rows seen")
+        return added
+
+    def fetch_reviewed(self, db):
+        query = (
+            db.query(DBTransaction, DBPrediction.reviewed_prediction, DBPrediction.reviewed_at)
+            .join(DBPrediction, DBTransaction.id == DBPrediction.transaction_id)
+            .filter(DBPrediction.reviewed.is_(True), DBPrediction.reviewed_prediction.isnot(None))
+            .order_by(DBPrediction.reviewed_at)
+        )
+        if self.last_reviewed_at is not None:
+            query = query.filter(DBPrediction.reviewed_at > self.last_reviewed_at)
+
+        rows = []
+        last_reviewed_at = self.last_reviewed_at
+        for transaction, reviewed_prediction, reviewed_at in query.all():
+            row = {feature: getattr(transaction, feature) for feature in self.features}
+            row['isFraud'] = int(reviewed_prediction)
+            rows.append(row)
+            last_reviewed_at = reviewed_at
+        return rows, last_reviewed_at
+
+    def update_model(self, pipeline, train_df):
+        X = train_df[self.features]
+        y = train_df['isFraud']
+        Xt = pipeline.named_steps['preprocessor'].transform(X)
+        classifier = pipeline.named_steps['classifier']
+
+        if hasattr(classifier, 'partial_fit'):
+            classifier.partial_fit(Xt, y)
+            return
+
+        if not hasattr(classifier, 'estimators_'):
+            raise ValueError(f"{type(classifier).__name__} supports neither warm start nor partial_fit")
+
+        # Grow the forest with trees fitted on the new data. The trees of the full training run are
+        # remembered on the first update and never dropped, only the added trees form a sliding window
+        if not hasattr(classifier, 'base_estimators_'):
+            classifier.base_estimators_ = len(classifier.estimators_)
+        base = classifier.base_estimators_
+        classifier.set_params(warm_start=True, n_estimators=len(classifier.estimators_) + self.trees_per_update)
+        classifier.fit(Xt, y)
+        added = classifier.estimators_[base:]
+        if len(added) > self.max_incremental_trees:
+            classifier.estimators_ = classifier.estimators_[:base] + added[-self.max_incremental_trees:]
+            classifier.n_estimators = len(classifier.estimators_)
+
+    def split_for_calibration(self, train_df):
+        # No rows are held out when a class is too rare to give the calibration enough of it
+        if train_df['isFraud'].value_counts().min() * CALIBRATION_FRACTION < MIN_CALIBRATION_ROWS:
+            return train_df, None
+        return train_test_split(train_df, test_size=CALIBRATION_FRACTION, random_state=42,
+                                stratify=train_df['isFraud'])
+
+    def update(self, model, train_df):
+        """
+        Update the classifier and refit its calibration on rows the update didn't see.
+
+        Args:
+            model: Loaded model, updated in place
+            train_df: Reviewed and history rows with the isFraud label
+        """
+        calibration_df = None
+        if model.calibrator is not None:
+            train_df, calibration_df = self.split_for_calibration(train_df)
+        self.update_model(model.model, train_df)
+        if model.calibrator is None:
+            return
+
+        # The calibration table was fitted to the old classifier's raw scores and no longer matches
+        if calibration_df is None:
+            logging.warning(f"Too few held-out rows of each class to refit the {model.calibrator.method} "
+                            f"calibration, serving uncalibrated probabilities until the model is retrained")
+            model.calibrator = None
+            return
+        raw_probabilities = model.model.predict_proba(calibration_df[self.features])[:, 1]
+        model.calibrator = Calibrator.fit(raw_probabilities, calibration_df['isFraud'], model.calibrator.method)
+        logging.info(f"Refitted {model.calibrator.method} calibration on {len(calibration_df)} held-out rows")
+
+    def run_once(self):
+        db = SessionLocal()
+        try:
+            if self.add_scored(db):
+                self.save_state()
+            new_rows, last_reviewed_at = self.fetch_reviewed(db)
+        finally:
+            db.close()
+
+        if not new_rows:
+            logging.info("No newly reviewed predictions")
+            return False
+        if not len(self.reservoir):
+            logging.warning("History reservoir is empty, the update only sees the reviewed rows. "
+                            "Score transactions first or seed it with --seed-csv")
+
+        start_time = time.time()
+        history = self.reservoir.sample(len(new_rows) * HISTORY_RATIO)
+        train_df = pd.concat([pd.DataFrame(new_rows), history], ignore_index=True)
+        if train_df['isFraud'].nunique() < 2:
+            # Trees fitted on a single class cannot be combined with the existing forest
+            logging.info(f"{len(new_rows)} reviewed rows contain a single class, waiting for more")
+            return False
+
+        model = FraudDetectionModel()
+        model.load_model(self.model_path)
+        self.update(model, train_df)
+        model.save_model(self.model_path)
+
+        self.reservoir.add(new_rows)
+        self.last_reviewed_at = last_reviewed_at
+        self.save_state()
+        logging.info(f"Updated model with {len(new_rows)} reviewed and {len(history)} history rows "
+                     f"in {time.time() - start_time:.2f} seconds")
+        return True
+
+    def run(self, interval=UPDATE_INTERVAL):
+        logging.info(f"Starting incremental updates every {interval} seconds")
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Incremental update failed")
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Incrementally update the fraud model from reviewed predictions")
+    parser.add_argument("--interval", type=int, default=UPDATE_INTERVAL, help="Seconds between updates")
+    parser.add_argument("--seed-csv", help="Seed the history reservoir from a PaySim CSV before starting")
+    parser.add_argument("--once", action="store_true", help="Run a single update and exit")
+    args = parser.parse_args()
+
+    updater = IncrementalUpdater()
+    if args.seed_csv:
+        updater.seed_from_csv(args.seed_csv)
+
+    if args.once:
+        updater.run_once()
+    else:
+        updater.run(args.interval)
@@ -0,0 +1,108 @@
+import logging
+import os
+
+import pandas as pd
+
+from models.decision_policy import DecisionTable, get_policy
+
+MODEL_PATH = "models/fraud_model.pkl"
+NUMERIC_FEATURES = ['step', 'amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+CATEGORICAL_FEATURES = ['type']
+
+
+class InferenceModel:
+    """
+    Serving side of the fraud model: loads a trained artifact and scores transactions.
+
+    Nothing from the training stack is imported here. The scikit-learn classes the
+    artifact needs are imported by unpickling when the model is loaded.
+    """
+
+    def __init__(self):
+        self.numeric_features = list(NUMERIC_FEATURES)
+        self.categorical_features = list(CATEGORICAL_FEATURES)
+        self.model = None
+        self.calibrator = None
+        self.drift_reference = None
+        self.decision_table = None
+        self.model_path = None
+        self.model_mtime = None
+
+    def load_model(self, path):
+        import joblib
+
+        logging.info(f"Loading model from {path}")
+        mtime = os.path.getmtime(path)
+        artifact = joblib.load(path)
+        if isinstance(artifact, dict):
+            self.model = artifact['pipeline']
+            self.calibrator = artifact.get('calibrator')
+            self.drift_reference = artifact.get('drift_reference')
+        else:
+            # Models saved before calibration was added are a bare pipeline
+            self.model = artifact
+            self.calibrator = None
+            self.drift_reference = None
+        self.decision_table = None
+        self.model_path = path
+        self.model_mtime = mtime
+        logging.info("Model loaded successfully")
+
+    def reload_if_changed(self):
+        if self.model_path is None or os.path.getmtime(self.model_path) == self.model_mtime:
+            return False
+        logging.info(f"Model file {self.model_path} changed, reloading")
+        self.load_model(self.model_path)
+        return True
+
+    def get_decision_table(self):
+        # Rebuilt whenever the active policy or the calibrator changes
+        policy = get_policy()
+        if (self.decision_table is None or self.decision_table.policy is not policy
+                or self.decision_table.calibrator is not self.calibrator):
+            self.decision_table = DecisionTable(policy, self.calibrator)
+        return self.decision_table
+
+    def score(self, X):
+        """
+        Calibrated fraud probabilities and predictions under the active decision policy.
+
+        Args:
+            X: DataFrame with the model features
+        """
+        raw_probabilities = self.model.predict_proba(X)[:, 1]
+        return self.get_decision_table().lookup(raw_probabilities, X['type'].to_numpy())
+
+    def predict_proba(self, input_data: dict):
+        logging.info("Making prediction for new data...")
+        # Convert single input to DataFrame
+        input_df = pd.DataFrame([input_data])
+
+        # Ensure all required features are present
+        for feature in self.numeric_features + self.categorical_features:
+            if feature not in input_df.columns:
+                logging.error(f"Missing feature: {feature}")
+                raise ValueError(f"Missing feature: {feature}")
+
+        # Make prediction
+        probabilities, predictions = self.score(input_df)
+
+        result = {
+            'prediction': int(predictions[0]),
+            'probability': float(probabilities[0])
+        }
+        logging.info(f"Prediction result: {result}")
+        return result
+
+
+active_model = None
+
+
+def get_model(path=MODEL_PATH):
+    # One model per process, loaded on first use and shared by every caller
+    global active_model
+    if active_model is None:
+        model = InferenceModel()
+        model.load_model(path)
+        active_model = model
+    return active_model
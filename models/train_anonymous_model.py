@@ -1,135 +1,195 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import logging
 import time
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import joblib
-from sklearn.model_selection import train_test_split, cross_val_score
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import precision_recall_curve, average_precision_score, roc_auc_score, auc, confusion_matrix, \
     classification_report
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import LinearSVC
 from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
-from imblearn.over_sampling import SMOTE
 from imblearn.pipeline import Pipeline as ImbPipeline
 
-
-def main():
-    # Step 1: Load and Preprocess Data
-    print("Step 1: Loading and Preprocessing Data")
-    df = pd.read_csv("../data/creditcard.csv")
-
-    # Feature Engineering
-    df['Hour'] = df['Time'].apply(lambda x: (x / 3600) % 24)
-    df['Day'] = df['Time'].apply(lambda x: (x / (3600 * 24)) % 7)
-    df['Transaction_Amount_Scaled'] = np.log1p(df['Amount'])
-
-    # Select features for modeling
-    features = ['V1', 'V2', 'V3', 'V4', 'V5', 'V6', 'V7', 'V8', 'V9', 'V10',
-                'V11', 'V12', 'V13', 'V14', 'V15', 'V16', 'V17', 'V18', 'V19', 'V20',
-                'V21', 'V22', 'V23', 'V24', 'V25', 'V26', 'V27', 'V28',
-                'Hour', 'Day', 'Transaction_Amount_Scaled']
-
-    X = df[features]
-    y = df['Class']
-
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.5, random_state=42, stratify=y)
-
-    print(f"Training set shape: {X_train.shape}")
-    print(f"Testing set shape: {X_test.shape}")
-
-    # Step 2: Create model pipelines
-    print("\nStep 2: Creating model pipelines")
-
-    def create_pipeline(classifier, use_smote=True):
-        steps = [
-            ('scaler', StandardScaler()),
-            ('classifier', classifier)
-        ]
-
-        if use_smote:
-            return ImbPipeline([
-                ('smote', SMOTE(random_state=42)),
-                ('pipeline', Pipeline(steps))
-            ])
+from models.train_paysim_model import IMBALANCE_STRATEGIES, create_sampler, serving_pipeline
+
+DATA_PATH = "../data/creditcard.csv"
+MODEL_PATH = "../models/creditcard_model.pkl"  # Kept apart from the PaySim model the API serves
+FEATURE_CACHE_DIR = "../data/feature_cache"  # Engineered feature matrices keyed by source fingerprint
+FEATURE_VERSION = 1  # Bump when engineer_features changes so cached matrices are rebuilt
+CV_FOLDS = 5
+
+FEATURES = ['V1', 'V2', 'V3', 'V4', 'V5', 'V6', 'V7', 'V8', 'V9', 'V10',
+            'V11', 'V12', 'V13', 'V14', 'V15', 'V16', 'V17', 'V18', 'V19', 'V20',
+            'V21', 'V22', 'V23', 'V24', 'V25', 'V26', 'V27', 'V28',
+            'Hour', 'Day', 'Transaction_Amount_Scaled']
+
+
+def engineer_features(df):
+    # Whole-column arithmetic, Time is in seconds since the first transaction
+    seconds = df['Time'].to_numpy(dtype=np.float64)
+    features = df[FEATURES[:28]].astype(np.float64)
+    features['Hour'] = (seconds / 3600) % 24
+    features['Day'] = (seconds / (3600 * 24)) % 7
+    features['Transaction_Amount_Scaled'] = np.log1p(df['Amount'].to_numpy(dtype=np.float64))
+    return features, df['Class'].to_numpy(dtype=np.int64)
+
+
+def fingerprint(path):
+    # Content hash of the source plus everything that shapes the feature matrix
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{FEATURE_VERSION}:{','.join(FEATURES)}".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_features(path=DATA_PATH, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Engineered features and labels of a creditcard CSV, from the cache when the
+    CSV has not changed since it was last parsed.
+
+    Args:
+        path: Creditcard CSV
+        cache_dir: Directory for cached feature matrices, None to always parse the CSV
+    """
+    cache_path = None
+    if cache_dir is not None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(cache_dir, f"{name}-{fingerprint(path)}.npz")
+        if os.path.exists(cache_path):
+            logging.info(f"Loading cached features from {cache_path}")
+            with np.load(cache_path, allow_pickle=False) as cached:
+                return pd.DataFrame(cached['X'], columns=list(cached['features'])), cached['y']
+
+    logging.info(f"Parsing {path}")
+    X, y = engineer_features(pd.read_csv(path, usecols=['Time', 'Amount', 'Class'] + FEATURES[:28]))
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, X=X.to_numpy(), y=y, features=np.array(FEATURES))
+        os.replace(tmp_path, cache_path)
+        logging.info(f"Cached features in {cache_path}")
+    return X, y
+
+
+def create_models(imbalance='smote'):
+    # Single-threaded classifiers, the fits themselves run in parallel
+    classifiers = {
+        'Random Forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1),
+        'SVM': LinearSVC(random_state=42, max_iter=20000, dual='auto'),
+        'Logistic Regression': LogisticRegression(random_state=42, max_iter=1000)
+    }
+    models = {}
+    for name, classifier in classifiers.items():
+        if imbalance == 'class_weight':
+            classifier.set_params(class_weight='balanced')
+        steps = [('scaler', StandardScaler())]
+        sampler = create_sampler(imbalance)
+        if sampler is not None:
+            steps.append(('sampler', sampler))
+        steps.append(('classifier', classifier))
+        models[name] = ImbPipeline(steps)
+    return models
+
+
+def positive_scores(model, X):
+    return model.predict_proba(X)[:, 1] if hasattr(model, 'predict_proba') else model.decision_function(X)
+
+
+def fit_task(name, model, X, y, train_index, test_index):
+    start_time = time.time()
+    model = clone(model).fit(X[train_index], y[train_index])
+    training_time = time.time() - start_time
+    if test_index is None:
+        return name, None, model, training_time
+    return name, roc_auc_score(y[test_index], positive_scores(model, X[test_index])), None, training_time
+
+
+def fit_models(models, X_train, y_train, n_jobs=-1, folds=CV_FOLDS):
+    """
+    Cross-validate every model and fit it once on the whole training set.
+
+    All fold fits and final fits are independent and run as one parallel batch.
+
+    Args:
+        models: Unfitted pipelines by name
+        X_train: Training features as an array
+        y_train: Training labels
+        n_jobs: Parallel fits, -1 for one per CPU
+        folds: Cross-validation folds, 0 to skip cross-validation
+
+    Returns:
+        Dict with the fitted pipeline, cross-validation scores and final training time per model
+    """
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X_train, y_train)) \
+        if folds > 1 else []
+    tasks = [(name, model, train_index, test_index)
+             for name, model in models.items()
+             for train_index, test_index in splits + [(np.arange(len(y_train)), None)]]
+    outcomes = Parallel(n_jobs=n_jobs)(
+        delayed(fit_task)(name, model, X_train, y_train, train_index, test_index)
+        for name, model, train_index, test_index in tasks
+    )
+
+    results = {name: {'cv_scores': []} for name in models}
+    for name, score, fitted, training_time in outcomes:
+        if fitted is None:
+            results[name]['cv_scores'].append(score)
         else:
-            return Pipeline(steps)
-
-    models = {
-        'Random Forest': create_pipeline(RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)),
-        'SVM': create_pipeline(LinearSVC(random_state=42, max_iter=20000, dual='auto')),
-        'Logistic Regression': create_pipeline(LogisticRegression(random_state=42, max_iter=1000))
+            results[name]['model'] = fitted
+            results[name]['training_time'] = training_time
+    return results
+
+
+def evaluate(name, model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    y_pred_proba = positive_scores(model, X_test)
+
+    # False positive calculation
+    cm = confusion_matrix(y_test, y_pred)
+    fp = cm[0, 1]
+    tn = cm[0, 0]
+
+    precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
+    metrics = {
+        'roc_auc': roc_auc_score(y_test, y_pred_proba),
+        'avg_precision': average_precision_score(y_test, y_pred_proba),
+        'auprc': auc(recall, precision),
+        'false_positives': int(fp),
+        'false_positive_rate': fp / (fp + tn)
     }
 
-    # Step 3: Model evaluation
-    print("\nStep 3: Model evaluation")
-
-    def evaluate_model(model, X, y):
-        cv_scores = cross_val_score(model, X, y, cv=5, scoring='roc_auc')
-        return cv_scores.mean(), cv_scores.std()
-
-    for name, model in models.items():
-        mean_score, std_score = evaluate_model(model, X_train, y_train)
-        print(f"{name} - ROC AUC: {mean_score:.3f} (+/- {std_score * 2:.3f})")
-
-    # Step 4: Train best model and evaluate on test set
-    print("\nStep 4: Training Best Model and Evaluating on Test Set")
-
-    best_model = models['Random Forest']
-    best_model.fit(X_train, y_train)
-
-    for name, model in models.items():
-        start_time = time.time()
-        model.fit(X_train, y_train)
-
-        training_time = time.time() - start_time
+    logging.info(f"\n{name} Performance:")
+    logging.info(f"Test set ROC AUC: {metrics['roc_auc']:.3f}")
+    logging.info(f"Test set Average Precision: {metrics['avg_precision']:.3f}")
+    logging.info(f"Test Set AUPRC: {metrics['auprc']:.3f}")
+    logging.info(f"False Positives: {metrics['false_positives']}")
+    logging.info(f"False Positive Rate: {metrics['false_positive_rate']:.5f}")
+    logging.info(f"\n{classification_report(y_test, y_pred)}")
+    return metrics, precision, recall
 
-        y_pred = model.predict(X_test)
 
-        # False positive calculation
-        cm = confusion_matrix(y_test, y_pred)
-        fp = cm[0, 1]
-        tn = cm[0, 0]
-        fpr = fp / (fp + tn)
+def plot_results(results, curves):
+    import matplotlib.pyplot as plt
 
-        y_pred_proba = model.predict_proba(X_test)[:, 1] if hasattr(model,
-                                                                    'predict_proba') else model.decision_function(
-            X_test)
-
-        # Performance metrics
-        roc_auc = roc_auc_score(y_test, y_pred_proba)
-        avg_precision = average_precision_score(y_test, y_pred_proba)
-        precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
-        auprc = auc(recall, precision)
-
-        print(f"\n{name} Performance:")
-        print(f"Training time: {training_time:.2f} seconds")
-        print(f"Test set ROC AUC: {roc_auc:.3f}")
-        print(f"Test set Average Precision: {avg_precision:.3f}")
-        print(f"Test Set AUPRC: {auprc:.3f}")
-
-        # False positive metrics
-        print(f"False Positives: {fp}")
-        print(f"False Positive Rate: {fpr:.5f}")
-        print(classification_report(y_test, y_pred))
-
-    # Step 5: Feature Importance (for Random Forest)
-    print("\nStep 5: Feature Importance")
-
-    try:
-        rf_classifier = best_model.named_steps['pipeline'].named_steps['classifier']
-    except KeyError:
-        try:
-            rf_classifier = best_model.named_steps['classifier']
-        except Exception as e:
-            print(f"Could not access RandomForestClassifier: {e}")
-            rf_classifier = None
-
-    if rf_classifier and isinstance(rf_classifier, RandomForestClassifier):
-        importances = rf_classifier.feature_importances_
-        feature_imp = pd.DataFrame(sorted(zip(importances, features)), columns=['Value', 'Feature'])
+    rf_classifier = results.get('Random Forest', {}).get('model')
+    if rf_classifier is not None:
+        importances = rf_classifier.named_steps['classifier'].feature_importances_
+        feature_imp = pd.DataFrame(sorted(zip(importances, FEATURES)), columns=['Value', 'Feature'])
 
         plt.figure(figsize=(10, 6))
         plt.bar(x=feature_imp['Feature'], height=feature_imp['Value'], color='skyblue')
@@ -139,32 +199,71 @@ def main():
         plt.title('Feature Importances (Random Forest)')
         plt.tight_layout()
         plt.show()
-    else:
-        print("Could not generate feature importance for non-Random Forest model")
-
-    # Step 6: Precision-Recall Curve
-    print("\nStep 6: Precision-Recall Curve")
 
     plt.figure(figsize=(8, 6))
-    for name, model in models.items():
-        y_pred_proba = model.predict_proba(X_test)[:, 1] if hasattr(model,
-                                                                    'predict_proba') else model.decision_function(
-            X_test)
-        precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
-        auprc = auc(recall, precision)
+    for name, (precision, recall, auprc) in curves.items():
         plt.plot(recall, precision, label=f'{name} (AUPRC = {auprc:.2f})')
-
     plt.xlabel('Recall')
     plt.ylabel('Precision')
     plt.title('Precision-Recall Curve')
     plt.legend(loc='lower left')
     plt.show()
 
-    print("\nPipeline complete!")
 
-    joblib.dump(best_model, "../models/fraud_model.pkl")
-    print("Model saved to ../models/fraud_model.pkl")
+def save_model(name, model, path):
+    logging.info(f"Saving {name} to {path}")
+    tmp_path = f"{path}.tmp"
+    joblib.dump({'pipeline': serving_pipeline(model), 'dataset': 'creditcard', 'algorithm': name,
+                 'features': FEATURES}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train fraud models on the anonymised creditcard dataset")
+    parser.add_argument("--data", default=DATA_PATH, help="Creditcard CSV")
+    parser.add_argument("--output", default=MODEL_PATH, help="Where the best model is written")
+    parser.add_argument("--cache-dir", default=FEATURE_CACHE_DIR, help="Directory for cached feature matrices")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse the CSV")
+    parser.add_argument("--imbalance", choices=IMBALANCE_STRATEGIES, default="smote",
+                        help="Strategy for handling the class imbalance")
+    parser.add_argument("--folds", type=int, default=CV_FOLDS, help="Cross-validation folds, 0 to skip")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel model fits, -1 for one per CPU")
+    parser.add_argument("--plots", action="store_true", help="Show feature importance and precision-recall plots")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    X, y = load_features(args.data, None if args.no_cache else args.cache_dir)
+    logging.info(f"Features ready in {time.time() - start_time:.2f} seconds")
+
+    X_train, X_test, y_train, y_test = train_test_split(X.to_numpy(), y, test_size=0.5, random_state=42, stratify=y)
+    logging.info(f"Training set shape: {X_train.shape}")
+    logging.info(f"Testing set shape: {X_test.shape}")
+
+    start_time = time.time()
+    results = fit_models(create_models(args.imbalance), X_train, y_train, n_jobs=args.jobs, folds=args.folds)
+    logging.info(f"Fitted all models in {time.time() - start_time:.2f} seconds")
+
+    curves = {}
+    for name, result in results.items():
+        if result['cv_scores']:
+            logging.info(f"{name} - CV ROC AUC: {np.mean(result['cv_scores']):.3f} "
+                         f"(+/- {np.std(result['cv_scores']) * 2:.3f})")
+        logging.info(f"{name} - Training time: {result['training_time']:.2f} seconds")
+        result['metrics'], precision, recall = evaluate(name, result['model'], X_test, y_test)
+        curves[name] = (precision, recall, result['metrics']['auprc'])
+
+    # Best by cross-validation, by test ROC AUC when cross-validation was skipped
+    best_name = max(results, key=lambda name: np.mean(results[name]['cv_scores']) if results[name]['cv_scores']
+                    else results[name]['metrics']['roc_auc'])
+    logging.info(f"Best model: {best_name}")
+
+    if args.plots:
+        plot_results(results, curves)
+
+    save_model(best_name, results[best_name]['model'], args.output)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
     main()
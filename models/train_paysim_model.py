@@ -1,26 +1,68 @@
+import os
+import time
+import argparse
+
 import pandas as pd
 import joblib
 import logging
 from sklearn.compose import ColumnTransformer
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.metrics import precision_recall_curve, average_precision_score, roc_auc_score, auc, confusion_matrix
+from sklearn.metrics import (precision_recall_curve, average_precision_score, roc_auc_score, auc, confusion_matrix,
+                             brier_score_loss)
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import NearestNeighbors
 from sklearn.pipeline import Pipeline
 from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import RandomUnderSampler
 from imblearn.pipeline import Pipeline as ImbPipeline
 
-# Set up logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-
-class FraudDetectionModel:
+from models.decision_policy import Calibrator, CALIBRATION_METHODS
+from models.drift import DriftReference
+from models.inference import InferenceModel
+
+# Strategies for handling the class imbalance during training:
+#   smote         - full SMOTE oversampling to a 1:1 ratio (original behaviour, slowest)
+#   fast_smote    - SMOTE up to a 1:10 ratio with kd-tree neighbour search
+#   undersample   - balanced random undersampling of the majority class
+#   class_weight  - no resampling, balanced class weights in the forest
+#   none          - no imbalance handling
+IMBALANCE_STRATEGIES = ['smote', 'fast_smote', 'undersample', 'class_weight', 'none']
+FAST_SMOTE_RATIO = 0.1  # Minority to majority ratio fast_smote oversamples up to
+
+
+def fast_smote_strategy(y):
+    # Samples that are already above the ratio, e.g. with a raised fraud_fraction, are left as they are
+    counts = pd.Series(y).value_counts()
+    minority, majority = counts.idxmin(), counts.idxmax()
+    return {minority: max(int(counts[minority]), int(counts[majority] * FAST_SMOTE_RATIO))}
+
+
+def create_sampler(strategy):
+    if strategy == 'smote':
+        return SMOTE(random_state=42)
+    if strategy == 'fast_smote':
+        # Only synthesise up to 10% of the majority class and use a kd-tree for the
+        # neighbour search; this keeps the resampled training set close to its original size
+        return SMOTE(sampling_strategy=fast_smote_strategy, random_state=42,
+                     k_neighbors=NearestNeighbors(n_neighbors=6, algorithm='kd_tree'))
+    if strategy == 'undersample':
+        return RandomUnderSampler(random_state=42)
+    if strategy in ('class_weight', 'none'):
+        return None
+    raise ValueError(f"Unknown imbalance strategy: {strategy}")
+
+
+def serving_pipeline(pipeline):
+    # Samplers only act during fit, a plain scikit-learn pipeline keeps imblearn out of the API
+    if not hasattr(pipeline, 'steps'):
+        return pipeline
+    return Pipeline([(name, step) for name, step in pipeline.steps if name != 'sampler'])
+
+
+class FraudDetectionModel(InferenceModel):
     def __init__(self):
-        self.numeric_features = ['step', 'amount', 'oldbalanceOrg', 'newbalanceOrig',
-                                 'oldbalanceDest', 'newbalanceDest']
-        self.categorical_features = ['type']
-        self.model = None
+        super().__init__()
         self.preprocessor = None
         logging.info(f"Model initialized with features: \n" +
                      f"Numeric: {self.numeric_features}\n" +
@@ -78,28 +120,33 @@ class FraudDetectionModel:
             ])
         logging.info("Preprocessor created successfully")
 
-    def create_pipeline(self, use_smote=True):
-        logging.info(f"Creating pipeline (SMOTE: {use_smote})")
+    def create_classifier(self, imbalance='smote'):
+        return RandomForestClassifier(n_estimators=100,
+                                      random_state=42,
+                                      n_jobs=-1,
+                                      class_weight='balanced_subsample' if imbalance == 'class_weight' else None)
+
+    def create_pipeline(self, use_smote=True, imbalance=None):
+        if imbalance is None:
+            imbalance = 'smote' if use_smote else 'none'
+        logging.info(f"Creating pipeline (imbalance strategy: {imbalance})")
         if self.preprocessor is None:
             self.create_preprocessor()
 
-        if use_smote:
+        sampler = create_sampler(imbalance)
+        if sampler is not None:
             return ImbPipeline([
                 ('preprocessor', self.preprocessor),
-                ('smote', SMOTE(random_state=42)),
-                ('classifier', RandomForestClassifier(n_estimators=100,
-                                                      random_state=42,
-                                                      n_jobs=-1))
+                ('sampler', sampler),
+                ('classifier', self.create_classifier(imbalance))
             ])
 
         return Pipeline([
             ('preprocessor', self.preprocessor),
-            ('classifier', RandomForestClassifier(n_estimators=100,
-                                                  random_state=42,
-                                                  n_jobs=-1))
+            ('classifier', self.create_classifier(imbalance))
         ])
 
-    def train(self, X, y, use_smote=True):
+    def train(self, X, y, use_smote=True, imbalance=None, calibration='isotonic'):
         logging.info("Starting model training...")
         logging.info(f"Dataset size: {len(X)} samples")
 
@@ -110,16 +157,32 @@ class FraudDetectionModel:
         logging.info(f"Train set size: {len(X_train)}, Test set size: {len(X_test)}")
         logging.info(f"Fraud cases in train: {sum(y_train)}, in test: {sum(y_test)}")
 
+        # Hold out part of the training data to fit the probability calibration
+        self.calibrator = None
+        if calibration is not None:
+            X_train, X_cal, y_train, y_cal = train_test_split(
+                X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+            )
+            logging.info(f"Calibration set size: {len(X_cal)}")
+
         # Create and train model
-        self.model = self.create_pipeline(use_smote)
+        self.model = self.create_pipeline(use_smote, imbalance)
         logging.info("Training model...")
+        start_time = time.time()
         self.model.fit(X_train, y_train)
-        logging.info("Model training completed")
+        logging.info(f"Model training completed in {time.time() - start_time:.2f} seconds")
+
+        if calibration is not None:
+            logging.info(f"Fitting {calibration} calibration...")
+            self.calibrator = Calibrator.fit(self.model.predict_proba(X_cal)[:, 1], y_cal, calibration)
 
         # Evaluate
         logging.info("Evaluating model performance...")
         metrics = self.evaluate(X_test, y_test)
 
+        # Distributions live traffic is monitored against
+        self.drift_reference = DriftReference.fit(X_train, self.score(X_test)[0]).to_dict()
+
         # Log metrics
         logging.info("Model Performance Metrics:")
         for metric, value in metrics.items():
@@ -130,15 +193,60 @@ class FraudDetectionModel:
 
         return metrics
 
+    def compare_imbalance_strategies(self, X, y, strategies=None):
+        """
+        Train one model per imbalance strategy on the same split and compare
+        training time and quality against SMOTE.
+
+        Args:
+            X: Features
+            y: Target
+            strategies: Strategies to compare (None = all of IMBALANCE_STRATEGIES)
+        """
+        strategies = strategies or IMBALANCE_STRATEGIES
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+
+        results = []
+        for strategy in strategies:
+            logging.info(f"Evaluating imbalance strategy: {strategy}")
+            self.preprocessor = None
+            self.model = self.create_pipeline(imbalance=strategy)
+
+            start_time = time.time()
+            self.model.fit(X_train, y_train)
+            train_time = time.time() - start_time
+
+            metrics = self.evaluate(X_test, y_test)
+            cm = metrics['confusion_matrix']
+            results.append({
+                'Strategy': strategy,
+                'Training Time (s)': train_time,
+                'ROC AUC': metrics['roc_auc'],
+                'Avg Precision': metrics['avg_precision'],
+                'AUPRC': metrics['auprc'],
+                'False Positives': cm[0][1],
+                'False Negatives': cm[1][0]
+            })
+            logging.info(f"{strategy}: {train_time:.2f}s, AUPRC {metrics['auprc']:.4f}")
+
+        comparison_df = pd.DataFrame(results)
+        if 'smote' in comparison_df['Strategy'].values:
+            smote_time = comparison_df.loc[comparison_df['Strategy'] == 'smote', 'Training Time (s)'].iloc[0]
+            comparison_df['Speedup vs SMOTE'] = smote_time / comparison_df['Training Time (s)']
+
+        return comparison_df
+
     def evaluate(self, X_test, y_test):
         logging.info("Calculating prediction probabilities...")
-        y_pred_proba = self.model.predict_proba(X_test)[:, 1]
-        y_pred = self.model.predict(X_test)
+        y_pred_proba, y_pred = self.score(X_test)
 
         # Calculate metrics
         metrics = {
             'roc_auc': roc_auc_score(y_test, y_pred_proba),
             'avg_precision': average_precision_score(y_test, y_pred_proba),
+            'brier_score': brier_score_loss(y_test, y_pred_proba),
             'confusion_matrix': confusion_matrix(y_test, y_pred)
         }
 
@@ -185,38 +293,29 @@ class FraudDetectionModel:
         if self.model is None:
             raise ValueError("Model hasn't been trained yet")
         logging.info(f"Saving model to {path}")
-        joblib.dump(self.model, path)
+        # Write to a temporary file first so a running API never loads a half-written model
+        tmp_path = f"{path}.tmp"
+        joblib.dump({'pipeline': serving_pipeline(self.model), 'calibrator': self.calibrator,
+                     'drift_reference': self.drift_reference}, tmp_path)
+        os.replace(tmp_path, path)
         logging.info("Model saved successfully")
 
-    def load_model(self, path):
-        logging.info(f"Loading model from {path}")
-        self.model = joblib.load(path)
-        logging.info("Model loaded successfully")
-
-    def predict_proba(self, input_data: dict):
-        logging.info("Making prediction for new data...")
-        # Convert single input to DataFrame
-        input_df = pd.DataFrame([input_data])
-
-        # Ensure all required features are present
-        for feature in self.numeric_features + self.categorical_features:
-            if feature not in input_df.columns:
-                logging.error(f"Missing feature: {feature}")
-                raise ValueError(f"Missing feature: {feature}")
-
-        # Make prediction
-        probability = self.model.predict_proba(input_df)[0][1]
-        prediction = 1 if probability > 0.5 else 0
-
-        result = {
-            'prediction': prediction,
-            'probability': float(probability)
-        }
-        logging.info(f"Prediction result: {result}")
-        return result
-
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Train the PaySim fraud detection model")
+    parser.add_argument("--imbalance", choices=IMBALANCE_STRATEGIES, default="smote",
+                        help="Strategy for handling the class imbalance")
+    parser.add_argument("--sample-size", type=int, default=100000,
+                        help="Number of non-fraud transactions to sample")
+    parser.add_argument("--calibration", choices=CALIBRATION_METHODS + ['none'], default="isotonic",
+                        help="Probability calibration fitted on a held-out part of the training data")
+    parser.add_argument("--compare-imbalance", action="store_true",
+                        help="Compare all imbalance strategies instead of training a single model")
+    args = parser.parse_args()
+
     # Load data
     logging.info("Starting fraud detection pipeline...")
     df = pd.read_csv("../data/paysim.csv")
@@ -228,17 +327,23 @@ if __name__ == "__main__":
     # Prepare sampled dataset
     X, y = model.prepare_data(
         df,
-        sample_size=100000,  # Use 100k non-fraud transactions
+        sample_size=args.sample_size,  # Use 100k non-fraud transactions by default
         fraud_fraction=1.0  # Keep all fraud cases
     )
 
-    # Train and evaluate
-    metrics = model.train(X, y)
+    if args.compare_imbalance:
+        comparison_df = model.compare_imbalance_strategies(X, y)
+        logging.info("\nImbalance strategy comparison:")
+        logging.info(comparison_df.to_string())
+    else:
+        # Train and evaluate
+        metrics = model.train(X, y, imbalance=args.imbalance,
+                              calibration=None if args.calibration == 'none' else args.calibration)
 
-    # Get feature importance
-    importance_df = model.get_feature_importance()
+        # Get feature importance
+        importance_df = model.get_feature_importance()
 
-    # Save model
-    model.save_model("../models/fraud_model.pkl")
+        # Save model
+        model.save_model("../models/fraud_model.pkl")
 
-    logging.info("Pipeline completed successfully!")
+        logging.info("Pipeline completed successfully!")